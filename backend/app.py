@@ -3,24 +3,30 @@ Main Flask application
 """
 from flask import Flask
 from flask_cors import CORS
-import openai
 import logging
 
 from config import (
-    OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL,
+    OPENAI_API_KEY,
     FLASK_HOST, FLASK_PORT, FLASK_DEBUG,
-    CORS_ORIGINS, CORS_METHODS, CORS_HEADERS
+    CORS_ORIGINS, CORS_METHODS, CORS_HEADERS,
+    QUERY_LOG_COMPACTION_INTERVAL_HOURS, STARTUP_MODE, PRELOAD_FORK
 )
-from chroma_manager import get_chroma_manager
+from startup import StartupState
 from conversation_logger import get_conversation_logger
-from routes.chat import init_chat_routes
-from routes.knowledge import init_knowledge_routes
-from routes.health import init_health_routes
+from routes.chat import chat_bp, init_chat_routes
+from routes.knowledge import knowledge_bp, init_knowledge_routes
+from routes.health import health_bp, init_health_routes
+from routes.metrics import init_metrics_routes
+from routes.admin import init_admin_routes
+from utils.llm_client import ResilientChatClient, build_openai_client
+from utils.metrics import get_metrics_registry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+startup_state = StartupState(STARTUP_MODE)
+
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app, resources={
@@ -38,26 +44,90 @@ if not OPENAI_API_KEY or OPENAI_API_KEY == "your_openai_api_key_here":
 else:
     api_key = OPENAI_API_KEY
 
-client = openai.OpenAI(
-    api_key=api_key,
-    base_url=OPENAI_BASE_URL
-)
+with startup_state.phase("openai_client"):
+    client = ResilientChatClient(build_openai_client(api_key))
 
-# Initialize enhanced services
-logger.info("Initializing enhanced services...")
-try:
-    chroma_db = get_chroma_manager()
+with startup_state.phase("conversation_logger"):
     conversation_logger = get_conversation_logger()
-    logger.info("✅ All enhanced services initialized successfully!")
-except Exception as e:
-    logger.error(f"❌ Error initializing services: {e}")
-    chroma_db = None
-    conversation_logger = None
 
-# Initialize routes
+chroma_db = None
+
+def bind_services(chroma_manager, conv_logger):
+    """Point every blueprint at the given service instances"""
+    chat_bp.chroma_db = chroma_manager
+    chat_bp.conversation_logger = conv_logger
+    knowledge_bp.chroma_db = chroma_manager
+    health_bp.chroma_db = chroma_manager
+    health_bp.conversation_logger = conv_logger
+
+def initialize_services():
+    """
+    Heavy initialization: vector store, embedding model, FAQ index and
+    background jobs. Runs before serving (eager) or on a thread (lazy).
+    """
+    global chroma_db
+
+    with startup_state.phase("import_chroma_manager"):
+        from chroma_manager import get_chroma_manager
+
+    with startup_state.phase("chroma_manager"):
+        manager = get_chroma_manager()
+
+    with startup_state.phase("embedding_warm_up"):
+        manager.warm_up()
+
+    # Threads do not survive fork; with preload they are started in each worker instead
+    if not PRELOAD_FORK:
+        start_background_jobs(manager)
+
+    chroma_db = manager
+    bind_services(chroma_db, conversation_logger)
+
+def start_background_jobs(manager):
+    """Periodic maintenance jobs (with several workers only one runs compaction)"""
+    if QUERY_LOG_COMPACTION_INTERVAL_HOURS > 0:
+        manager.start_query_log_compaction(QUERY_LOG_COMPACTION_INTERVAL_HOURS)
+
+def reinitialize_after_fork():
+    """
+    Called by gunicorn in each worker after fork. Loaded model weights, indexes
+    and imported modules stay shared with the master; SQLite/Chroma handles and
+    inference sessions are reopened and background jobs started.
+    """
+    get_metrics_registry().reset_after_fork()
+    # Metrics are flushed even when the vector store failed to start: /api/metrics covers every worker
+    get_metrics_registry().start_flusher()
+    if chroma_db is not None:
+        chroma_db.reopen_after_fork()
+        start_background_jobs(chroma_db)
+    health_bp.status_snapshot.start()
+
+# Initialize routes (services are bound now in eager mode, after warm-up in lazy mode)
 init_chat_routes(app, chroma_db, conversation_logger, client)
 init_knowledge_routes(app, chroma_db)
-init_health_routes(app, chroma_db, conversation_logger, api_key)
+init_health_routes(app, chroma_db, conversation_logger, api_key, startup_state, client)
+init_metrics_routes(app)
+init_admin_routes(app)
+
+# Initialize enhanced services
+if STARTUP_MODE == "lazy" and not PRELOAD_FORK:
+    logger.info("Lazy startup: serving liveness now, warming up services in background...")
+    startup_state.run_in_background(initialize_services)
+else:
+    logger.info("Initializing enhanced services...")
+    try:
+        initialize_services()
+        startup_state.mark_ready()
+        logger.info("✅ All enhanced services initialized successfully!")
+    except Exception as e:
+        logger.error(f"❌ Error initializing services: {e}")
+        startup_state.mark_failed(e)
+        chroma_db = None
+
+# Health status is collected and metrics flushed off the request path (after fork when preloading under gunicorn)
+if not PRELOAD_FORK:
+    get_metrics_registry().start_flusher()
+    health_bp.status_snapshot.start()
 
 if __name__ == '__main__':
     app.run(debug=FLASK_DEBUG, host=FLASK_HOST, port=FLASK_PORT)
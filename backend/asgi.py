@@ -0,0 +1,243 @@
+"""
+ASGI entry point: async /api/chat built on openai.AsyncOpenAI, every other
+route served by the Flask app
+
+A request waiting on the LLM holds only a coroutine, not a thread, so one
+worker can keep thousands of conversations in flight. Retrieval and logging
+(blocking vector store / file I/O) run on a bounded thread pool.
+
+Run from backend/:
+    uvicorn asgi:app --host 0.0.0.0 --port 5001 --workers 2
+"""
+import asyncio
+import contextvars
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+import logging
+
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route, request_response
+
+from app import app as flask_app, api_key
+from config import (
+    OPENAI_MODEL, FLASK_HOST, FLASK_PORT,
+    CORS_ORIGINS, CORS_METHODS, CORS_HEADERS,
+    ASYNC_RETRIEVAL_THREADS, ASYNC_LLM_MAX_CONNECTIONS, ASYNC_LLM_MAX_KEEPALIVE,
+    DEADLINE_RAG_MIN_S, DEADLINE_LLM_MIN_S, DEADLINE_FUNCTION_FOLLOWUP_MIN_S
+)
+from routes.chat import chat_bp
+from routes.health import health_bp
+from utils.openai_functions import FUNCTIONS
+from utils.admission import AdmissionRejected, get_llm_admission
+from utils.llm_client import AsyncResilientChatClient, build_async_openai_client
+from utils.chat_pipeline import (
+    conversation_history, find_faq_answer, log_faq_answer, faq_response, retrieve_context,
+    prepare_messages, local_response, execute_function_call, log_exchange,
+    chat_response, with_skipped_stages, error_response
+)
+from utils.deadline import Deadline, DEADLINE_HEADER
+from utils.tracing import DEBUG_TIMINGS_HEADER, start_trace, complete_trace, debug_requested, span, record_span
+from utils.metrics import CHAT_IN_PROGRESS, get_metrics_registry, observe_chat_request
+
+logger = logging.getLogger(__name__)
+
+# Shares the process-wide circuit breaker with the Flask client
+async_client = AsyncResilientChatClient(
+    build_async_openai_client(api_key, ASYNC_LLM_MAX_CONNECTIONS, ASYNC_LLM_MAX_KEEPALIVE)
+)
+health_bp.llm_client = async_client  # /api/health reports the client that serves /api/chat
+
+llm_admission = get_llm_admission()
+
+retrieval_executor = ThreadPoolExecutor(max_workers=ASYNC_RETRIEVAL_THREADS, thread_name_prefix="retrieval")
+retrieval_tasks = 0  # Submitted to retrieval_executor and not finished (running + queued)
+
+def _retrieval_pool_gauges():
+    yield ("retrieval_pool_threads", "Threads in the async retrieval pool", {}, ASYNC_RETRIEVAL_THREADS)
+    yield ("retrieval_pool_tasks", "Blocking steps running or queued on the async retrieval pool", {}, retrieval_tasks)
+
+get_metrics_registry().register_collector(_retrieval_pool_gauges)
+
+async def run_blocking(func, *args):
+    """Run a blocking pipeline step on the retrieval thread pool (in the caller's context, so spans reach its trace)"""
+    global retrieval_tasks
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    retrieval_tasks += 1  # Only touched from the event loop thread
+    try:
+        return await loop.run_in_executor(retrieval_executor, partial(context.run, func, *args))
+    finally:
+        retrieval_tasks -= 1
+
+async def chat(request: Request):
+    """Async chat endpoint, same request/response schema as the Flask route"""
+    data = None
+    try:
+        deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER))
+        data = await request.json()
+        user_message = data.get('message', '')
+        session_id = data.get('session_id', 'default')
+        
+        logger.info(f"Processing async chat request - Session: {session_id}")
+        
+        # Services are bound to the blueprint once warm-up finishes (see app.bind_services)
+        chroma_db = chat_bp.chroma_db
+        conversation_logger = chat_bp.conversation_logger
+        
+        response_source = "openai"
+        rag_used = False
+        
+        # Retrieval results of steps 1-2, reused by the local answer instead of searching again
+        hits = {}
+        
+        # Step 1: FAQ match (never waits on the LLM)
+        if chroma_db:
+            try:
+                with span("faq_search"):
+                    best_faq = await run_blocking(find_faq_answer, chroma_db, user_message, hits)
+                if best_faq:
+                    with span("faq_log"):
+                        await run_blocking(log_faq_answer, chroma_db, conversation_logger, session_id, user_message, best_faq)
+                    return JSONResponse(with_skipped_stages(faq_response(session_id, best_faq), deadline))
+            except Exception as faq_error:
+                logger.warning(f"FAQ search failed: {faq_error}")
+        
+        # Step 2: RAG retrieval (skipped when the budget is low)
+        retrieved_context = ""
+        if chroma_db and deadline.allows("rag", DEADLINE_RAG_MIN_S):
+            with span("rag"):
+                retrieved_context = await run_blocking(retrieve_context, chroma_db, user_message, hits)
+            if retrieved_context:
+                rag_used = True
+                response_source = "rag"
+        
+        async def answer_locally(reason: str, status: int = 200):
+            with span("local_answer"):
+                payload = await run_blocking(local_response, conversation_logger, session_id, user_message,
+                                             retrieved_context, hits, reason)
+            return JSONResponse(with_skipped_stages(payload, deadline), status_code=status)
+        
+        # Open circuit breaker: answer locally without queueing for an LLM slot
+        if async_client.breaker.is_open():
+            logger.warning(f"LLM circuit open, answering locally - Session: {session_id}")
+            return await answer_locally("circuit_open")
+        
+        # Step 3: LLM round trip(s) on the event loop, once admission control grants a slot
+        try:
+            if not deadline.allows("llm", DEADLINE_LLM_MIN_S):
+                return await answer_locally("deadline")
+            
+            queue_timeout = deadline.wait_budget(DEADLINE_LLM_MIN_S, llm_admission.queue_timeout)
+            admission_requested = time.perf_counter()
+            async with llm_admission.async_slot(session_id, timeout=queue_timeout):
+                record_span("admission_wait", admission_requested)
+                if not deadline.allows("llm", DEADLINE_LLM_MIN_S):
+                    return await answer_locally("deadline")
+                
+                messages = prepare_messages(session_id, user_message, retrieved_context)
+                
+                try:
+                    with span("llm_completion"):
+                        response = await async_client.create(
+                            deadline=deadline.expires_at,
+                            model=OPENAI_MODEL,
+                            messages=messages,
+                            functions=FUNCTIONS,
+                            function_call="auto",
+                            max_tokens=deadline.max_tokens()
+                        )
+                except Exception as api_error:
+                    logger.error(f"OpenAI API error: {str(api_error)}")
+                    return await answer_locally("llm_error")
+                
+                response_message = response.choices[0].message
+                
+                if hasattr(response_message, 'function_call') and response_message.function_call:
+                    with span("function_call"):
+                        function_result = await run_blocking(execute_function_call, session_id, response_message.function_call)
+                    response_source = "function"
+                    
+                    # Second completion, or the function result directly if out of budget
+                    assistant_message = function_result
+                    if deadline.allows("function_followup", DEADLINE_FUNCTION_FOLLOWUP_MIN_S):
+                        try:
+                            with span("llm_followup"):
+                                final_response = await async_client.create(
+                                    deadline=deadline.expires_at,
+                                    model=OPENAI_MODEL,
+                                    messages=conversation_history[session_id],
+                                    max_tokens=deadline.max_tokens()
+                                )
+                            assistant_message = final_response.choices[0].message.content
+                        except Exception as api_error:
+                            logger.error(f"OpenAI API error after function call: {str(api_error)}")
+                            deadline.skip("function_followup")
+                else:
+                    assistant_message = response_message.content
+                    if not rag_used:
+                        response_source = "openai"
+        except AdmissionRejected as rejected:
+            logger.warning(f"LLM request shed ({rejected.reason}) - Session: {session_id}")
+            return await answer_locally(rejected.reason, 429 if rejected.reason == "rate_limited" else 200)
+        
+        with span("log_exchange"):
+            await run_blocking(log_exchange, chroma_db, conversation_logger, session_id, user_message,
+                               assistant_message, response_source, rag_used)
+        
+        return JSONResponse(with_skipped_stages(chat_response(session_id, assistant_message, response_source), deadline))
+    
+    except Exception as e:
+        logger.error(f"Error in async chat endpoint: {str(e)}")
+        return JSONResponse(error_response(data), status_code=500)
+
+async def traced_chat(request: Request):
+    """Record request metrics and trace the chat request: Server-Timing header and, with X-Debug-Timings, the trace in the body"""
+    started = time.perf_counter()
+    trace = start_trace(f"{request.method} {request.url.path}", debug=debug_requested(request.headers.get(DEBUG_TIMINGS_HEADER)))
+    CHAT_IN_PROGRESS.inc()
+    try:
+        response = await chat(request)
+    finally:
+        CHAT_IN_PROGRESS.dec()
+    payload = json.loads(response.body)
+    observe_chat_request(payload, response.status_code, started)
+    if trace is None:
+        return response
+    headers = complete_trace(trace, payload, response.status_code)
+    if trace.debug:
+        return JSONResponse(payload, status_code=response.status_code, headers=headers)
+    response.headers.update(headers)
+    return response
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await async_client.client.close()
+    retrieval_executor.shutdown(wait=False)
+
+# Flask-CORS only covers the mounted Flask app, so the async route gets its own CORS layer
+chat_endpoint = CORSMiddleware(
+    request_response(traced_chat),
+    allow_origins=CORS_ORIGINS,
+    allow_methods=CORS_METHODS,
+    allow_headers=CORS_HEADERS
+)
+
+app = Starlette(
+    routes=[
+        Route('/api/chat', endpoint=chat_endpoint, methods=['POST', 'OPTIONS']),
+        Mount('/', app=WsgiToAsgi(flask_app))
+    ],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host=FLASK_HOST, port=FLASK_PORT)
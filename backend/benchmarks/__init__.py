@@ -0,0 +1,3 @@
+"""
+Benchmark scripts (run from backend/: python -m benchmarks.<name>)
+"""
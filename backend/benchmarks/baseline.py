@@ -0,0 +1,100 @@
+"""
+Compare benchmark results against a stored baseline
+
+Results are {"meta": {...}, "results": {benchmark: [case, ...]}} where each
+case has a "case" label plus numeric metrics. Metric direction comes from the
+name: "*_per_s" is higher-is-better, "*_ms" / "*_us" / "*_s" lower-is-better;
+anything else (counts, sizes) is informational. Latency changes smaller than
+NOISE_FLOOR_S are never flagged (sub-100µs timings jitter by more than any
+sensible tolerance).
+"""
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+NOISE_FLOOR_S = 0.0001
+UNIT_SECONDS = {"_ms": 1e-3, "_us": 1e-6, "_s": 1.0}
+
+def metadata() -> Dict[str, Any]:
+    """Where the numbers come from (compare baselines from the same machine only)"""
+    return {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count()
+    }
+
+def _direction(metric: str) -> Optional[str]:
+    if metric.endswith("_per_s"):
+        return "higher"
+    if metric.endswith(("_ms", "_us", "_s")):
+        return "lower"
+    return None
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """
+    Metrics of cases present in both runs, with their relative change
+
+    Args:
+        current (Dict): Results of this run
+        baseline (Dict): Stored results
+        tolerance (float): Allowed relative slowdown (0.2 = 20%) before a metric counts as regressed
+
+    Returns:
+        List[Dict]: {"benchmark", "case", "metric", "baseline", "current", "change", "regression"}
+    """
+    rows = []
+    for benchmark, cases in current.get("results", {}).items():
+        baseline_cases = {case["case"]: case for case in baseline.get("results", {}).get(benchmark, [])}
+        for case in cases:
+            reference = baseline_cases.get(case["case"])
+            if reference is None:
+                continue
+            for metric, value in case.items():
+                direction = _direction(metric)
+                old = reference.get(metric)
+                if direction is None or not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or old == 0:
+                    continue
+                change = (value - old) / old
+                slowdown = change if direction == "lower" else -change
+                if direction == "lower":
+                    unit = next(scale for suffix, scale in UNIT_SECONDS.items() if metric.endswith(suffix))
+                    if abs(value - old) * unit < NOISE_FLOOR_S:
+                        slowdown = 0.0
+                rows.append({
+                    "benchmark": benchmark,
+                    "case": case["case"],
+                    "metric": metric,
+                    "baseline": old,
+                    "current": value,
+                    "change": round(change, 4),
+                    "regression": slowdown > tolerance
+                })
+    return rows
+
+def load(path: str) -> Optional[Dict[str, Any]]:
+    if not Path(path).exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save(results: Dict[str, Any], path: str):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+def report(rows: List[Dict[str, Any]], stream=sys.stderr) -> int:
+    """Print the comparison table; returns the number of regressions"""
+    regressions = 0
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else "ok"
+        regressions += row["regression"]
+        print(f"{flag:<10} {row['benchmark']:<22} {row['case']:<28} {row['metric']:<16} "
+              f"{row['baseline']:>12} -> {row['current']:<12} ({row['change'] * 100:+.1f}%)", file=stream)
+    print(f"{len(rows)} metrics compared, {regressions} regressions", file=stream)
+    return regressions
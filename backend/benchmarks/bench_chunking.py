@@ -0,0 +1,149 @@
+"""
+Fixed (1000 characters, 200 overlap) vs semantic chunking
+
+    split    chunk count, stored characters relative to the input (overlap
+             duplication), tokens per chunk, throughput and the chunker's peak
+             memory on 1-10 MB of synthetic Vietnamese text
+    ingest   add_document_from_text time and chunk count for the sample
+             documents plus synthetic uploads
+    quality  recall@k, MRR and prompt tokens on the labelled retrieval set
+             (benchmarks/data/retrieval_eval.json) at RAG_TOP_K, with the
+             production threshold and with none (raw ranking)
+
+Run from backend/:
+    python -m benchmarks.bench_chunking
+    python -m benchmarks.bench_chunking --only split --sizes-mb 1 10 100
+    python -m benchmarks.bench_chunking --embedder model --output chunking.json
+
+--embedder hashing (default) times our code and the vector store; quality
+numbers are only meaningful with --embedder model.
+"""
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Any, List
+
+import numpy as np
+
+import chroma_manager
+from chroma_manager import ChromaDBManager
+from config import VECTOR_STORE_BACKEND, RAG_TOP_K, RAG_RELEVANCE_THRESHOLD
+from utils.chunking import CHUNKERS, iter_chunks, estimate_tokens
+from benchmarks import baseline, corpus
+from benchmarks.bench_hot_paths import HashingEmbedder
+from benchmarks.eval_retrieval import DOCUMENTS_DIR, EVAL_SET_PATH, eval_knowledge, load_eval_set, token_counter
+
+MB = 1_000_000
+FIXED_SIZE, FIXED_OVERLAP = 1000, 200
+
+def bench_split(sizes_mb: List[int], **_) -> List[Dict[str, Any]]:
+    results = []
+    for size_mb in sizes_mb:
+        text = corpus.generate_text(size_mb * MB, seed=size_mb)
+        for chunker in CHUNKERS:
+            # Consume the generator without keeping chunks: peak memory is the chunker's own
+            count, stored_chars, tokens = 0, 0, []
+            tracemalloc.start()
+            start = time.perf_counter()
+            for chunk in iter_chunks(text, chunker, FIXED_SIZE, FIXED_OVERLAP):
+                count += 1
+                stored_chars += len(chunk)
+                if count % 10 == 0:
+                    tokens.append(estimate_tokens(chunk))
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append({
+                "case": f"{chunker},size_mb={size_mb}",
+                "chunks": count,
+                "stored_ratio": round(stored_chars / len(text), 3),
+                "tokens_p50": int(np.percentile(tokens, 50)) if tokens else 0,
+                "tokens_max_sampled": max(tokens) if tokens else 0,
+                "peak_mb": round(peak / MB, 2),
+                "elapsed_s": round(seconds, 3),
+                "mb_per_s": round(size_mb / seconds, 1)
+            })
+        del text
+    return results
+
+def bench_ingest(backend: str, docs: int, doc_kb: int, **_) -> List[Dict[str, Any]]:
+    documents = [{"title": path.stem, "content": path.read_text(encoding="utf-8"), "category": "sample"}
+                 for path in sorted(DOCUMENTS_DIR.glob("*.txt"))]
+    documents += corpus.generate_documents(docs, doc_kb * 1000, seed=7)
+    total_mb = sum(len(doc["content"].encode("utf-8")) for doc in documents) / MB
+    results = []
+    for chunker in CHUNKERS:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            manager = ChromaDBManager(persist_directory=tmp_dir, backend=backend)
+            manager.warm_up()
+            start = time.perf_counter()
+            chunks = sum(len(manager.add_document_from_text(**doc, chunker=chunker)) for doc in documents)
+            seconds = time.perf_counter() - start
+        results.append({
+            "case": f"{chunker},docs={len(documents)}",
+            "chunks": chunks,
+            "elapsed_s": round(seconds, 3),
+            "mb_per_s": round(total_mb / seconds, 3)
+        })
+    return results
+
+def bench_quality(backend: str, **_) -> List[Dict[str, Any]]:
+    labels = load_eval_set(str(EVAL_SET_PATH))["knowledge"]
+    count_tokens = token_counter()
+    thresholds = sorted({0.0, RAG_RELEVANCE_THRESHOLD})
+    results = []
+    for chunker in CHUNKERS:
+        sizes = (FIXED_SIZE, FIXED_OVERLAP) if chunker == "fixed" else (None, None)
+        for row in eval_knowledge(labels, chunker, *sizes, [RAG_TOP_K], thresholds, backend, count_tokens):
+            results.append({
+                "case": f"{chunker},top_k={RAG_TOP_K},threshold={row['threshold']}",
+                "chunks": row["chunks"],
+                "recall_at_k": row["recall_at_k"],
+                "mrr": row["mrr"],
+                "context_tokens_mean": row["context_tokens_mean"],
+                "p50_ms": row["p50_ms"]
+            })
+    return results
+
+BENCHMARKS = {
+    "split": bench_split,
+    "ingest": bench_ingest,
+    "quality": bench_quality
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--docs", type=int, default=10, help="Synthetic documents added to the ingest run")
+    parser.add_argument("--doc-kb", type=int, default=50)
+    parser.add_argument("--backend", default=VECTOR_STORE_BACKEND)
+    parser.add_argument("--embedder", choices=["hashing", "model"], default="hashing")
+    parser.add_argument("--output", help="Write results JSON here instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.embedder == "hashing":
+        chroma_manager.create_embedding_function = HashingEmbedder
+
+    results = {
+        "meta": {**baseline.metadata(), "backend": args.backend, "embedder": args.embedder},
+        "results": {}
+    }
+    for name in args.only:
+        started = time.perf_counter()
+        results["results"][name] = BENCHMARKS[name](sizes_mb=args.sizes_mb, backend=args.backend,
+                                                    docs=args.docs, doc_kb=args.doc_kb)
+        print(f"{name} done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    if args.output:
+        baseline.save(results, args.output)
+    else:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
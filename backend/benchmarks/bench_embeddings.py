@@ -0,0 +1,84 @@
+"""
+Embedding providers: throughput and per-text latency on CPU
+
+Run from backend/:
+    python -m embeddings quantize   # once, for the int8 ONNX model
+    python -m benchmarks.bench_embeddings --threads 1 4
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from embeddings import EMBEDDING_PROVIDERS, SentenceTransformerEmbedder, OnnxEmbedder, _create_default
+
+SUBJECTS = ["học phí", "đăng ký môn học", "lịch thi", "học bổng", "ký túc xá", "thực tập", "tốt nghiệp"]
+TEMPLATES = [
+    "Cho em hỏi {} học kỳ này như thế nào ạ?",
+    "Thời hạn {} là khi nào?",
+    "Sinh viên năm nhất cần chuẩn bị gì cho {}?",
+    "Quy định về {} được áp dụng ra sao đối với sinh viên hệ chất lượng cao và sinh viên chuyển ngành?"
+]
+
+def _texts(n: int) -> List[str]:
+    return [TEMPLATES[i % len(TEMPLATES)].format(SUBJECTS[i % len(SUBJECTS)]) for i in range(n)]
+
+def _create(provider: str, threads: int, batch_size: int, max_seq_length: int):
+    if provider == "sentence-transformers":
+        return SentenceTransformerEmbedder(threads=threads, batch_size=batch_size, max_seq_length=max_seq_length)
+    if provider == "onnx":
+        return OnnxEmbedder(threads=threads, batch_size=batch_size, max_seq_length=max_seq_length)
+    return _create_default()
+
+def bench_provider(provider: str, threads: int, batch_size: int, max_seq_length: int,
+                   n_texts: int, n_single: int) -> Dict[str, object]:
+    """Batch throughput and single-text latency for one provider"""
+    result = {"provider": provider, "threads": threads, "batch_size": batch_size, "max_seq_length": max_seq_length}
+
+    start = time.perf_counter()
+    embed = _create(provider, threads, batch_size, max_seq_length)
+    embed(["khởi động"])
+    result["load_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    texts = _texts(n_texts)
+    start = time.perf_counter()
+    embeddings = embed(texts)
+    result["embeddings_per_sec"] = round(len(texts) / (time.perf_counter() - start), 1)
+    result["dim"] = len(embeddings[0])
+
+    samples = []
+    for text in texts[:n_single]:
+        start = time.perf_counter()
+        embed([text])
+        samples.append(time.perf_counter() - start)
+    values = np.asarray(samples) * 1000
+    result["single_p50_ms"] = round(float(np.percentile(values, 50)), 2)
+    result["single_p99_ms"] = round(float(np.percentile(values, 99)), 2)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", nargs="+", default=list(EMBEDDING_PROVIDERS))
+    parser.add_argument("--threads", type=int, nargs="+", default=[0])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-seq-length", type=int, default=256)
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--single", type=int, default=200)
+    args = parser.parse_args()
+
+    results = []
+    for provider in args.providers:
+        # Chroma's default function has no thread/batch settings, run it once
+        thread_counts = [0] if provider == "default" else args.threads
+        for threads in thread_counts:
+            try:
+                results.append(bench_provider(provider, threads, args.batch_size, args.max_seq_length,
+                                              args.texts, args.single))
+            except (ImportError, FileNotFoundError, ValueError) as e:
+                results.append({"provider": provider, "threads": threads, "error": str(e)})
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
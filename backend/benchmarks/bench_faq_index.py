@@ -0,0 +1,87 @@
+"""
+FAQ search latency: in-memory FAQIndex vs Chroma collection query
+
+Run from backend/:
+    python -m benchmarks.bench_faq_index --sizes 50 500 5000
+"""
+import argparse
+import json
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+import numpy as np
+
+from faq_index import FAQIndex
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p99 of latency samples in microseconds"""
+    values = np.asarray(samples) * 1e6
+    return {
+        "p50_us": round(float(np.percentile(values, 50)), 1),
+        "p99_us": round(float(np.percentile(values, 99)), 1)
+    }
+
+def _time_queries(search, queries: np.ndarray) -> Dict[str, float]:
+    """Run one search per query and collect latencies"""
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        samples.append(time.perf_counter() - start)
+    return _percentiles(samples)
+
+def bench_size(size: int, dim: int, n_queries: int, top_k: int) -> Dict[str, object]:
+    """Benchmark all FAQ search variants for one collection size"""
+    rng = np.random.default_rng(size)
+    embeddings = rng.standard_normal((size, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries = rng.standard_normal((n_queries, dim)).astype(np.float32)
+    questions = [f"Câu hỏi số {i}" for i in range(size)]
+    metadatas = [{"answer": f"Trả lời {i}", "category": "general"} for i in range(size)]
+
+    result = {"size": size, "dim": dim}
+
+    for quantize in (False, True):
+        index = FAQIndex(quantize=quantize)
+        index.build(questions, embeddings.tolist(), metadatas)
+        name = "numpy_int8" if quantize else "numpy_float32"
+        result[name] = _time_queries(lambda q: index.search(q, top_k=top_k), queries)
+
+    try:
+        import chromadb
+    except ImportError:
+        result["chroma"] = "chromadb not installed"
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = chromadb.PersistentClient(path=tmp_dir)
+        collection = client.get_or_create_collection(name=f"bench-{uuid.uuid4().hex[:8]}")
+        for start in range(0, size, 1000):
+            collection.add(
+                ids=[str(i) for i in range(start, min(start + 1000, size))],
+                embeddings=embeddings[start:start + 1000].tolist(),
+                documents=questions[start:start + 1000],
+                metadatas=metadatas[start:start + 1000]
+            )
+        result["chroma"] = _time_queries(
+            lambda q: collection.query(query_embeddings=[q.tolist()], n_results=top_k),
+            queries
+        )
+
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=2)
+    args = parser.parse_args()
+
+    results = [bench_size(size, args.dim, args.queries, args.top_k) for size in args.sizes]
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Backend hot paths on a synthetic Vietnamese corpus: chunking, document
+ingestion, FAQ/knowledge search vs collection size, conversation logging vs
+session length, session analytics vs file count and function-calling lookups
+vs catalog size
+
+Results are printed as JSON (or written with --output) and, with --baseline,
+compared against a stored run; the exit code is 1 when a metric regressed by
+more than --tolerance. Record a baseline on the reference machine first:
+
+Run from backend/:
+    python -m benchmarks.bench_hot_paths --save-baseline benchmarks/baselines/hot_paths.json
+    python -m benchmarks.bench_hot_paths --baseline benchmarks/baselines/hot_paths.json
+    python -m benchmarks.bench_hot_paths --quick --only search logging
+
+--embedder hashing (default) replaces the embedding model with a fixed
+feature-hashing function so search and ingestion numbers measure our code and
+the vector store, not model inference (see bench_embeddings for the model);
+--embedder model uses the configured EMBEDDING_PROVIDER.
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+import tempfile
+import time
+import zlib
+from typing import Callable, Dict, Any, List
+
+import numpy as np
+
+import chroma_manager
+from chroma_manager import ChromaDBManager
+from conversation_logger import ConversationLogger
+from utils import openai_functions
+from config import VECTOR_STORE_BACKEND
+from benchmarks import baseline, corpus
+
+MB = 1_000_000
+
+SIZES = {
+    "full": {
+        "chunk_mb": [1, 10, 100],
+        "ingest_docs": 20, "ingest_doc_kb": 50,
+        "collection_sizes": [100, 1000, 5000],
+        "session_lengths": [10, 100, 1000],
+        "session_files": [100, 1000, 5000],
+        "catalog_sizes": [100, 1000, 10000]
+    },
+    "quick": {
+        "chunk_mb": [1, 10],
+        "ingest_docs": 5, "ingest_doc_kb": 20,
+        "collection_sizes": [100, 1000],
+        "session_lengths": [10, 100],
+        "session_files": [100, 500],
+        "catalog_sizes": [100, 1000]
+    }
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+class HashingEmbedder:
+    """Deterministic bag-of-words feature hashing (no model); unit-length vectors"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        vectors = np.zeros((len(input), self.dim), dtype=np.float32)
+        for row, text in enumerate(input):
+            for token in _TOKEN_RE.findall(text.lower()):
+                digest = zlib.crc32(token.encode("utf-8"))
+                vectors[row, digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).tolist()
+
+def _latency(func: Callable, args_list: List[tuple]) -> Dict[str, float]:
+    """Call func once per args tuple; p50/p99 in milliseconds"""
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    values = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3)
+    }
+
+def _best_of(func: Callable, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def _manager(tmp_dir: str, backend: str) -> ChromaDBManager:
+    manager = ChromaDBManager(persist_directory=tmp_dir, backend=backend)
+    manager.warm_up()
+    return manager
+
+def bench_chunk_text(sizes: Dict[str, Any], **_) -> List[Dict[str, Any]]:
+    results = []
+    for size_mb in sizes["chunk_mb"]:
+        text = corpus.generate_text(size_mb * MB, seed=size_mb)
+        chunk = lambda: ChromaDBManager._chunk_text(None, text, 1000, 200)
+        seconds = _best_of(chunk, 3 if size_mb < 50 else 1)
+        results.append({
+            "case": f"size_mb={size_mb}",
+            "chunks": len(chunk()),
+            "elapsed_s": round(seconds, 4),
+            "mb_per_s": round(size_mb / seconds, 1)
+        })
+        del text
+    return results
+
+def bench_ingest(sizes: Dict[str, Any], backend: str, **_) -> List[Dict[str, Any]]:
+    documents = corpus.generate_documents(sizes["ingest_docs"], sizes["ingest_doc_kb"] * 1000, seed=1)
+    total_mb = sum(len(doc["content"].encode("utf-8")) for doc in documents) / MB
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = _manager(tmp_dir, backend)
+        start = time.perf_counter()
+        chunks = sum(len(manager.add_document_from_text(**doc)) for doc in documents)
+        seconds = time.perf_counter() - start
+    return [{
+        "case": f"docs={len(documents)},doc_kb={sizes['ingest_doc_kb']}",
+        "chunks": chunks,
+        "elapsed_s": round(seconds, 3),
+        "chunks_per_s": round(chunks / seconds, 1),
+        "mb_per_s": round(total_mb / seconds, 3)
+    }]
+
+def bench_search(sizes: Dict[str, Any], backend: str, queries: int, **_) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes["collection_sizes"]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            manager = _manager(tmp_dir, backend)
+
+            # Setup is not timed: FAQs in batches (add_faq rebuilds the index per call)
+            faqs = corpus.generate_faqs(size, seed=size)
+            for offset in range(0, size, 500):
+                batch = faqs[offset:offset + 500]
+                manager.faq_collection.add(
+                    documents=[faq["question"] for faq in batch],
+                    metadatas=[{"answer": faq["answer"], "category": faq["category"], "created_at": "2025-01-01T00:00:00"}
+                               for faq in batch],
+                    ids=[f"bench-faq-{offset + i}" for i in range(len(batch))]
+                )
+            manager._bump_version("faqs")
+            manager._rebuild_faq_index()
+            # About `size` knowledge chunks, 50 per document
+            for document in corpus.generate_documents(max(1, size // 50), 50 * 800, seed=size):
+                manager.add_document_from_text(**document)
+            knowledge_chunks = manager.knowledge_collection.count()
+
+            # Distinct queries: every lookup misses the retrieval cache
+            query_list = corpus.generate_queries(queries, seed=size)
+            faq_latency = _latency(manager.search_similar_faqs, [(q,) for q in query_list])
+            knowledge_latency = _latency(manager.search_knowledge, [(f"{q} tài liệu",) for q in query_list])
+        results.append({"case": f"faqs={size}", "collection": "faqs", **faq_latency})
+        results.append({"case": f"knowledge={size}", "collection": "knowledge", "chunks": knowledge_chunks,
+                        **knowledge_latency})
+    return results
+
+def bench_logging(sizes: Dict[str, Any], queries: int, **_) -> List[Dict[str, Any]]:
+    results = []
+    appends = max(10, queries // 10)
+    for length in sizes["session_lengths"]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            conv_logger = ConversationLogger(log_dir=tmp_dir)
+            conv_logger.log_conversation("bench-session", corpus.generate_messages(length, seed=length))
+            new_messages = corpus.generate_messages(appends, seed=length + 1)
+            latency = _latency(conv_logger.log_message, [("bench-session", m) for m in new_messages])
+        results.append({"case": f"session_messages={length}", **latency})
+    return results
+
+def bench_analytics(sizes: Dict[str, Any], **_) -> List[Dict[str, Any]]:
+    results = []
+    for files in sizes["session_files"]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            conv_logger = ConversationLogger(log_dir=tmp_dir)
+            messages = corpus.generate_messages(10, seed=files)
+            for i in range(files):
+                conv_logger.log_conversation(f"session-{i}", messages)
+            seconds = _best_of(lambda: conv_logger.get_session_analytics(days=7), 3)
+        results.append({"case": f"session_files={files}", "elapsed_ms": round(seconds * 1000, 2)})
+    return results
+
+def bench_functions(sizes: Dict[str, Any], queries: int, **_) -> List[Dict[str, Any]]:
+    # The handlers read module-level catalogs; swap their contents in place and restore afterwards
+    catalogs = (openai_functions.COURSES_DATA, openai_functions.EXAM_SCHEDULE)
+    originals = [list(catalog) for catalog in catalogs]
+    results = []
+    try:
+        for size in sizes["catalog_sizes"]:
+            courses = corpus.generate_courses(size, seed=size)
+            catalogs[0][:] = courses
+            catalogs[1][:] = corpus.generate_exams(courses, seed=size)
+            course_ids = [(courses[i % size]["course_id"],) for i in range(0, queries * 7, 7)]
+            cases = {
+                "course_by_id": (openai_functions.get_course_info, course_ids),
+                "course_by_name_miss": (lambda: openai_functions.get_course_info(course_name="không tồn tại"), [()] * queries),
+                "exam_by_course": (openai_functions.get_exam_schedule, course_ids),
+                "all_courses": (openai_functions.get_all_courses, [()] * max(5, queries // 20))
+            }
+            for name, (func, args_list) in cases.items():
+                results.append({"case": f"{name},catalog={size}", **_latency(func, args_list)})
+    finally:
+        for catalog, original in zip(catalogs, originals):
+            catalog[:] = original
+    return results
+
+BENCHMARKS = {
+    "chunk_text": bench_chunk_text,
+    "ingest": bench_ingest,
+    "search": bench_search,
+    "logging": bench_logging,
+    "analytics": bench_analytics,
+    "functions": bench_functions
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes (CI smoke run)")
+    parser.add_argument("--queries", type=int, default=200, help="Timed calls per latency case")
+    parser.add_argument("--backend", default=VECTOR_STORE_BACKEND)
+    parser.add_argument("--embedder", choices=["hashing", "model"], default="hashing")
+    parser.add_argument("--output", help="Write results JSON here instead of stdout")
+    parser.add_argument("--baseline", help="Compare against this results file")
+    parser.add_argument("--save-baseline", help="Also store the results as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown per metric")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.embedder == "hashing":
+        chroma_manager.create_embedding_function = HashingEmbedder
+
+    sizes = SIZES["quick" if args.quick else "full"]
+    results = {
+        "meta": {**baseline.metadata(), "preset": "quick" if args.quick else "full",
+                 "backend": args.backend, "embedder": args.embedder, "queries": args.queries},
+        "results": {}
+    }
+    for name in args.only:
+        started = time.perf_counter()
+        results["results"][name] = BENCHMARKS[name](sizes, backend=args.backend, queries=args.queries)
+        print(f"{name} done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    if args.output:
+        baseline.save(results, args.output)
+    else:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.save_baseline:
+        baseline.save(results, args.save_baseline)
+
+    if args.baseline:
+        stored = baseline.load(args.baseline)
+        if stored is None:
+            raise SystemExit(f"Baseline not found: {args.baseline}")
+        if stored["meta"].get("preset") != results["meta"]["preset"]:
+            print("Baseline was recorded with a different preset; only matching cases are compared", file=sys.stderr)
+        if baseline.report(baseline.compare(results, stored, args.tolerance)):
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Vector store backends: ingest throughput, cold start and query latency
+
+Run from backend/:
+    python -m benchmarks.bench_vector_stores --sizes 1000 10000
+"""
+import argparse
+import json
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from vector_store import VECTOR_STORE_BACKENDS, get_vector_store_backend
+
+CATEGORIES = ["tuition", "registration", "services", "exams", "regulations"]
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p99 of latency samples in microseconds"""
+    values = np.asarray(samples) * 1e6
+    return {
+        "p50_us": round(float(np.percentile(values, 50)), 1),
+        "p99_us": round(float(np.percentile(values, 99)), 1)
+    }
+
+def bench_backend(backend: str, size: int, dim: int, n_queries: int, top_k: int) -> Dict[str, object]:
+    """Ingest, reopen and query one backend"""
+    rng = np.random.default_rng(size)
+    embeddings = rng.standard_normal((size, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries = rng.standard_normal((n_queries, dim)).astype(np.float32).tolist()
+    result = {"backend": backend, "size": size, "dim": dim}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = get_vector_store_backend(backend, tmp_dir).open("bench_collection")
+
+        start = time.perf_counter()
+        for offset in range(0, size, 500):
+            batch = range(offset, min(offset + 500, size))
+            store.add(
+                ids=[f"chunk-{i}" for i in batch],
+                embeddings=embeddings[offset:offset + 500].tolist(),
+                documents=[f"Đoạn văn bản số {i}" for i in batch],
+                metadatas=[{"category": CATEGORIES[i % len(CATEGORIES)], "chunk_index": i} for i in batch]
+            )
+        elapsed = time.perf_counter() - start
+        result["ingest_per_sec"] = round(size / elapsed, 1)
+
+        # Cold start: fresh backend object over the persisted data, then one query
+        start = time.perf_counter()
+        reopened = get_vector_store_backend(backend, tmp_dir).open("bench_collection")
+        reopened.query(query_embeddings=[queries[0]], n_results=top_k)
+        result["cold_start_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        for label, where in (("query", None), ("query_filtered", {"category": "exams"})):
+            samples = []
+            for query in queries:
+                start = time.perf_counter()
+                reopened.query(query_embeddings=[query], n_results=top_k, where=where)
+                samples.append(time.perf_counter() - start)
+            result[label] = _percentiles(samples)
+
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(VECTOR_STORE_BACKENDS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        for backend in args.backends:
+            try:
+                results.append(bench_backend(backend, size, args.dim, args.queries, args.top_k))
+            except ImportError as e:
+                results.append({"backend": backend, "size": size, "error": str(e)})
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Synthetic Vietnamese corpus for benchmarks
+
+Seeded generators for documents, FAQs, queries, chat messages and course
+catalogs. Text is assembled from university-support vocabulary so that
+length, diacritics and word distribution resemble real uploads; the same
+seed always produces the same corpus.
+"""
+import random
+from typing import Dict, Any, List
+
+SUBJECTS = [
+    "Sinh viên", "Phòng đào tạo", "Ký túc xá", "Thư viện", "Giảng viên", "Khoa công nghệ thông tin",
+    "Phòng công tác sinh viên", "Ban quản lý", "Học viên cao học", "Nhà trường", "Cố vấn học tập"
+]
+VERBS = [
+    "cần đăng ký", "phải hoàn thành", "được miễn giảm", "có thể nộp", "sẽ thông báo", "được hỗ trợ",
+    "cần liên hệ", "phải đóng", "được xét duyệt", "có thể hủy", "cần bổ sung", "được cấp"
+]
+OBJECTS = [
+    "học phí học kỳ", "học bổng khuyến khích", "môn học tự chọn", "lịch thi cuối kỳ", "giấy xác nhận sinh viên",
+    "hồ sơ nội trú", "thẻ thư viện", "điểm rèn luyện", "đơn phúc khảo", "chứng chỉ ngoại ngữ",
+    "kế hoạch học tập", "phòng ký túc xá", "hoạt động ngoại khóa", "tín chỉ tích lũy", "khóa luận tốt nghiệp"
+]
+QUALIFIERS = [
+    "trước ngày 15 hằng tháng", "theo quy định hiện hành", "qua cổng thông tin đào tạo", "tại phòng A101",
+    "trong vòng hai tuần", "khi có thông báo mới", "nếu đủ điều kiện", "vào đầu mỗi học kỳ",
+    "theo hướng dẫn của khoa", "bằng hình thức trực tuyến", "sau khi có kết quả", "trong giờ hành chính"
+]
+QUESTION_FORMS = [
+    "Làm thế nào để {verb} {obj}?", "Khi nào {subject} {verb} {obj}?", "{subject} {verb} {obj} ở đâu?",
+    "Điều kiện để {verb} {obj} là gì?", "Cho mình hỏi về {obj} với ạ", "Em muốn biết thủ tục {obj}"
+]
+CATEGORIES = ["tuition", "registration", "services", "exams", "regulations", "dormitory", "scholarship"]
+
+def sentence(rng: random.Random) -> str:
+    return f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(QUALIFIERS)}."
+
+def paragraph(rng: random.Random, min_sentences: int = 3, max_sentences: int = 8) -> str:
+    return " ".join(sentence(rng) for _ in range(rng.randint(min_sentences, max_sentences)))
+
+def generate_text(size_bytes: int, seed: int = 0) -> str:
+    """
+    Document text of about size_bytes UTF-8 bytes
+
+    Paragraphs are drawn from a pool of 2,000 generated ones, so 100 MB is
+    produced in a few seconds.
+    """
+    rng = random.Random(seed)
+    pool = [paragraph(rng) for _ in range(2000)]
+    pool_bytes = [len(p.encode("utf-8")) + 2 for p in pool]
+    parts, total = [], 0
+    while total < size_bytes:
+        index = rng.randrange(len(pool))
+        parts.append(pool[index])
+        total += pool_bytes[index]
+    return "\n\n".join(parts)
+
+def generate_documents(count: int, size_bytes: int, seed: int = 0) -> List[Dict[str, str]]:
+    """Documents with distinct titles: [{"title", "content", "category"}]"""
+    rng = random.Random(seed)
+    return [
+        {
+            "title": f"Tài liệu {rng.choice(OBJECTS)} {i}",
+            "content": generate_text(size_bytes, seed=seed * 100003 + i),
+            "category": rng.choice(CATEGORIES)
+        }
+        for i in range(count)
+    ]
+
+def question(rng: random.Random) -> str:
+    return rng.choice(QUESTION_FORMS).format(subject=rng.choice(SUBJECTS).lower(), verb=rng.choice(VERBS),
+                                             obj=rng.choice(OBJECTS))
+
+def generate_faqs(count: int, seed: int = 0) -> List[Dict[str, str]]:
+    """FAQs: [{"question", "answer", "category"}]; questions are suffixed so none repeat"""
+    rng = random.Random(seed)
+    return [
+        {"question": f"{question(rng)} ({i})", "answer": paragraph(rng, 1, 3), "category": rng.choice(CATEGORIES)}
+        for i in range(count)
+    ]
+
+def generate_queries(count: int, seed: int = 0) -> List[str]:
+    """Distinct user questions (distinct so the retrieval cache never answers them)"""
+    rng = random.Random(seed)
+    return [f"{question(rng)} #{i}" for i in range(count)]
+
+def generate_messages(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Alternating user/assistant chat messages as passed to ConversationLogger.log_message"""
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        if i % 2 == 0:
+            messages.append({"role": "user", "content": question(rng)})
+        else:
+            messages.append({"role": "assistant", "content": paragraph(rng, 2, 5),
+                             "source": rng.choice(["faq", "openai", "function"])})
+    return messages
+
+def generate_courses(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Course catalog entries with the fields of data/courses.json"""
+    rng = random.Random(seed)
+    return [
+        {
+            "course_id": f"CS{1000 + i}",
+            "course_name": f"{rng.choice(OBJECTS).capitalize()} nâng cao {i}",
+            "instructor": f"TS. {rng.choice(['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng'])} Văn {rng.choice(['An', 'Bình', 'Cường', 'Dũng'])} {i}",
+            "schedule": f"Thứ {rng.randint(2, 7)}, {rng.randint(7, 15)}:00-{rng.randint(8, 17)}:30",
+            "room": f"{rng.choice('ABCD')}{rng.randint(100, 599)}",
+            "credits": rng.randint(2, 4),
+            "description": sentence(rng),
+            "prerequisites": [f"CS{1000 + rng.randrange(max(i, 1))}"] if i and rng.random() < 0.3 else []
+        }
+        for i in range(count)
+    ]
+
+def generate_exams(courses: List[Dict[str, Any]], seed: int = 0) -> List[Dict[str, Any]]:
+    """One exam per course with the fields of data/exams.json"""
+    rng = random.Random(seed)
+    return [
+        {
+            "course_id": course["course_id"],
+            "exam_type": rng.choice(["Giữa kỳ", "Cuối kỳ"]),
+            "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "time": f"{rng.randint(7, 16)}:00",
+            "room": course["room"],
+            "duration": rng.choice([60, 90, 120])
+        }
+        for course in courses
+    ]
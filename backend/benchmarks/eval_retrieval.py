@@ -0,0 +1,259 @@
+"""
+Retrieval quality vs cost: sweep RAG and FAQ settings over a labelled query set
+
+The labelled set (benchmarks/data/retrieval_eval.json) holds paraphrases of
+the default FAQs and questions about the sample documents in
+frontend/public/documents, each tagged with the document and an evidence span
+that a useful chunk must contain. For every chunking (the fixed splitter per
+chunk size / overlap, and the semantic chunker with --chunkers) the documents
+are ingested into a fresh store; every RAG_TOP_K x RAG_RELEVANCE_THRESHOLD
+pair then reports recall@k, MRR, the prompt tokens the retrieved context adds
+and search latency (threshold 0.0 keeps every hit, i.e. the raw ranking).
+Configurations on the Pareto front (no other config is at least as good on
+recall, MRR, tokens and p50 latency and better on one) are flagged with
+"pareto": true, the production settings with "current": true.
+
+FAQ thresholds are swept the same way: a query is answered from an FAQ when
+the top match scores at least the threshold (production requires both
+FAQ_SIMILARITY_THRESHOLD and FAQ_CONFIDENCE_THRESHOLD, i.e. their maximum).
+Document questions serve as negatives that no FAQ should answer.
+
+Run from backend/:
+    python -m benchmarks.eval_retrieval
+    python -m benchmarks.eval_retrieval --chunk-sizes 500 1000 --overlaps 100 200 --top-k 3 5 --output eval.json
+    python -m benchmarks.eval_retrieval --chunkers fixed semantic
+
+The default --embedder model uses the configured EMBEDDING_PROVIDER (quality
+numbers are only meaningful with the real model); --embedder hashing is a fast
+smoke run.
+"""
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional
+
+import numpy as np
+
+import chroma_manager
+from chroma_manager import ChromaDBManager
+from config import (
+    VECTOR_STORE_BACKEND, RAG_TOP_K, RAG_RELEVANCE_THRESHOLD, DEFAULT_CHUNKER,
+    FAQ_TOP_K, FAQ_SIMILARITY_THRESHOLD, FAQ_CONFIDENCE_THRESHOLD
+)
+from utils.rag_utils import retrieve_context_from_knowledge_base
+from utils.chunking import CHUNKERS
+from benchmarks import baseline
+from benchmarks.bench_hot_paths import HashingEmbedder
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+EVAL_SET_PATH = BACKEND_DIR / "benchmarks" / "data" / "retrieval_eval.json"
+DOCUMENTS_DIR = BACKEND_DIR.parent / "frontend" / "public" / "documents"
+
+# Defaults of add_document_from_text, used by the upload routes
+CURRENT_CHUNK_SIZE = 1000
+CURRENT_CHUNK_OVERLAP = 200
+
+def token_counter() -> Callable[[str], int]:
+    """tiktoken's gpt-4o encoding if installed, else ~4 characters per token"""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text))
+    except ImportError:
+        return lambda text: (len(text) + 3) // 4
+
+def load_eval_set(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _is_relevant(item: Dict[str, Any], label: Dict[str, Any]) -> bool:
+    # Chunk titles are "<title>" or "<title> (Part i/n)"
+    title = item.get("title", "")
+    from_document = title == label["document"] or title.startswith(f"{label['document']} (Part ")
+    return from_document and label["evidence"] in item.get("content", "")
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3)
+    }
+
+def chunking_label(chunker: str, chunk_size: Optional[int], overlap: Optional[int]) -> str:
+    return f"chunk={chunk_size},overlap={overlap}" if chunker == "fixed" else f"chunker={chunker}"
+
+def eval_knowledge(labels: List[Dict[str, Any]], chunker: str, chunk_size: Optional[int], overlap: Optional[int],
+                   top_ks: List[int], thresholds: List[float], backend: str,
+                   count_tokens: Callable[[str], int]) -> List[Dict[str, Any]]:
+    """One row per top_k x threshold for a store built with this chunking (sizes are None for "semantic")"""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = ChromaDBManager(persist_directory=tmp_dir, backend=backend)
+        manager.warm_up()
+        for path in sorted(DOCUMENTS_DIR.glob("*.txt")):
+            sizes = {"chunk_size": chunk_size, "chunk_overlap": overlap} if chunker == "fixed" else {}
+            manager.add_document_from_text(title=path.stem, content=path.read_text(encoding="utf-8"),
+                                           category="eval", chunker=chunker, **sizes)
+        chunks = manager.knowledge_collection.count()
+
+        for top_k in top_ks:
+            # Timed on a cold retrieval cache; the threshold is a post-filter, so one search per query serves all
+            manager.retrieval_cache.clear()
+            latencies, results = [], []
+            for label in labels:
+                start = time.perf_counter()
+                results.append(manager.search_knowledge(label["query"], top_k=top_k))
+                latencies.append(time.perf_counter() - start)
+            latency = _percentiles(latencies)
+
+            for threshold in thresholds:
+                hits, reciprocal_ranks, tokens, empty = 0, [], [], 0
+                for label, items in zip(labels, results):
+                    kept = [item for item in items if item.get("relevance", 0) >= threshold]
+                    rank = next((i + 1 for i, item in enumerate(kept) if _is_relevant(item, label)), None)
+                    hits += rank is not None
+                    reciprocal_ranks.append(1 / rank if rank else 0.0)
+                    # Same formatting as the chat pipeline (served from the retrieval cache)
+                    context = retrieve_context_from_knowledge_base(manager, label["query"], top_k=top_k,
+                                                                   relevance_threshold=threshold)
+                    tokens.append(count_tokens(context))
+                    empty += not context
+                rows.append({
+                    "case": f"{chunking_label(chunker, chunk_size, overlap)},top_k={top_k},threshold={threshold}",
+                    "chunker": chunker,
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": overlap,
+                    "top_k": top_k,
+                    "threshold": threshold,
+                    "chunks": chunks,
+                    "recall_at_k": round(hits / len(labels), 4),
+                    "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+                    "context_tokens_mean": round(float(np.mean(tokens)), 1),
+                    "context_tokens_max": int(max(tokens)),
+                    "empty_context_rate": round(empty / len(labels), 4),
+                    **latency,
+                    "current": (top_k, threshold) == (RAG_TOP_K, RAG_RELEVANCE_THRESHOLD) and chunker == DEFAULT_CHUNKER
+                               and (chunker != "fixed" or (chunk_size, overlap) == (CURRENT_CHUNK_SIZE, CURRENT_CHUNK_OVERLAP))
+                })
+    return rows
+
+def eval_faq(positives: List[Dict[str, Any]], negatives: List[str], thresholds: List[float],
+             backend: str) -> List[Dict[str, Any]]:
+    """One row per threshold: correct / wrong answers on paraphrases, false answers on negatives"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = ChromaDBManager(persist_directory=tmp_dir, backend=backend)
+        manager.warm_up()
+
+        def top_match(query: str):
+            start = time.perf_counter()
+            # Threshold 0 returns the raw ranking; thresholds are applied below
+            faqs = manager.search_similar_faqs(query, top_k=FAQ_TOP_K, similarity_threshold=0.0)["faqs"]
+            return (faqs[0] if faqs else None), time.perf_counter() - start
+
+        positive_matches = [(label, *top_match(label["query"])) for label in positives]
+        negative_matches = [top_match(query) for query in negatives]
+
+    latency = _percentiles([seconds for _, _, seconds in positive_matches] + [seconds for _, seconds in negative_matches])
+    current = max(FAQ_SIMILARITY_THRESHOLD, FAQ_CONFIDENCE_THRESHOLD)
+    rows = []
+    for threshold in thresholds:
+        answered = [(label, match) for label, match, _ in positive_matches
+                    if match and match["similarity"] >= threshold]
+        correct = sum(1 for label, match in answered if match["question"] == label["faq"])
+        false_answers = sum(1 for match, _ in negative_matches if match and match["similarity"] >= threshold)
+        rows.append({
+            "case": f"faq_threshold={threshold}",
+            "threshold": threshold,
+            "recall": round(correct / len(positives), 4),
+            "wrong_answer_rate": round((len(answered) - correct) / len(positives), 4),
+            "false_answer_rate": round(false_answers / len(negatives), 4),
+            **latency,
+            "current": threshold == current
+        })
+    return rows
+
+def mark_pareto(rows: List[Dict[str, Any]]):
+    """
+    Flag rows not dominated on (recall_at_k, mrr) up and (context_tokens_mean, p50_ms) down
+
+    Latencies within the benchmark noise floor count as equal; configs that
+    never retrieve the evidence are not candidates.
+    """
+    noise_floor_ms = baseline.NOISE_FLOOR_S * 1000
+
+    def key(row):
+        return (row["recall_at_k"], row["mrr"], -row["context_tokens_mean"], -round(row["p50_ms"] / noise_floor_ms))
+
+    for row in rows:
+        own = key(row)
+        row["pareto"] = row["recall_at_k"] > 0 and not any(
+            all(a >= b for a, b in zip(key(other), own)) and key(other) != own
+            for other in rows
+        )
+
+def print_table(knowledge: List[Dict[str, Any]], faq: List[Dict[str, Any]], stream=sys.stderr):
+    print(f"{'':2} {'chunking':>9} {'k':>2} {'thr':>5} {'recall':>7} {'mrr':>6} {'tokens':>7} {'p50_ms':>8}",
+          file=stream)
+    for row in sorted(knowledge, key=lambda r: (not r["pareto"], -r["recall_at_k"], r["context_tokens_mean"])):
+        flag = ("*" if row["pareto"] else " ") + ("C" if row["current"] else " ")
+        chunking = f"{row['chunk_size']}/{row['chunk_overlap']}" if row["chunker"] == "fixed" else row["chunker"]
+        print(f"{flag:2} {chunking:>9} {row['top_k']:>2} {row['threshold']:>5} "
+              f"{row['recall_at_k']:>7.3f} {row['mrr']:>6.3f} {row['context_tokens_mean']:>7.0f} {row['p50_ms']:>8.2f}",
+              file=stream)
+    print("* Pareto front, C current settings\n", file=stream)
+    for row in faq:
+        flag = "C" if row["current"] else " "
+        print(f"{flag} faq_threshold={row['threshold']:<5} recall {row['recall']:.3f}  wrong {row['wrong_answer_rate']:.3f}  "
+              f"false answers {row['false_answer_rate']:.3f}", file=stream)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eval-set", default=str(EVAL_SET_PATH))
+    parser.add_argument("--chunkers", nargs="+", choices=CHUNKERS, default=["fixed"])
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[300, 500, 1000])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 100, 200])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.0, 0.01, 0.2, 0.3, 0.4, 0.5, 0.7])
+    parser.add_argument("--faq-thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9])
+    parser.add_argument("--backend", default=VECTOR_STORE_BACKEND)
+    parser.add_argument("--embedder", choices=["model", "hashing"], default="model")
+    parser.add_argument("--output", help="Write results JSON here instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.embedder == "hashing":
+        chroma_manager.create_embedding_function = HashingEmbedder
+
+    eval_set = load_eval_set(args.eval_set)
+    count_tokens = token_counter()
+    chunkings = [("semantic", None, None)] if "semantic" in args.chunkers else []
+    if "fixed" in args.chunkers:
+        chunkings += [("fixed", size, overlap) for size in args.chunk_sizes for overlap in args.overlaps if overlap < size]
+    knowledge = []
+    for chunker, chunk_size, overlap in chunkings:
+        started = time.perf_counter()
+        knowledge += eval_knowledge(eval_set["knowledge"], chunker, chunk_size, overlap, args.top_k, args.thresholds,
+                                    args.backend, count_tokens)
+        print(f"{chunking_label(chunker, chunk_size, overlap)} done in {time.perf_counter() - started:.1f}s",
+              file=sys.stderr)
+    mark_pareto(knowledge)
+    faq = eval_faq(eval_set["faq"], [label["query"] for label in eval_set["knowledge"]], args.faq_thresholds,
+                   args.backend)
+
+    results = {
+        "meta": {**baseline.metadata(), "backend": args.backend, "embedder": args.embedder,
+                 "faq_queries": len(eval_set["faq"]), "knowledge_queries": len(eval_set["knowledge"])},
+        "results": {"knowledge": knowledge, "faq": faq}
+    }
+    print_table(knowledge, faq)
+    if args.output:
+        baseline.save(results, args.output)
+    else:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -2,99 +2,195 @@
 ChromaDB Manager for University Assistant
 Handles semantic search, FAQ storage, and query logging
 """
-import chromadb
-import json
+import hashlib
+import itertools
+import os
+import threading
+import time
 import uuid
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from pathlib import Path
 import logging
 
+from config import (
+    FAQ_INDEX_ENABLED, FAQ_INDEX_QUANTIZE, VECTOR_STORE_BACKEND,
+    RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_FOLD_DIACRITICS,
+    QUERY_LOG_MAX_AGE_DAYS, QUERY_LOG_MAX_ENTRIES, QUERY_LOG_COMPACTION_INTERVAL_HOURS,
+    FAQ_SEED_BUNDLE_PATH, EMBEDDING_MICROBATCH_ENABLED, EMBEDDING_MICROBATCH_MAX_SIZE,
+    EMBEDDING_MICROBATCH_MAX_WAIT_MS, DEFAULT_CHUNKER, UPSERT_CHUNKER,
+    DOCUMENT_INGEST_BATCH_SIZE
+)
+from embedding_batcher import EmbeddingBatcher
+from embeddings import create_embedding_function, embedding_model_id, reset_after_fork, InstrumentedEmbeddingFunction
+from data_loader import load_default_faqs
+from faq_seed import load_bundle
+from faq_index import FAQIndex
+from vector_store import get_vector_store_backend
+from response_archive import ResponseArchive
+from process_lock import InterProcessLock, LeaderLock, SharedCounter
+from utils.retrieval_cache import RetrievalCache, normalize_query
+from utils.chunking import iter_chunks, iter_fixed_chunks
+from utils.tracing import traced, span, record_span
+from utils.metrics import VECTOR_QUERY_LATENCY, RETRIEVAL_CACHE_LOOKUPS, LOG_WRITE_LATENCY, get_metrics_registry
+
 # Setup logging
 logger = logging.getLogger(__name__)
 
 class ChromaDBManager:
-    def __init__(self, persist_directory="./chroma_db"):
+    def __init__(self, persist_directory="./chroma_db", backend: str = VECTOR_STORE_BACKEND):
         """
         Initialize ChromaDB Manager
         
         Args:
             persist_directory (str): Directory to store ChromaDB data
+            backend (str): Vector store backend ("chroma" or "flat")
         """
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(exist_ok=True)
         
+        # Serialize document upserts so two re-uploads of the same title cannot interleave
+        self._document_write_lock = threading.Lock()
+        
+        # Writes are serialized across threads and worker processes sharing this directory
+        self._write_lock = InterProcessLock(self.persist_directory / ".write.lock")
+        
+        # Search results cached per (collection version, normalized query); versions live in
+        # files bumped on every write, so a write in one worker invalidates every worker's cache
+        self.retrieval_cache = RetrievalCache(RETRIEVAL_CACHE_SIZE)
+        self.embedding_model_loaded = False
+        get_metrics_registry().register_collector(self._cache_metrics)
+        self._collection_versions = {
+            collection: SharedCounter(self.persist_directory / f"{collection}.version")
+            for collection in ("faqs", "knowledge")
+        }
+        
+        # Query log: dedup/retention state và response archive (response không nằm trong metadata)
+        self._query_log_lock = threading.Lock()
+        self._compaction_stop = threading.Event()
+        self._compaction_leader = LeaderLock(self.persist_directory / ".compaction.lock")
+        self.last_compaction_report: Optional[Dict[str, Any]] = None
+        self.response_archive = ResponseArchive(self.persist_directory / "query_responses.jsonl")
+        
+        # In-memory FAQ matcher used by search_similar_faqs (None = query Chroma directly)
+        self.faq_index = FAQIndex(quantize=FAQ_INDEX_QUANTIZE) if FAQ_INDEX_ENABLED else None
+        self._faq_index_version = None
+        
         try:
-            # Initialize ChromaDB client
-            self.client = chromadb.PersistentClient(path=str(self.persist_directory))
+            # Initialize vector store backend (Chroma or memory-mapped flat index)
+            self.backend_name = backend
+            self.backend = get_vector_store_backend(backend, self.persist_directory)
             logger.info(f"ChromaDB initialized at: {self.persist_directory}")
             
-            # Create or get collections
-            self.faq_collection = self.client.get_or_create_collection(
-                name="faqs",
-                metadata={"description": "Frequently asked questions"}
-            )
+            # Shared embedding function, also used to embed queries for the FAQ index
+            self._base_embedding_function = create_embedding_function()
+            self.embedding_function = InstrumentedEmbeddingFunction(self._base_embedding_function)
             
-            self.queries_collection = self.client.get_or_create_collection(
-                name="user_queries", 
-                metadata={"description": "User query logs with responses"}
-            )
+            # Document chunks are embedded directly: they come in bulk and would only wait in the batcher
+            self.document_embedding_function = self.embedding_function
             
-            self.knowledge_collection = self.client.get_or_create_collection(
-                name="knowledge_base",
-                metadata={"description": "University knowledge base"}
-            )
+            # Concurrent FAQ/knowledge searches and query logging share batched forward passes
+            self.embedding_batcher = None
+            if EMBEDDING_MICROBATCH_ENABLED:
+                self.embedding_batcher = EmbeddingBatcher(
+                    self.embedding_function,
+                    max_batch=EMBEDDING_MICROBATCH_MAX_SIZE,
+                    max_wait_ms=EMBEDDING_MICROBATCH_MAX_WAIT_MS
+                )
+                self.embedding_function = self.embedding_batcher
+            
+            # Create or get collections
+            self._open_collections()
             
             # Initialize with default FAQs
             self._initialize_default_faqs()
             
+            # Load FAQ embeddings into memory
+            self._rebuild_faq_index()
+            
         except Exception as e:
             logger.error(f"Error initializing ChromaDB: {e}")
             raise
     
+    def _open_collections(self):
+        """Mở (hoặc tạo) các collection trên vector store backend hiện tại"""
+        self.faq_collection = self.backend.open(
+            name="faqs",
+            metadata={"description": "Frequently asked questions"},
+            embedding_function=self.embedding_function
+        )
+        
+        self.queries_collection = self.backend.open(
+            name="user_queries", 
+            metadata={"description": "User query logs with responses"},
+            embedding_function=self.embedding_function
+        )
+        
+        self.knowledge_collection = self.backend.open(
+            name="knowledge_base",
+            metadata={"description": "University knowledge base"},
+            embedding_function=self.embedding_function
+        )
+    
+    def reopen_after_fork(self):
+        """
+        Gọi trong mỗi worker process sau khi fork (gunicorn preload)
+        
+        Model weights, FAQ index và các module đã import được chia sẻ copy-on-write
+        với process cha; chỉ các SQLite/Chroma handle và ONNX Runtime session
+        (thread pool không tồn tại sau fork) được mở lại.
+        """
+        if self.backend_name == "chroma":
+            # Chroma giữ một System (kèm SQLite connection) cho mỗi path trong cache cấp class
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        
+        self.backend = get_vector_store_backend(self.backend_name, self.persist_directory)
+        self._open_collections()
+        reset_after_fork(self._base_embedding_function)
+        logger.info(f"Reopened vector store in worker {os.getpid()}")
+    
+    def warm_up(self):
+        """Load embedding model weights bằng một lần embed thử, để request đầu tiên không phải chờ"""
+        self.embedding_function(["khởi động"])
+        self.embedding_model_loaded = True
+        logger.info("Embedding model warmed up")
+    
     def _initialize_default_faqs(self):
-        """Initialize với một số FAQs mặc định về trường đại học"""
-        default_faqs = [
-            {
-                "question": "Học phí một tín chỉ đại học bao nhiêu?",
-                "answer": "Học phí đại học là 1,500,000 VND/tín chỉ. Bạn có thể dùng tính năng tính học phí để biết tổng chi phí cho số tín chỉ mong muốn.",
-                "category": "tuition"
-            },
-            {
-                "question": "Làm thế nào để đăng ký môn học?",
-                "answer": "Bạn có thể đăng ký môn học thông qua hệ thống online của trường hoặc liên hệ phòng đào tạo. Vui lòng kiểm tra lịch đăng ký để biết thời gian chính xác.",
-                "category": "registration"
-            },
-            {
-                "question": "Thư viện mở cửa vào giờ nào?",
-                "answer": "Thư viện mở cửa từ Thứ 2-Chủ Nhật: 7:00-22:00. Bạn có thể sử dụng dịch vụ học tập 24/7 tại khu vực tự học.",
-                "category": "services"
-            },
-            {
-                "question": "Khi nào có lịch thi cuối kỳ?",
-                "answer": "Lịch thi cuối kỳ thường được công bố 2 tuần trước kỳ thi. Bạn có thể kiểm tra lịch thi cụ thể cho từng môn học trong hệ thống.",
-                "category": "exams"
-            },
-            {
-                "question": "Tôi cần hỗ trợ tư vấn học tập ở đâu?",
-                "answer": "Dịch vụ tư vấn học tập có tại Phòng 201, Tòa A. Thời gian: Thứ 2-Thứ 6: 8:00-17:00. Email: tuvan@university.edu.vn",
-                "category": "services"
-            }
-        ]
+        """
+        Initialize với FAQs mặc định về trường đại học (data/default_faqs.json)
         
+        Dùng seed bundle có sẵn embeddings nếu khớp model và danh sách FAQ,
+        nếu không thì embed tất cả câu hỏi trong một batch.
+        """
         try:
-            existing_count = self.faq_collection.count()
-            if existing_count == 0:
-                logger.info("Adding default FAQs to ChromaDB...")
-                for faq in default_faqs:
-                    self.add_faq(
-                        question=faq["question"],
-                        answer=faq["answer"], 
-                        category=faq["category"]
+            # Workers started without preload must not all seed an empty collection
+            with self._write_lock:
+                existing_count = self.faq_collection.count()
+                if existing_count == 0:
+                    logger.info("Adding default FAQs to ChromaDB...")
+                    default_faqs = load_default_faqs()
+                    seed = load_bundle(FAQ_SEED_BUNDLE_PATH, embedding_model_id(), default_faqs)
+                    embeddings = None
+                    if seed is not None:
+                        default_faqs, embeddings = seed
+                        logger.info("Using precomputed FAQ seed bundle")
+                
+                    created_at = datetime.now().isoformat()
+                    self.faq_collection.add(
+                        documents=[faq["question"] for faq in default_faqs],
+                        metadatas=[{
+                            "answer": faq["answer"],
+                            "category": faq["category"],
+                            "created_at": created_at
+                        } for faq in default_faqs],
+                        embeddings=embeddings,
+                        ids=[str(uuid.uuid4()) for _ in default_faqs]
                     )
-                logger.info(f"Added {len(default_faqs)} default FAQs")
-            else:
-                logger.info(f"ChromaDB already has {existing_count} FAQs")
+                    self._bump_version("faqs")
+                    logger.info(f"Added {len(default_faqs)} default FAQs")
+                else:
+                    logger.info(f"ChromaDB already has {existing_count} FAQs")
                 
         except Exception as e:
             logger.error(f"Error initializing default FAQs: {e}")
@@ -112,25 +208,62 @@ class ChromaDBManager:
             str: ID của FAQ đã thêm
         """
         try:
-            faq_id = str(uuid.uuid4())
-            
-            self.faq_collection.add(
-                documents=[question],
-                metadatas=[{
-                    "answer": answer,
-                    "category": category,
-                    "created_at": datetime.now().isoformat()
-                }],
-                ids=[faq_id]
-            )
+            with self._write_lock:
+                faq_id = str(uuid.uuid4())
+            
+                self.faq_collection.add(
+                    documents=[question],
+                    metadatas=[{
+                        "answer": answer,
+                        "category": category,
+                        "created_at": datetime.now().isoformat()
+                    }],
+                    ids=[faq_id]
+                )
             
             logger.info(f"Added FAQ: {question[:50]}... (Category: {category})")
+            
+            self._bump_version("faqs")
+            self._rebuild_faq_index()
             return faq_id
             
         except Exception as e:
             logger.error(f"Error adding FAQ: {e}")
             raise
     
+    def _bump_version(self, collection: str):
+        """Tăng version của collection sau mỗi lần ghi (vô hiệu hóa cache kết quả cũ ở mọi worker)"""
+        with self._write_lock:
+            self._collection_versions[collection].increment()
+    
+    def _cache_key(self, collection: str, query: str, *params) -> tuple:
+        """Cache key: collection, version hiện tại, query đã chuẩn hóa và tham số tìm kiếm"""
+        return (
+            collection,
+            self._collection_versions[collection].read(),
+            normalize_query(query, RETRIEVAL_CACHE_FOLD_DIACRITICS),
+            *params
+        )
+    
+    def _rebuild_faq_index(self):
+        """Nạp lại toàn bộ FAQ embeddings từ ChromaDB vào FAQ index trong bộ nhớ"""
+        if self.faq_index is None:
+            return
+        
+        try:
+            version = self._collection_versions["faqs"].read()
+            all_faqs = self.faq_collection.get(include=['documents', 'metadatas', 'embeddings'])
+            self.faq_index.build(
+                all_faqs['documents'] or [],
+                all_faqs['embeddings'] or [],
+                all_faqs['metadatas'] or []
+            )
+            self._faq_index_version = version
+        except Exception as e:
+            # Index cũ vẫn được giữ; search fallback về ChromaDB nếu index rỗng
+            logger.error(f"Error rebuilding FAQ index: {e}")
+    
+    @traced("chroma.search_faqs")
     def search_similar_faqs(self, query: str, top_k: int = 3, similarity_threshold: float = 0.7) -> Dict[str, Any]:
         """
         Tìm FAQs tương tự dựa trên semantic search
@@ -143,11 +276,34 @@ class ChromaDBManager:
         Returns:
             Dict: Kết quả tìm kiếm với FAQs và độ tin cậy
         """
+        cache_key = self._cache_key("faqs", query, top_k, similarity_threshold)
+        hit, cached = self.retrieval_cache.get(cache_key)
+        RETRIEVAL_CACHE_LOOKUPS.inc(collection="faqs", result="hit" if hit else "miss")
+        if hit:
+            return cached
+        
         try:
-            results = self.faq_collection.query(
-                query_texts=[query],
-                n_results=top_k
-            )
+            if self.faq_index is not None and self._faq_index_version != cache_key[1]:
+                # FAQ được thêm bởi worker khác
+                self._rebuild_faq_index()
+            
+            if self.faq_index is not None and len(self.faq_index) > 0:
+                # Hot path: tìm trong FAQ index trong bộ nhớ, cùng format kết quả với ChromaDB
+                with VECTOR_QUERY_LATENCY.time(collection="faqs"):
+                    with span("embed"):
+                        query_embedding = self.embedding_function([query])[0]
+                    hits = self.faq_index.search(query_embedding, top_k=top_k)
+                results = {
+                    'documents': [[question for question, _, _ in hits]],
+                    'metadatas': [[metadata for _, metadata, _ in hits]],
+                    'distances': [[distance for _, _, distance in hits]]
+                }
+            else:
+                with VECTOR_QUERY_LATENCY.time(collection="faqs"):
+                    results = self.faq_collection.query(
+                        query_texts=[query],
+                        n_results=top_k
+                    )
             
             # Xử lý kết quả và tính độ tin cậy
             formatted_results = {
@@ -176,16 +332,30 @@ class ChromaDBManager:
                         formatted_results["confidence_scores"].append(similarity)
             
             logger.info(f"FAQ search for '{query}': {len(formatted_results['faqs'])} matches found")
+            self.retrieval_cache.put(cache_key, formatted_results)
             return formatted_results
             
         except Exception as e:
             logger.error(f"Error searching FAQs: {e}")
             return {"found_matches": False, "faqs": [], "confidence_scores": []}
     
+    def _cache_metrics(self):
+        """Gauge samples cho /api/metrics"""
+        yield ("retrieval_cache_entries", "Entries in the retrieval cache", {}, self.retrieval_cache.stats()["entries"])
+        if getattr(self, "embedding_batcher", None) is not None:
+            yield ("embedding_batcher_queued_requests", "Embedding requests waiting for a batched forward pass", {},
+                   self.embedding_batcher.stats()["queued_requests"])
+    
+    @traced("chroma.log_user_query")
     def log_user_query(self, query: str, response: str, session_id: str, source: str = "openai") -> str:
         """
         Log user query và response để phân tích sau này
         
+        Query lặp lại (sau khi chuẩn hóa) không tạo vector mới: entry cũ được tăng
+        count và cập nhật last_seen. session_id/source giữ giá trị lần đầu xuất hiện,
+        last_session_id/last_source là của response mới nhất. Response được lưu trong
+        response archive, metadata chỉ giữ generation và offset để collection luôn nhỏ.
+        
         Args:
             query (str): Câu hỏi của user
             response (str): Câu trả lời của bot
@@ -196,19 +366,40 @@ class ChromaDBManager:
             str: ID của log entry
         """
         try:
-            log_id = str(uuid.uuid4())
-            
-            self.queries_collection.add(
-                documents=[query],
-                metadatas=[{
-                    "response": response,
-                    "session_id": session_id,
-                    "source": source,
-                    "timestamp": datetime.now().isoformat(),
-                    "response_length": len(response)
-                }],
-                ids=[log_id]
-            )
+            normalized = normalize_query(query)
+            log_id = "q-" + hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:32]
+            now = datetime.now()
+            
+            lock_requested = time.perf_counter()
+            with LOG_WRITE_LATENCY.time(log="query_log"), self._query_log_lock, self._write_lock:
+                record_span("chroma.write_lock_wait", lock_requested)
+                response_generation, response_offset = self.response_archive.append(log_id, response, now.isoformat())
+                metadata = {
+                    "last_session_id": session_id,
+                    "last_source": source,
+                    "last_seen": now.isoformat(),
+                    "last_seen_ts": now.timestamp(),
+                    "response_length": len(response),
+                    "response_generation": response_generation,
+                    "response_offset": response_offset
+                }
+                
+                existing = self.queries_collection.get(ids=[log_id], include=['metadatas'])
+                if existing['ids']:
+                    # Dedup: không embed lại, chỉ cập nhật counter và metadata (update gộp key,
+                    # nên session_id/source lần đầu được giữ nguyên)
+                    metadata["count"] = int(existing['metadatas'][0].get("count", 1)) + 1
+                    self.queries_collection.update(ids=[log_id], metadatas=[metadata])
+                else:
+                    metadata["session_id"] = session_id
+                    metadata["source"] = source
+                    metadata["count"] = 1
+                    metadata["timestamp"] = now.isoformat()
+                    self.queries_collection.add(
+                        documents=[query],
+                        metadatas=[metadata],
+                        ids=[log_id]
+                    )
             
             logger.debug(f"Logged query: {query[:50]}... (Session: {session_id})")
             return log_id
@@ -217,6 +408,233 @@ class ChromaDBManager:
             logger.error(f"Error logging query: {e}")
             return ""
     
+    def get_logged_response(self, log_id: str) -> Optional[str]:
+        """
+        Lấy response gần nhất của một query đã log
+        
+        Args:
+            log_id (str): ID của log entry
+            
+        Returns:
+            Optional[str]: Response text, None nếu không tìm thấy
+        """
+        try:
+            # Compaction có thể xóa generation cũ giữa lúc đọc metadata và đọc archive:
+            # khi đó metadata đã trỏ sang generation mới, đọc lại một lần
+            for _ in range(2):
+                entry = self.queries_collection.get(ids=[log_id], include=['metadatas'])
+                if not entry['ids']:
+                    return None
+                metadata = entry['metadatas'][0]
+                if "response" in metadata:
+                    return metadata["response"]  # entry cũ chưa được compaction
+                archived = self.response_archive.read(metadata["response_offset"], metadata.get("response_generation", 0))
+                if archived and archived.get("id") == log_id:
+                    return archived["response"]
+            return None
+        except Exception as e:
+            logger.error(f"Error reading logged response: {e}")
+            return None
+    
+    def compact_query_log(self, max_age_days: int = QUERY_LOG_MAX_AGE_DAYS, max_entries: int = QUERY_LOG_MAX_ENTRIES,
+                          batch_size: int = 1000) -> Dict[str, Any]:
+        """
+        Dọn dẹp collection user_queries: xóa entry quá hạn hoặc vượt số lượng tối đa,
+        chuyển response còn nằm trong metadata sang response archive, ghi lại archive
+        và rebuild index
+        
+        Write lock chỉ được giữ trong từng batch nên log_user_query ở các worker khác
+        không phải chờ hết lần compaction; những gì được ghi giữa hai batch (last_seen_ts
+        mới hơn lúc bắt đầu copy) được copy bù trước khi chuyển sang bản mới.
+        
+        Args:
+            max_age_days (int): Xóa query không xuất hiện lại trong số ngày này
+            max_entries (int): Giữ tối đa số query gần nhất (theo last_seen)
+            batch_size (int): Số entry xử lý trong mỗi lần giữ write lock
+            
+        Returns:
+            Dict: Báo cáo compaction (số entry bị xóa/giữ, dung lượng thu hồi)
+        """
+        try:
+            with self._write_lock:
+                bytes_before = self._storage_size()
+                entries = self.queries_collection.get(include=['metadatas'])
+            cutoff_ts = datetime.now().timestamp() - max_age_days * 86400
+            last_seen = {
+                log_id: self._query_last_seen_ts(metadata)
+                for log_id, metadata in zip(entries['ids'], entries['metadatas'])
+            }
+            
+            expired = {log_id for log_id, ts in last_seen.items() if ts < cutoff_ts}
+            remaining = sorted(
+                (log_id for log_id, ts in last_seen.items() if ts >= cutoff_ts),
+                key=last_seen.__getitem__,
+                reverse=True
+            )
+            kept = set(remaining[:max_entries])
+            
+            # Xóa theo batch; entry xuất hiện lại sau snapshot (last_seen đã đổi) được giữ
+            to_delete = sorted(expired) + remaining[max_entries:]
+            removed = []
+            for start in range(0, len(to_delete), batch_size):
+                with self._write_lock:
+                    current = self.queries_collection.get(ids=to_delete[start:start + batch_size], include=['metadatas'])
+                    stale = [
+                        log_id for log_id, metadata in zip(current['ids'], current['metadatas'])
+                        if self._query_last_seen_ts(metadata) == last_seen[log_id]
+                    ]
+                    if stale:
+                        self.queries_collection.delete(ids=stale)
+                    removed.extend(stale)
+            
+            # Entry cũ còn response trong metadata: chuyển response sang archive và
+            # ghi lại entry (giữ nguyên embedding) với metadata đã bỏ response
+            legacy_ids = [
+                log_id for log_id, metadata in zip(entries['ids'], entries['metadatas'])
+                if log_id in kept and "response" in metadata
+            ]
+            for start in range(0, len(legacy_ids), batch_size):
+                with self._write_lock:
+                    legacy = self.queries_collection.get(
+                        ids=legacy_ids[start:start + batch_size],
+                        include=['documents', 'metadatas', 'embeddings']
+                    )
+                    cleaned = []
+                    for log_id, metadata in zip(legacy['ids'], legacy['metadatas']):
+                        metadata = dict(metadata)
+                        if "response" in metadata:
+                            response = metadata.pop("response")
+                            metadata["response_generation"], metadata["response_offset"] = self.response_archive.append(
+                                log_id, response, metadata.get("timestamp", "")
+                            )
+                        cleaned.append(metadata)
+                    self.queries_collection.delete(ids=legacy['ids'])
+                    self.queries_collection.add(
+                        ids=legacy['ids'],
+                        documents=legacy['documents'],
+                        embeddings=legacy['embeddings'],
+                        metadatas=cleaned
+                    )
+            
+            kept_responses = self._rewrite_response_archive(batch_size)
+            
+            compaction_started = datetime.now().timestamp()
+            self.queries_collection.compact(lock=self._write_lock, changed={"last_seen_ts": {"$gte": compaction_started}})
+            with self._write_lock:
+                bytes_after = self._storage_size()
+            
+            removed = set(removed)
+            report = {
+                "removed_expired": len(removed & expired),
+                "removed_over_limit": len(removed - expired),
+                "migrated_responses": len(legacy_ids),
+                "kept": kept_responses,
+                "bytes_before": bytes_before,
+                "bytes_after": bytes_after,
+                "reclaimed_bytes": bytes_before - bytes_after,
+                "compacted_at": datetime.now().isoformat()
+            }
+            logger.info(
+                f"Compacted query log: removed {len(removed)} entries, kept {kept_responses}, "
+                f"reclaimed {report['reclaimed_bytes']} bytes"
+            )
+            return report
+            
+        except Exception as e:
+            logger.error(f"Error compacting query log: {e}")
+            return {"error": str(e)}
+    
+    def _rewrite_response_archive(self, batch_size: int) -> int:
+        """
+        Ghi response mới nhất của các entry còn giữ vào generation mới của archive
+        
+        Generation mới chỉ được publish khi đã copy đủ; metadata được chuyển sang
+        offset mới theo batch và file cũ chỉ bị xóa khi không còn entry nào trỏ tới,
+        nên get_logged_response không bao giờ đọc offset cũ trên file mới.
+        
+        Returns:
+            int: Số response còn giữ
+        """
+        archive = self.response_archive
+        with self._write_lock:
+            new_generation = archive.generation.read() + 1
+            copy_started = datetime.now().timestamp()
+            refs = self._response_refs(self.queries_collection.get(include=['metadatas']))
+        new_offsets = archive.copy_lines(refs, new_generation, truncate=True)
+        
+        with self._write_lock:
+            # Response được log trong lúc copy vẫn nằm ở generation cũ
+            changed = self._response_refs(self.queries_collection.get(
+                where={"last_seen_ts": {"$gte": copy_started}}, include=['metadatas']
+            ))
+            new_offsets.update(archive.copy_lines(changed, new_generation))
+            archive.publish(new_generation)
+        
+        updated_ids = list(new_offsets)
+        for start in range(0, len(updated_ids), batch_size):
+            with self._write_lock:
+                current = self.queries_collection.get(ids=updated_ids[start:start + batch_size], include=['metadatas'])
+                # Entry được log lại sau khi publish đã trỏ vào generation mới
+                batch = [
+                    log_id for log_id, metadata in zip(current['ids'], current['metadatas'])
+                    if metadata.get("response_generation", 0) != new_generation
+                ]
+                if batch:
+                    self.queries_collection.update(
+                        ids=batch,
+                        metadatas=[
+                            {"response_generation": new_generation, "response_offset": new_offsets[log_id]}
+                            for log_id in batch
+                        ]
+                    )
+        
+        archive.drop_generations_before(new_generation)
+        return len(new_offsets)
+    
+    @staticmethod
+    def _response_refs(entries: Dict[str, Any]) -> Dict[str, Tuple[int, int]]:
+        """log_id -> (generation, offset) của response trong archive"""
+        return {
+            log_id: (metadata.get("response_generation", 0), metadata["response_offset"])
+            for log_id, metadata in zip(entries['ids'], entries['metadatas'])
+            if "response_offset" in metadata
+        }
+    
+    def start_query_log_compaction(self, interval_hours: float = QUERY_LOG_COMPACTION_INTERVAL_HOURS) -> threading.Thread:
+        """
+        Chạy compact_query_log định kỳ trên background thread
+        
+        Args:
+            interval_hours (float): Khoảng thời gian giữa hai lần compaction
+            
+        Returns:
+            threading.Thread: Thread compaction (daemon)
+        """
+        def run():
+            while not self._compaction_stop.wait(interval_hours * 3600):
+                # Với nhiều worker, chỉ một process (giữ leader lock) chạy compaction
+                if self._compaction_leader.try_acquire():
+                    self.last_compaction_report = self.compact_query_log()
+        
+        thread = threading.Thread(target=run, name="query-log-compaction", daemon=True)
+        thread.start()
+        logger.info(f"Query log compaction scheduled every {interval_hours}h")
+        return thread
+    
+    @staticmethod
+    def _query_last_seen_ts(metadata: Dict[str, Any]) -> float:
+        """Thời điểm query xuất hiện gần nhất (entry cũ chỉ có timestamp ISO)"""
+        if "last_seen_ts" in metadata:
+            return float(metadata["last_seen_ts"])
+        try:
+            return datetime.fromisoformat(metadata.get("timestamp", "")).timestamp()
+        except ValueError:
+            return 0.0
+    
+    def _storage_size(self) -> int:
+        """Tổng dung lượng thư mục lưu trữ (bytes)"""
+        return sum(f.stat().st_size for f in self.persist_directory.rglob('*') if f.is_file())
+    
     def add_knowledge(self, title: str, content: str, category: str = "general") -> str:
         """
         Thêm thông tin vào knowledge base
@@ -235,24 +653,27 @@ class ChromaDBManager:
             # Combine title and content for better search
             searchable_text = f"{title}\n{content}"
             
-            self.knowledge_collection.add(
-                documents=[searchable_text],
-                metadatas=[{
-                    "title": title,
-                    "content": content,
-                    "category": category,
-                    "created_at": datetime.now().isoformat()
-                }],
-                ids=[knowledge_id]
-            )
+            with self._write_lock:
+                self.knowledge_collection.add(
+                    documents=[searchable_text],
+                    metadatas=[{
+                        "title": title,
+                        "content": content,
+                        "category": category,
+                        "created_at": datetime.now().isoformat()
+                    }],
+                    ids=[knowledge_id]
+                )
             
             logger.info(f"Added knowledge: {title} (Category: {category})")
+            self._bump_version("knowledge")
             return knowledge_id
             
         except Exception as e:
             logger.error(f"Error adding knowledge: {e}")
             raise
     
+    @traced("chroma.search_knowledge")
     def search_knowledge(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
         Tìm kiếm trong knowledge base
@@ -264,32 +685,106 @@ class ChromaDBManager:
         Returns:
             List[Dict]: Danh sách kết quả tìm kiếm
         """
+        cache_key = self._cache_key("knowledge", query, top_k)
+        hit, cached = self.retrieval_cache.get(cache_key)
+        RETRIEVAL_CACHE_LOOKUPS.inc(collection="knowledge", result="hit" if hit else "miss")
+        if hit:
+            return cached
+        
         try:
-            results = self.knowledge_collection.query(
-                query_texts=[query],
-                n_results=top_k
-            )
+            with VECTOR_QUERY_LATENCY.time(collection="knowledge"):
+                results = self.knowledge_collection.query(
+                    query_texts=[query],
+                    n_results=top_k
+                )
             
             knowledge_items = []
             if results['documents'] and results['documents'][0]:
-                for doc, metadata, distance in zip(
-                    results['documents'][0],
+                for chunk_id, metadata, distance in zip(
+                    results['ids'][0],
                     results['metadatas'][0],
                     results['distances'][0]
                 ):
                     knowledge_items.append({
-                        "title": metadata["title"],
-                        "content": metadata["content"],
-                        "category": metadata["category"],
+                        **self._knowledge_item(chunk_id, metadata),
                         "relevance": 1 - distance if distance <= 1 else 0
                     })
             
+            self.retrieval_cache.put(cache_key, knowledge_items)
             return knowledge_items
             
         except Exception as e:
             logger.error(f"Error searching knowledge: {e}")
             return []
     
+    @traced("chroma.get_document_chunks")
+    def get_document_chunks(self, refs: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+        """
+        Lấy các chunk theo (original_title, chunk_index), dùng để ghép chunk lân cận vào context RAG
+        
+        Args:
+            refs (List[Tuple[str, int]]): Các cặp (original_title, chunk_index)
+            
+        Returns:
+            List[Dict]: Chunk tìm thấy, cùng dạng kết quả với search_knowledge (không có relevance)
+        """
+        if not refs:
+            return []
+        cache_key = ("knowledge_chunks", self._collection_versions["knowledge"].read(), tuple(sorted(set(refs))))
+        hit, cached = self.retrieval_cache.get(cache_key)
+        if hit:
+            return cached
+        
+        indices_by_title: Dict[str, List[int]] = {}
+        for title, index in refs:
+            indices_by_title.setdefault(title, []).append(index)
+        clauses = [
+            {"$and": [{"original_title": title}, {"chunk_index": {"$in": sorted(set(indices))}}]}
+            for title, indices in indices_by_title.items()
+        ]
+        try:
+            results = self.knowledge_collection.get(
+                where=clauses[0] if len(clauses) == 1 else {"$or": clauses},
+                include=['metadatas']
+            )
+            chunks = [
+                self._knowledge_item(chunk_id, metadata)
+                for chunk_id, metadata in zip(results.get('ids') or [], results.get('metadatas') or [])
+            ]
+            self.retrieval_cache.put(cache_key, chunks)
+            return chunks
+        except Exception as e:
+            logger.error(f"Error getting document chunks: {e}")
+            return []
+    
+    @staticmethod
+    def _knowledge_item(chunk_id: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Kết quả knowledge trả về cho caller (chunk_index/total_chunks mặc định cho knowledge không chia chunk)"""
+        return {
+            "id": chunk_id,
+            "title": metadata["title"],
+            "content": metadata["content"],
+            "category": metadata["category"],
+            "original_title": metadata.get("original_title", metadata["title"]),
+            "chunk_index": metadata.get("chunk_index", 0),
+            "total_chunks": metadata.get("total_chunks", 1)
+        }
+    
+    @traced("chroma.get_collection_counts")
+    def get_collection_counts(self) -> Dict[str, int]:
+        """
+        Số document trong mỗi collection (không đọc metadata)
+        
+        Returns:
+            Dict[str, int]: faqs, queries, knowledge
+        """
+        return {
+            "faqs": self.faq_collection.count(),
+            "queries": self.queries_collection.count(),
+            "knowledge": self.knowledge_collection.count()
+        }
+    
+    @traced("chroma.get_analytics")
     def get_analytics(self) -> Dict[str, Any]:
         """
         Lấy thống kê về database và usage
@@ -299,12 +794,10 @@ class ChromaDBManager:
         """
         try:
             analytics = {
-                "collections": {
-                    "faqs": self.faq_collection.count(),
-                    "queries": self.queries_collection.count(), 
-                    "knowledge": self.knowledge_collection.count()
-                },
+                "collections": self.get_collection_counts(),
                 "storage_path": str(self.persist_directory),
+                "backend": self.backend_name,
+                "last_query_log_compaction": self.last_compaction_report,
                 "last_updated": datetime.now().isoformat()
             }
             
@@ -327,7 +820,8 @@ class ChromaDBManager:
             logger.error(f"Error getting analytics: {e}")
             return {"error": str(e)}
     
-    def add_document_from_text(self, title: str, content: str, category: str = "general", chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
+    @traced("chroma.add_document")
+    def add_document_from_text(self, title: str, content: str, category: str = "general", chunk_size: int = 1000, chunk_overlap: int = 200, upsert: bool = False, chunker: Optional[str] = None) -> List[str]:
         """
         Thêm document từ text, tự động chunking nếu cần
         
@@ -337,47 +831,216 @@ class ChromaDBManager:
             category (str): Danh mục
             chunk_size (int): Kích thước mỗi chunk (số ký tự)
             chunk_overlap (int): Số ký tự overlap giữa các chunk
+            upsert (bool): Nếu True, chỉ embed các chunk mới và xóa các chunk không còn
+                           (xem upsert_document)
+            chunker (str): "fixed" (chunk_size/chunk_overlap ký tự) hoặc "semantic"
+                           (theo đoạn, tiêu đề, câu; xem utils/chunking.py). Mặc định
+                           DEFAULT_CHUNKER, hoặc UPSERT_CHUNKER khi upsert
             
         Returns:
             List[str]: Danh sách IDs của các chunks đã thêm
         """
+        if upsert:
+            return self.upsert_document(title, content, category, chunk_size, chunk_overlap,
+                                        chunker or UPSERT_CHUNKER)["chunk_ids"]
+        chunker = chunker or DEFAULT_CHUNKER
+        
+        chunk_ids: List[str] = []
         try:
-            # Chunking nếu content quá dài
-            if len(content) > chunk_size:
-                chunks = self._chunk_text(content, chunk_size, chunk_overlap)
-                logger.info(f"Document '{title}' split into {len(chunks)} chunks")
-            else:
-                chunks = [content]
-            
-            chunk_ids = []
-            for i, chunk in enumerate(chunks):
-                chunk_id = str(uuid.uuid4())
-                chunk_title = f"{title} (Part {i+1}/{len(chunks)})" if len(chunks) > 1 else title
-                
-                searchable_text = f"{chunk_title}\n{chunk}"
+            # Lượt đầu chỉ đếm chunk (tổng số nằm trong title/metadata của mọi chunk); lượt hai
+            # embed và ghi từng batch DOCUMENT_INGEST_BATCH_SIZE chunk, không giữ cả document
+            total = sum(1 for _ in self._iter_document_chunks(content, chunk_size, chunk_overlap, chunker))
+            chunks = self._iter_document_chunks(content, chunk_size, chunk_overlap, chunker)
+            for start in range(0, total, DOCUMENT_INGEST_BATCH_SIZE):
+                batch = list(itertools.islice(chunks, DOCUMENT_INGEST_BATCH_SIZE))
+                batch_ids = [str(uuid.uuid4()) for _ in batch]
+                documents = [f"{self._chunk_title(title, start + i, total)}\n{chunk}" for i, chunk in enumerate(batch)]
+                embeddings = self.document_embedding_function(documents)
                 
-                self.knowledge_collection.add(
-                    documents=[searchable_text],
-                    metadatas=[{
-                        "title": chunk_title,
-                        "content": chunk,
-                        "original_title": title,
-                        "category": category,
-                        "chunk_index": i,
-                        "total_chunks": len(chunks),
-                        "created_at": datetime.now().isoformat()
-                    }],
-                    ids=[chunk_id]
-                )
-                chunk_ids.append(chunk_id)
+                with self._write_lock:
+                    self.knowledge_collection.add(
+                        documents=documents,
+                        metadatas=[self._chunk_metadata(title, chunk, category, start + i, total)
+                                   for i, chunk in enumerate(batch)],
+                        embeddings=embeddings,
+                        ids=batch_ids
+                    )
+                chunk_ids.extend(batch_ids)
             
-            logger.info(f"Added document '{title}' with {len(chunks)} chunks to knowledge base")
+            self._bump_version("knowledge")
+            logger.info(f"Added document '{title}' with {total} chunks to knowledge base ({chunker})")
             return chunk_ids
             
         except Exception as e:
             logger.error(f"Error adding document: {e}")
+            if chunk_ids:
+                # Không để lại document thiếu chunk
+                try:
+                    with self._write_lock:
+                        self.knowledge_collection.delete(ids=chunk_ids)
+                    self._bump_version("knowledge")
+                except Exception as cleanup_error:
+                    logger.error(f"Error removing partial document '{title}': {cleanup_error}")
             raise
     
+    @traced("chroma.upsert_document")
+    def upsert_document(self, title: str, content: str, category: str = "general", chunk_size: int = 1000, chunk_overlap: int = 200, chunker: str = UPSERT_CHUNKER) -> Dict[str, Any]:
+        """
+        Cập nhật document theo kiểu incremental: so sánh hash từng chunk với bản đang lưu,
+        chỉ embed và thêm các chunk mới, giữ nguyên các chunk không đổi và xóa các chunk
+        không còn trong bản mới. Chunk được nhận diện chỉ bằng hash nội dung, nên chunk
+        đổi vị trí vẫn được giữ.
+        
+        Mặc định dùng chunker "semantic": ranh giới chunk phụ thuộc nội dung, nên một chỉnh
+        sửa chỉ đổi các chunk chứa nó. Với "fixed", mọi ranh giới sau chỗ chèn/xóa đều dịch,
+        gần như toàn bộ phần sau của document bị embed lại.
+        
+        Embedding của chunk mới được tính trước; thêm, cập nhật và xóa chạy liền nhau trong
+        cùng một lần giữ write lock và version chỉ tăng một lần. Vector store không có
+        transaction nhiều thao tác, nên reader vẫn có thể thấy cả chunk cũ và mới trong
+        khoảng giữa các lần ghi đó (không có lời gọi model nào ở giữa), và kết quả
+        cache trong khoảng đó bị bỏ khi version tăng.
+        
+        Args:
+            title (str): Tiêu đề document
+            content (str): Nội dung mới của document
+            category (str): Danh mục
+            chunk_size (int): Kích thước mỗi chunk (số ký tự)
+            chunk_overlap (int): Số ký tự overlap giữa các chunk
+            chunker (str): "semantic" (mặc định, UPSERT_CHUNKER) hoặc "fixed"
+            
+        Returns:
+            Dict: chunk_ids (theo thứ tự trong document), added, kept, removed
+        """
+        try:
+            with self._document_write_lock, self._write_lock:
+                chunks = self._split_document(title, content, chunk_size, chunk_overlap, chunker)
+                total = len(chunks)
+                
+                # Chunk hiện có của document, nhóm theo hash nội dung
+                existing = self.knowledge_collection.get(
+                    where={"original_title": title},
+                    include=['metadatas']
+                )
+                existing_by_hash: Dict[str, List[str]] = {}
+                taken_ids = set(existing.get('ids') or [])
+                for chunk_id, metadata in zip(existing.get('ids') or [], existing.get('metadatas') or []):
+                    chunk_hash = metadata.get('content_hash') or self._hash_chunk(metadata.get('content', ''))
+                    existing_by_hash.setdefault(chunk_hash, []).append(chunk_id)
+                
+                chunk_ids = []
+                new_ids, new_documents, new_metadatas = [], [], []
+                kept_ids, kept_metadatas = [], []
+                
+                for i, chunk in enumerate(chunks):
+                    chunk_hash = self._hash_chunk(chunk)
+                    metadata = self._chunk_metadata(title, chunk, category, i, total)
+                    
+                    reusable = existing_by_hash.get(chunk_hash)
+                    if reusable:
+                        # Chunk không đổi: giữ embedding, chỉ cập nhật vị trí trong document
+                        chunk_id = reusable.pop()
+                        metadata.pop("created_at")
+                        kept_ids.append(chunk_id)
+                        kept_metadatas.append(metadata)
+                    else:
+                        chunk_id = self._document_chunk_id(title, chunk_hash, taken_ids)
+                        taken_ids.add(chunk_id)
+                        new_ids.append(chunk_id)
+                        new_documents.append(f"{self._chunk_title(title, i, total)}\n{chunk}")
+                        new_metadatas.append(metadata)
+                    chunk_ids.append(chunk_id)
+                
+                stale_ids = [chunk_id for ids in existing_by_hash.values() for chunk_id in ids]
+                
+                # Embed trước khi ghi, để các lần ghi dưới đây chạy liền nhau
+                new_embeddings = self.document_embedding_function(new_documents) if new_ids else None
+                
+                # Thêm trước, cập nhật, rồi mới xóa: reader luôn thấy ít nhất một bản đầy đủ
+                if new_ids:
+                    self.knowledge_collection.add(
+                        documents=new_documents,
+                        metadatas=new_metadatas,
+                        embeddings=new_embeddings,
+                        ids=new_ids
+                    )
+                if kept_ids:
+                    self.knowledge_collection.update(ids=kept_ids, metadatas=kept_metadatas)
+                if stale_ids:
+                    self.knowledge_collection.delete(ids=stale_ids)
+                
+                if new_ids or kept_ids or stale_ids:
+                    self._bump_version("knowledge")
+            
+            logger.info(
+                f"Upserted document '{title}': {len(new_ids)} added, "
+                f"{len(kept_ids)} kept, {len(stale_ids)} removed"
+            )
+            return {
+                "chunk_ids": chunk_ids,
+                "added": len(new_ids),
+                "kept": len(kept_ids),
+                "removed": len(stale_ids)
+            }
+            
+        except Exception as e:
+            logger.error(f"Error upserting document: {e}")
+            raise
+    
+    @staticmethod
+    def _iter_document_chunks(content: str, chunk_size: int, chunk_overlap: int, chunker: str) -> Iterator[str]:
+        """Chunks của document theo thứ tự (deterministic: cùng input luôn cho cùng chunks, ít nhất một chunk)"""
+        if chunker == "fixed" and len(content) <= chunk_size:
+            yield content
+            return
+        empty = True
+        for chunk in iter_chunks(content, chunker, chunk_size, chunk_overlap):
+            empty = False
+            yield chunk
+        if empty:
+            yield content
+    
+    def _split_document(self, title: str, content: str, chunk_size: int, chunk_overlap: int, chunker: str = DEFAULT_CHUNKER) -> List[str]:
+        """Toàn bộ chunks của document (upsert cần cả danh sách để so với bản đang lưu)"""
+        chunks = list(self._iter_document_chunks(content, chunk_size, chunk_overlap, chunker))
+        logger.info(f"Document '{title}' split into {len(chunks)} chunks ({chunker})")
+        return chunks
+    
+    @staticmethod
+    def _chunk_title(title: str, index: int, total: int) -> str:
+        """Tiêu đề hiển thị của một chunk"""
+        return f"{title} (Part {index+1}/{total})" if total > 1 else title
+    
+    @staticmethod
+    def _hash_chunk(chunk: str) -> str:
+        """Hash nội dung chunk để phát hiện thay đổi khi upsert"""
+        return hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _document_chunk_id(title: str, chunk_hash: str, taken_ids: set) -> str:
+        """
+        ID cho chunk được thêm qua upsert: theo title và hash nội dung (không theo vị trí),
+        kèm số thứ tự nhỏ nhất chưa dùng cho nội dung lặp lại hoặc ID còn trong collection
+        """
+        title_hash = hashlib.sha256(title.encode('utf-8')).hexdigest()[:12]
+        occurrence = 0
+        while f"doc-{title_hash}-{chunk_hash[:16]}-{occurrence}" in taken_ids:
+            occurrence += 1
+        return f"doc-{title_hash}-{chunk_hash[:16]}-{occurrence}"
+    
+    def _chunk_metadata(self, title: str, chunk: str, category: str, index: int, total: int) -> Dict[str, Any]:
+        """Metadata lưu kèm mỗi chunk trong knowledge base"""
+        return {
+            "title": self._chunk_title(title, index, total),
+            "content": chunk,
+            "original_title": title,
+            "category": category,
+            "chunk_index": index,
+            "total_chunks": total,
+            "content_hash": self._hash_chunk(chunk),
+            "created_at": datetime.now().isoformat()
+        }
+    
     def _chunk_text(self, text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
         """
         Chia text thành các chunks với overlap
@@ -390,20 +1053,7 @@ class ChromaDBManager:
         Returns:
             List[str]: Danh sách chunks
         """
-        chunks = []
-        start = 0
-        
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
-            chunks.append(chunk)
-            
-            # Move start position with overlap
-            start = end - chunk_overlap
-            if start >= len(text):
-                break
-        
-        return chunks
+        return list(iter_fixed_chunks(text, chunk_size, chunk_overlap))
 
     def get_all_documents(self) -> List[Dict[str, Any]]:
         """
@@ -440,6 +1090,7 @@ class ChromaDBManager:
             logger.error(f"Error getting documents: {e}")
             return []
 
+    @traced("chroma.delete_document")
     def delete_document(self, title: str) -> bool:
         """
         Xóa document khỏi knowledge base (xóa tất cả chunks)
@@ -462,7 +1113,9 @@ class ChromaDBManager:
                         ids_to_delete.append(all_docs['ids'][i])
             
             if ids_to_delete:
-                self.knowledge_collection.delete(ids=ids_to_delete)
+                with self._write_lock:
+                    self.knowledge_collection.delete(ids=ids_to_delete)
+                    self._bump_version("knowledge")
                 logger.info(f"Deleted document '{title}' ({len(ids_to_delete)} chunks)")
                 return True
             else:
@@ -9,29 +9,130 @@ load_dotenv()
 
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "sk-demo-key-for-testing")
-OPENAI_BASE_URL = "https://aiportalapi.stu-platform.live/jpe"
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://aiportalapi.stu-platform.live/jpe")
 OPENAI_MODEL = "gpt-4o-mini"
 
 # Flask Configuration
 FLASK_HOST = "0.0.0.0"
 FLASK_PORT = 5001
-FLASK_DEBUG = True
+FLASK_DEBUG = os.getenv("FLASK_DEBUG", "true").lower() == "true"  # Development server only
+STARTUP_MODE = os.getenv("STARTUP_MODE", "eager")  # "eager" or "lazy" (serve liveness immediately, warm up in background)
+PRELOAD_FORK = os.getenv("PRELOAD_FORK") == "1"  # Set by gunicorn.conf.py: services load before fork, background jobs start per worker
+
+# Async (ASGI) Chat Configuration
+ASYNC_RETRIEVAL_THREADS = 32  # Thread pool for FAQ/RAG retrieval and logging off the event loop
+ASYNC_LLM_MAX_CONNECTIONS = 1000  # Concurrent connections to the OpenAI API per worker
+ASYNC_LLM_MAX_KEEPALIVE = 100  # Idle keep-alive connections kept in the pool
+
+# LLM Admission Control
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))  # LLM calls in flight per process
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "64"))  # Requests waiting for a slot; beyond this answer degraded (keep below GUNICORN_THREADS for Flask)
+LLM_QUEUE_TIMEOUT_S = 10  # Max wait for a slot before answering degraded
+SESSION_RATE_LIMIT_PER_MIN = 20  # LLM-bound messages per session per minute (0 disables)
+SESSION_RATE_BURST = 5  # Messages a session may send back to back
+
+# Resilient LLM Client
+LLM_POOL_MAX_CONNECTIONS = 64  # Connections to the OpenAI API per process (Flask; keep >= LLM_MAX_CONCURRENCY)
+LLM_POOL_MAX_KEEPALIVE = 32  # Idle keep-alive connections kept in the pool
+LLM_KEEPALIVE_EXPIRY_S = 30  # Close idle connections after this long
+LLM_CONNECT_TIMEOUT_S = 3  # TCP/TLS connect timeout per attempt
+LLM_READ_TIMEOUT_S = 30  # Read timeout per attempt (also capped by the request deadline)
+LLM_REQUEST_DEADLINE_S = 40  # Total time budget for one completion including retries
+LLM_MAX_RETRIES = 2  # Extra attempts on connection errors, timeouts, 429 and 5xx
+LLM_RETRY_BASE_BACKOFF_S = 0.5  # Full-jitter backoff: uniform(0, min(max, base * 2^attempt))
+LLM_RETRY_MAX_BACKOFF_S = 4
+LLM_HEDGE_AFTER_S = float(os.getenv("LLM_HEDGE_AFTER_S", "0"))  # Send a duplicate request if no answer by then (0 disables; costs extra tokens)
+LLM_BREAKER_FAILURES = 5  # Consecutive failed attempts that open the circuit breaker
+LLM_BREAKER_RESET_S = 30  # Open breaker answers with the local fallback for this long, then lets one probe through
+
+# Request Deadline (end-to-end budget for /api/chat, overridable per request with X-Request-Deadline in ms)
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "30"))
+REQUEST_DEADLINE_MAX_S = 60  # Upper bound for the header value
+DEADLINE_RAG_MIN_S = 2.5  # Skip RAG retrieval below this remaining budget
+DEADLINE_LLM_MIN_S = 2.0  # Below this, answer locally (extractive) instead of calling the LLM
+DEADLINE_FUNCTION_FOLLOWUP_MIN_S = 1.5  # Below this, return the function result directly instead of a second completion
+DEADLINE_LLM_TOKENS_PER_S = 60  # Conservative generation rate used to cap max_tokens to the remaining budget
+DEADLINE_LLM_OVERHEAD_S = 1.0  # Time to first token reserved when capping max_tokens
+LLM_MAX_TOKENS = 1024  # Upper bound for max_tokens
+
+# Tracing (per-request stage timings for /api/chat)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "./conversation_logs/traces/chat_traces.ndjson")  # One JSON record per request
+TRACE_LOG_MAX_BYTES = 10 * 1024 * 1024  # Rotate after 10MB
+TRACE_LOG_BACKUP_COUNT = 5
+SERVER_TIMING_ENABLED = True  # Add a Server-Timing header with per-stage durations
+
+# Metrics (Prometheus text format at /api/metrics)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")  # Shared dir for multi-worker aggregation ("" = this process only)
+METRICS_FLUSH_INTERVAL_S = 5  # How often each worker writes its snapshot to METRICS_MULTIPROC_DIR
+
+# Health Checks
+HEALTH_SNAPSHOT_INTERVAL_S = 10  # Background refresh of /api/health status (probes never query the vector store)
+
+# Admin / Profiling
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # Bearer token for /api/admin/* and X-Profile (empty = disabled)
+PROFILER_INTERVAL_MS = 10  # Stack sampling interval
+PROFILER_MAX_SECONDS = 60  # Longest profile one request may run
+PROFILER_TOP_N = 25  # Functions listed in the self/total time tables
 
 # CORS Configuration
 CORS_ORIGINS = ["http://localhost:3000", "http://127.0.0.1:3000"]
 CORS_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-CORS_HEADERS = ["Content-Type", "Authorization"]
+CORS_HEADERS = ["Content-Type", "Authorization", "X-Request-Deadline", "X-Debug-Timings", "X-Profile"]
 
 # File Upload Configuration
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'docx', 'doc'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Embedding Configuration
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"  # Chroma's default ONNX model; seed bundles are tied to it
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "default")  # "default", "sentence-transformers" or "onnx"
+EMBEDDING_ONNX_MODEL_DIR = os.path.expanduser("~/.cache/chroma/onnx_models/all-MiniLM-L6-v2/onnx")  # Also holds tokenizer.json
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "model_int8.onnx")  # "model.onnx" for fp32
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # Intra-op threads (0 = library default, all cores)
+EMBEDDING_BATCH_SIZE = 32  # Max texts per forward pass
+EMBEDDING_MAX_SEQ_LENGTH = 256  # Tokens kept per text; longer chunks are truncated
+EMBEDDING_MICROBATCH_ENABLED = True  # Coalesce concurrent query embeddings into one forward pass
+EMBEDDING_MICROBATCH_MAX_SIZE = 32  # Max texts per coalesced batch
+EMBEDDING_MICROBATCH_MAX_WAIT_MS = 5  # Max time a request waits for others to join its batch
+FAQ_SEED_BUNDLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "faq_seed_bundle.json")
+
+# Vector Store Configuration
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")  # "chroma" or "flat" (memory-mapped NumPy index)
+
+# Retrieval Cache Configuration
+RETRIEVAL_CACHE_SIZE = 1024  # Max cached FAQ/knowledge search results (0 disables)
+RETRIEVAL_CACHE_FOLD_DIACRITICS = False  # Treat "hoc phi" and "học phí" as the same query
+
+# Query Log Configuration (user_queries collection)
+QUERY_LOG_MAX_AGE_DAYS = 90  # Drop queries not seen again within this many days
+QUERY_LOG_MAX_ENTRIES = 50000  # Keep at most this many distinct queries
+QUERY_LOG_COMPACTION_INTERVAL_HOURS = 24  # Background compaction period (0 disables)
+
 # RAG Configuration
 RAG_TOP_K = 3
 RAG_RELEVANCE_THRESHOLD = 0.01  # Lowered from 0.7 to 0.01 for better recall
+RAG_CONTEXT_MAX_TOKENS = 1000  # Budget for the retrieved block in the system prompt (estimated tokens)
+RAG_NEIGHBOR_MAX_TOKENS = 50  # Add an adjacent chunk of a retrieved document if it costs at most this many tokens (0 disables)
+
+# Chunking Configuration (knowledge base uploads; chunker selectable per upload)
+DEFAULT_CHUNKER = os.getenv("DEFAULT_CHUNKER", "fixed")  # "fixed" (1000 chars, 200 overlap) or "semantic"
+SEMANTIC_CHUNK_TARGET_TOKENS = 120  # Emit a chunk once it reaches this many tokens (words + punctuation)
+SEMANTIC_CHUNK_MAX_TOKENS = 160  # Hard cap, keeps chunks within EMBEDDING_MAX_SEQ_LENGTH wordpieces
+SEMANTIC_CHUNK_MIN_TOKENS = 30  # A heading starts a new chunk only after this many tokens
+DOCUMENT_INGEST_BATCH_SIZE = 64  # Chunks embedded and written per vector store add when uploading a document
+UPSERT_CHUNKER = os.getenv("UPSERT_CHUNKER", "semantic")  # Content-defined boundaries: an edit only changes the chunks it touches
 
 # FAQ Configuration
 FAQ_TOP_K = 2
 FAQ_SIMILARITY_THRESHOLD = 0.7
 FAQ_CONFIDENCE_THRESHOLD = 0.8
+FAQ_INDEX_ENABLED = True  # Serve FAQ search from an in-memory NumPy index instead of Chroma
+FAQ_INDEX_QUANTIZE = False  # Store FAQ embeddings as int8 (4x less memory, ~1e-3 score error)
+
+# Extractive Fallback (answer from retrieved passages when the LLM is unavailable or shed)
+EXTRACTIVE_ANSWER_ENABLED = True
+EXTRACTIVE_MAX_PASSAGES = 3  # Sentences / FAQ answers quoted in the answer
+EXTRACTIVE_MIN_SCORE = 0.15  # Query-term overlap (IDF-weighted) scaled by chunk relevance, 0-1
 
@@ -4,11 +4,16 @@ Handles logging, analytics, and conversation history management
 """
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 import logging
 
+from utils.tracing import traced
+from utils.metrics import LOG_WRITE_LATENCY
+
 # Setup logging
 logger = logging.getLogger(__name__)
 
@@ -32,8 +37,28 @@ class ConversationLogger:
         (self.log_dir / "analytics").mkdir(exist_ok=True)
         (self.log_dir / "demos").mkdir(exist_ok=True)
         
+        # Writes are synchronous; this counts the ones currently in progress (health snapshot)
+        self._pending_writes = 0
+        self._pending_lock = threading.Lock()
+        
         logger.info(f"Conversation logger initialized at: {self.log_dir}")
     
+    @contextmanager
+    def _tracking_write(self):
+        with self._pending_lock:
+            self._pending_writes += 1
+        try:
+            yield
+        finally:
+            with self._pending_lock:
+                self._pending_writes -= 1
+    
+    @property
+    def pending_writes(self) -> int:
+        """Số lần ghi log đang diễn ra"""
+        return self._pending_writes
+    
+    @traced("conversation_logger.log_conversation")
     def log_conversation(self, session_id: str, messages: List[Dict[str, Any]], 
                         metadata: Optional[Dict[str, Any]] = None) -> bool:
         """
@@ -60,7 +85,7 @@ class ConversationLogger:
             # Lưu file log theo session
             log_file = self.log_dir / "sessions" / f"{session_id}.json"
             
-            with open(log_file, 'w', encoding='utf-8') as f:
+            with LOG_WRITE_LATENCY.time(log="conversation"), self._tracking_write(), open(log_file, 'w', encoding='utf-8') as f:
                 json.dump(conversation_data, f, ensure_ascii=False, indent=2)
             
             logger.debug(f"Logged conversation for session: {session_id}")
@@ -70,6 +95,7 @@ class ConversationLogger:
             logger.error(f"Error logging conversation: {e}")
             return False
     
+    @traced("conversation_logger.log_message")
     def log_message(self, session_id: str, message: Dict[str, Any]) -> bool:
         """
         Log một message đơn lẻ và append vào file session
@@ -110,7 +136,7 @@ class ConversationLogger:
             conversation_data["last_updated"] = datetime.now().isoformat()
             
             # Lưu lại file
-            with open(log_file, 'w', encoding='utf-8') as f:
+            with LOG_WRITE_LATENCY.time(log="conversation"), self._tracking_write(), open(log_file, 'w', encoding='utf-8') as f:
                 json.dump(conversation_data, f, ensure_ascii=False, indent=2)
             
             return True
@@ -46,6 +46,10 @@ def load_tuition_data() -> Dict[str, Any]:
     """Load tuition information from tuition.json"""
     return load_json_data('tuition')
 
+def load_default_faqs() -> List[Dict[str, Any]]:
+    """Load default FAQs seeded into an empty FAQ collection from default_faqs.json"""
+    return load_json_data('default_faqs')
+
 # Load all data at module level for easy access
 try:
     COURSES_DATA = load_courses_data()
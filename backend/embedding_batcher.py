@@ -0,0 +1,141 @@
+"""
+Embedding micro-batcher for University Assistant
+Coalesces concurrent embedding calls from request threads into one batched
+forward pass instead of one batch-of-1 pass per request
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import List, Dict, Any
+import logging
+
+import numpy as np
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64]
+
+class EmbeddingBatcher:
+    """
+    Drop-in embedding function (callable on a list of texts). Callers submit
+    texts and wait on a future; a dispatcher thread collects requests for up
+    to max_wait_ms or max_batch texts and embeds them together.
+    """
+
+    def __init__(self, embedding_function, max_batch: int = 32, max_wait_ms: float = 5.0):
+        """
+        Initialize embedding batcher
+
+        Args:
+            embedding_function: Underlying callable mapping a list of texts to embeddings
+            max_batch (int): Max texts per forward pass; larger calls bypass the queue
+            max_wait_ms (float): Max time the first request in a batch waits for company
+        """
+        self.embedding_function = embedding_function
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._dispatcher_pid = None
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self._batch_size_counts = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._batch_size_counts["more"] = 0
+        self._queue_delays = deque(maxlen=1000)
+        self._batches = 0
+        self._texts = 0
+        self._bypassed = 0
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        texts = list(input)
+        if not texts:
+            return []
+        if len(texts) >= self.max_batch:
+            # Already a full batch (document ingestion, FAQ seeding)
+            with self._stats_lock:
+                self._bypassed += 1
+            return self.embedding_function(texts)
+
+        self._ensure_dispatcher()
+        future = Future()
+        self._queue.put((texts, time.perf_counter(), future))
+        return future.result()
+
+    def _ensure_dispatcher(self):
+        """Start the dispatcher thread on first use (and again in a forked worker)"""
+        if self._dispatcher_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._dispatcher_pid == os.getpid():
+                return
+            # Requests queued in the parent process have no waiter in this one
+            self._queue = queue.Queue()
+            thread = threading.Thread(target=self._dispatch_loop, name="embedding-batcher", daemon=True)
+            thread.start()
+            self._dispatcher_pid = os.getpid()
+
+    def _dispatch_loop(self):
+        pending = self._queue
+        while True:
+            batch = [pending.get()]
+            size = len(batch[0][0])
+            deadline = batch[0][1] + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = pending.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        texts = [text for texts, _, _ in batch for text in texts]
+        try:
+            embeddings = self.embedding_function(texts)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for item_texts, _, future in batch:
+            future.set_result(list(embeddings[offset:offset + len(item_texts)]))
+            offset += len(item_texts)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._texts += len(texts)
+            bucket = next((b for b in BATCH_SIZE_BUCKETS if len(texts) <= b), "more")
+            self._batch_size_counts[bucket] += 1
+            self._queue_delays.extend(started - enqueued for _, enqueued, _ in batch)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch-size distribution and queueing delay of recent requests"""
+        with self._stats_lock:
+            delays_ms = np.asarray(self._queue_delays) * 1000
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self._batches,
+                "texts": self._texts,
+                "bypassed_calls": self._bypassed,
+                "queued_requests": self._queue.qsize(),
+                "avg_batch_size": round(self._texts / self._batches, 2) if self._batches else 0.0,
+                "batch_size_distribution": {
+                    (f"<={bucket}" if bucket != "more" else f">{BATCH_SIZE_BUCKETS[-1]}"): count
+                    for bucket, count in self._batch_size_counts.items()
+                },
+                "queue_delay_p50_ms": round(float(np.percentile(delays_ms, 50)), 2) if len(delays_ms) else 0.0,
+                "queue_delay_p99_ms": round(float(np.percentile(delays_ms, 99)), 2) if len(delays_ms) else 0.0
+            }
@@ -0,0 +1,238 @@
+"""
+Embedding providers for University Assistant
+CPU-tuned embedding functions (Chroma-compatible callables) with explicit
+thread count, batch size and sequence truncation
+
+Create an int8-quantized copy of the ONNX model for the "onnx" provider:
+    python -m embeddings quantize
+"""
+import argparse
+import os
+from pathlib import Path
+from typing import List
+import logging
+
+import numpy as np
+
+from config import (
+    EMBEDDING_PROVIDER, EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_MODEL_DIR, EMBEDDING_ONNX_FILE,
+    EMBEDDING_THREADS, EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_SEQ_LENGTH
+)
+from utils.metrics import EMBEDDING_CALLS, EMBEDDING_BATCH_TEXTS, EMBEDDING_LATENCY
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize rows"""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1e-12
+    return embeddings / norms
+
+class SentenceTransformerEmbedder:
+    """sentence-transformers model on CPU with a fixed torch thread pool"""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, threads: int = EMBEDDING_THREADS,
+                 batch_size: int = EMBEDDING_BATCH_SIZE, max_seq_length: int = EMBEDDING_MAX_SEQ_LENGTH):
+        """
+        Args:
+            model_name (str): sentence-transformers model name or path
+            threads (int): torch intra-op threads (0 = library default)
+            batch_size (int): Max texts per forward pass
+            max_seq_length (int): Tokens kept per text, longer inputs are truncated
+        """
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.threads = threads
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.model.max_seq_length = max_seq_length
+        self.batch_size = batch_size
+
+    def reset_after_fork(self):
+        """Weights stay shared with the parent; only torch's thread pool setting is reapplied"""
+        if self.threads > 0:
+            import torch
+            torch.set_num_threads(self.threads)
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        embeddings = self.model.encode(
+            list(input),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return embeddings.astype(np.float32).tolist()
+
+class OnnxEmbedder:
+    """
+    ONNX Runtime BERT-style encoder (e.g. int8-quantized all-MiniLM-L6-v2)
+    with mean pooling. Unlike Chroma's default function, batches are padded
+    only to their longest text instead of always to 256 tokens.
+    """
+
+    def __init__(self, model_dir: str = EMBEDDING_ONNX_MODEL_DIR, model_file: str = EMBEDDING_ONNX_FILE,
+                 threads: int = EMBEDDING_THREADS, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 max_seq_length: int = EMBEDDING_MAX_SEQ_LENGTH):
+        """
+        Args:
+            model_dir (str): Directory containing the .onnx model and tokenizer.json
+            model_file (str): Model file inside model_dir
+            threads (int): ONNX Runtime intra-op threads (0 = library default)
+            batch_size (int): Max texts per forward pass
+            max_seq_length (int): Tokens kept per text, longer inputs are truncated
+        """
+        from tokenizers import Tokenizer
+
+        model_path = Path(model_dir) / model_file
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX model not found: {model_path} (run: python -m embeddings quantize)"
+            )
+
+        self.model_path = model_path
+        self.threads = threads
+        self.session = self._create_session()
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(Path(model_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        self.batch_size = batch_size
+
+    def _create_session(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if self.threads > 0:
+            options.intra_op_num_threads = self.threads
+        return ort.InferenceSession(str(self.model_path), options, providers=["CPUExecutionProvider"])
+
+    def reset_after_fork(self):
+        """ONNX Runtime thread pools do not survive fork, so each worker builds its own session"""
+        self.session = self._create_session()
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        texts = list(input)
+        results = []
+        for start in range(0, len(texts), self.batch_size):
+            encoded = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feed["token_type_ids"] = np.zeros_like(input_ids)
+
+            last_hidden_state = self.session.run(None, feed)[0]
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (last_hidden_state * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            results.append(_normalize(pooled).astype(np.float32))
+
+        if not results:
+            return []
+        return np.concatenate(results).tolist()
+
+def _create_default():
+    # chromadb is imported here so importing this module stays cheap for lazy startup
+    from chromadb.utils import embedding_functions
+    return embedding_functions.DefaultEmbeddingFunction()
+
+EMBEDDING_PROVIDERS = {
+    "default": _create_default,
+    "sentence-transformers": SentenceTransformerEmbedder,
+    "onnx": OnnxEmbedder
+}
+
+def create_embedding_function(provider: str = EMBEDDING_PROVIDER):
+    """
+    Create the embedding function shared by all collections
+
+    Args:
+        provider (str): "default" (Chroma's ONNX MiniLM), "sentence-transformers" or "onnx"
+
+    Returns:
+        Callable mapping a list of texts to a list of embeddings
+    """
+    if provider not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{provider}'. Available: {', '.join(EMBEDDING_PROVIDERS)}")
+    logger.info(f"Using '{provider}' embedding provider")
+    return EMBEDDING_PROVIDERS[provider]()
+
+class InstrumentedEmbeddingFunction:
+    """Records call count, batch size and latency of every model call in the metrics registry"""
+
+    def __init__(self, embedding_function):
+        self.embedding_function = embedding_function
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        EMBEDDING_CALLS.inc()
+        EMBEDDING_BATCH_TEXTS.observe(len(input))
+        with EMBEDDING_LATENCY.time():
+            return self.embedding_function(input)
+
+def reset_after_fork(embedding_function):
+    """
+    Make an embedding function created before fork usable in a worker process
+
+    Args:
+        embedding_function: Function returned by create_embedding_function
+    """
+    if hasattr(embedding_function, "reset_after_fork"):
+        embedding_function.reset_after_fork()
+    elif hasattr(embedding_function, "model") and hasattr(embedding_function, "tokenizer"):
+        # Chroma's ONNXMiniLM_L6_V2 recreates its session lazily when both are unset
+        embedding_function.model = None
+        embedding_function.tokenizer = None
+
+def embedding_model_id(provider: str = EMBEDDING_PROVIDER) -> str:
+    """
+    Identifier of the configured model variant, used to tie precomputed
+    embeddings (FAQ seed bundle) to the model that produced them
+    """
+    if provider == "onnx":
+        return f"{EMBEDDING_MODEL_NAME}/onnx/{EMBEDDING_ONNX_FILE}"
+    if provider == "sentence-transformers":
+        return f"{EMBEDDING_MODEL_NAME}/sentence-transformers"
+    return EMBEDDING_MODEL_NAME
+
+def quantize_onnx_model(model_dir: str = EMBEDDING_ONNX_MODEL_DIR, source_file: str = "model.onnx",
+                        target_file: str = "model_int8.onnx") -> Path:
+    """
+    Write a dynamically int8-quantized copy of an ONNX encoder
+
+    Returns:
+        Path: The quantized model file
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    source = Path(model_dir) / source_file
+    target = Path(model_dir) / target_file
+    quantize_dynamic(str(source), str(target), weight_type=QuantType.QInt8)
+    logger.info(f"Quantized {source} -> {target}")
+    return target
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["quantize"])
+    parser.add_argument("--model-dir", default=EMBEDDING_ONNX_MODEL_DIR)
+    parser.add_argument("--source", default="model.onnx")
+    parser.add_argument("--target", default=EMBEDDING_ONNX_FILE)
+    args = parser.parse_args()
+
+    if not (Path(args.model_dir) / args.source).exists():
+        # Chroma downloads all-MiniLM-L6-v2 (model.onnx + tokenizer.json) on first use
+        print("Model not found, downloading it through Chroma's default embedding function...")
+        _create_default()(["khởi động"])
+
+    target = quantize_onnx_model(args.model_dir, args.source, args.target)
+    size_mb = os.path.getsize(target) / (1024 * 1024)
+    print(f"✅ Wrote {target} ({size_mb:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+In-memory FAQ index for University Assistant
+Exact top-k cosine search over the FAQ question embeddings with NumPy
+"""
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+import numpy as np
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class FAQIndex:
+    """
+    Contiguous matrix of normalized FAQ question embeddings plus parallel
+    question/metadata arrays. A search is one matrix-vector product and an
+    argpartition, which beats a round trip through Chroma for the few
+    thousand FAQs we hold.
+
+    Distances are returned in Chroma's default ("l2", squared euclidean)
+    space so callers can convert them to similarity exactly as before.
+    """
+
+    def __init__(self, quantize: bool = False):
+        """
+        Initialize an empty FAQ index
+
+        Args:
+            quantize (bool): Store embeddings as int8 with per-row scales (4x smaller)
+        """
+        self.quantize = quantize
+        self._lock = threading.Lock()
+        # (matrix, scales, questions, metadatas) — replaced as a whole on rebuild
+        self._snapshot: Tuple[Optional[np.ndarray], Optional[np.ndarray], List[str], List[Dict[str, Any]]] = (None, None, [], [])
+
+    def __len__(self) -> int:
+        return len(self._snapshot[2])
+
+    def build(self, questions: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]]) -> None:
+        """
+        Rebuild the index from scratch
+
+        Args:
+            questions (List[str]): FAQ questions
+            embeddings (List[List[float]]): Question embeddings, same order
+            metadatas (List[Dict]): FAQ metadata (answer, category, ...), same order
+        """
+        if len(questions) != len(embeddings) or len(questions) != len(metadatas):
+            raise ValueError("questions, embeddings and metadatas must have the same length")
+
+        if not questions:
+            matrix, scales = None, None
+        else:
+            matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+
+            scales = None
+            if self.quantize:
+                scales = np.abs(matrix).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                matrix = np.ascontiguousarray(np.round(matrix / scales[:, None]).astype(np.int8))
+                scales = scales.astype(np.float32)
+
+        with self._lock:
+            self._snapshot = (matrix, scales, list(questions), list(metadatas))
+
+        logger.info(f"FAQ index built with {len(questions)} entries (quantized: {self.quantize})")
+
+    def search(self, query_embedding: List[float], top_k: int = 3) -> List[Tuple[str, Dict[str, Any], float]]:
+        """
+        Find the FAQs closest to a query embedding
+
+        Args:
+            query_embedding (List[float]): Query embedding
+            top_k (int): Number of results
+
+        Returns:
+            List[Tuple]: (question, metadata, distance) sorted by increasing distance
+        """
+        matrix, scales, questions, metadatas = self._snapshot
+        if matrix is None or top_k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        scores = matrix @ query
+        if scales is not None:
+            scores = scores * scales
+
+        k = min(top_k, len(questions))
+        if k < len(questions):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(questions))
+        order = candidates[np.argsort(-scores[candidates])]
+
+        # Squared L2 between unit vectors: ||q - v||^2 = 2 - 2 cos
+        return [
+            (questions[i], metadatas[i], float(max(0.0, 2.0 - 2.0 * scores[i])))
+            for i in order
+        ]
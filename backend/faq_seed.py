@@ -0,0 +1,129 @@
+"""
+Precomputed FAQ seed bundle for University Assistant
+Default FAQs plus their embeddings for the configured model, bulk-loaded on
+first boot instead of embedding each question one by one
+
+Regenerate after editing data/default_faqs.json or changing the embedding model:
+    python -m faq_seed build
+    python -m faq_seed verify
+"""
+import argparse
+import base64
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+import numpy as np
+
+from config import FAQ_SEED_BUNDLE_PATH
+from data_loader import load_default_faqs
+from embeddings import create_embedding_function, embedding_model_id
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+
+def faqs_checksum(faqs: List[Dict[str, Any]]) -> str:
+    """Checksum of the FAQ texts, used to detect an outdated bundle"""
+    canonical = json.dumps(faqs, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _bundle_checksum(bundle: Dict[str, Any]) -> str:
+    """Checksum over everything in the bundle except the checksum itself"""
+    payload = {key: value for key, value in bundle.items() if key != "checksum"}
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def build_bundle(faqs: List[Dict[str, Any]], embedding_function, model_name: str) -> Dict[str, Any]:
+    """
+    Embed all FAQ questions in one batch and package them as a seed bundle
+
+    Args:
+        faqs (List[Dict]): FAQs with question, answer, category
+        embedding_function: Callable mapping a list of texts to embeddings
+        model_name (str): Identifier of the embedding model
+
+    Returns:
+        Dict: Seed bundle (JSON-serializable)
+    """
+    embeddings = np.asarray(embedding_function([faq["question"] for faq in faqs]), dtype=np.float32)
+    bundle = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "embedding_model": model_name,
+        "dim": int(embeddings.shape[1]),
+        "faqs_checksum": faqs_checksum(faqs),
+        "faqs": faqs,
+        "embeddings": base64.b64encode(np.ascontiguousarray(embeddings).tobytes()).decode("ascii")
+    }
+    bundle["checksum"] = _bundle_checksum(bundle)
+    return bundle
+
+def load_bundle(path, model_name: str, faqs: List[Dict[str, Any]]) -> Optional[Tuple[List[Dict[str, Any]], List[List[float]]]]:
+    """
+    Load and verify a seed bundle
+
+    Args:
+        path: Bundle file
+        model_name (str): Embedding model the collection is configured with
+        faqs (List[Dict]): Current default FAQ list
+
+    Returns:
+        Optional[Tuple]: (faqs, embeddings), or None if the bundle is missing,
+        corrupted, or built for another model or FAQ list
+    """
+    path = Path(path)
+    if not path.exists():
+        logger.info(f"No FAQ seed bundle at {path}")
+        return None
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            bundle = json.load(f)
+
+        if bundle.get("format_version") != BUNDLE_FORMAT_VERSION:
+            logger.warning(f"FAQ seed bundle format {bundle.get('format_version')} is not supported")
+            return None
+        if bundle.get("checksum") != _bundle_checksum(bundle):
+            logger.warning("FAQ seed bundle checksum mismatch, ignoring bundle")
+            return None
+        if bundle["embedding_model"] != model_name:
+            logger.warning(f"FAQ seed bundle was built for '{bundle['embedding_model']}', not '{model_name}'")
+            return None
+        if bundle["faqs_checksum"] != faqs_checksum(faqs):
+            logger.warning("FAQ seed bundle is outdated (default FAQs changed), run: python -m faq_seed build")
+            return None
+
+        embeddings = np.frombuffer(base64.b64decode(bundle["embeddings"]), dtype=np.float32)
+        embeddings = embeddings.reshape(len(bundle["faqs"]), bundle["dim"])
+        return bundle["faqs"], embeddings.tolist()
+
+    except Exception as e:
+        logger.warning(f"Could not load FAQ seed bundle: {e}")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["build", "verify"])
+    parser.add_argument("--output", default=FAQ_SEED_BUNDLE_PATH)
+    args = parser.parse_args()
+
+    faqs = load_default_faqs()
+    model_id = embedding_model_id()
+
+    if args.command == "build":
+        bundle = build_bundle(faqs, create_embedding_function(), model_id)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(bundle, f, ensure_ascii=False, indent=2)
+        print(f"✅ Wrote {len(faqs)} FAQs ({bundle['dim']}-dim, {model_id}) to {args.output}")
+    else:
+        if load_bundle(args.output, model_id, faqs) is None:
+            print(f"❌ {args.output} is missing or does not match the current FAQs/model")
+            sys.exit(1)
+        print(f"✅ {args.output} is valid for {len(faqs)} FAQs and {model_id}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Gunicorn configuration for production serving
+
+Services (embedding model, FAQ index, vector store) are loaded once in the
+master before forking, so workers share those pages copy-on-write. Each
+worker then reopens its SQLite/Chroma handles in post_fork. A file lock in
+the persist directory orders writes from all workers, but only the flat
+backend lets several processes share one index: every Chroma process keeps
+its own HNSW segment and overwrites the others' on persist. With more than
+one worker the backend therefore defaults to "flat", and an explicit
+VECTOR_STORE_BACKEND=chroma is refused.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from dotenv import load_dotenv
+
+# Must be set before the app (and config) is imported by preload_app
+os.environ["PRELOAD_FORK"] = "1"
+# HF tokenizers disable their thread pool after fork and warn about it otherwise
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+# Workers exchange metric snapshots here so /api/metrics covers all of them (one dir per master)
+os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), f"assistant-metrics-{os.getpid()}"))
+
+CHROMA_SINGLE_PROCESS = (
+    "VECTOR_STORE_BACKEND=chroma supports a single process: each Chroma process keeps its own "
+    "HNSW index and workers would overwrite each other's writes. Use VECTOR_STORE_BACKEND=flat "
+    "or one worker."
+)
+
+# .env may choose the backend explicitly; only an unset backend defaults to flat
+load_dotenv()
+workers = int(os.getenv("GUNICORN_WORKERS", min(multiprocessing.cpu_count(), 4)))
+if workers > 1 and os.environ.setdefault("VECTOR_STORE_BACKEND", "flat") == "chroma":
+    raise RuntimeError(CHROMA_SINGLE_PROCESS)
+
+from config import FLASK_HOST, FLASK_PORT, VECTOR_STORE_BACKEND, METRICS_MULTIPROC_DIR
+
+bind = os.getenv("GUNICORN_BIND", f"{FLASK_HOST}:{FLASK_PORT}")
+threads = int(os.getenv("GUNICORN_THREADS", "8"))  # Requests mostly wait on the LLM API
+worker_class = "gthread"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+
+def on_starting(server):
+    # -w / --workers on the command line overrides `workers` above
+    if VECTOR_STORE_BACKEND == "chroma" and server.cfg.workers > 1:
+        raise RuntimeError(CHROMA_SINGLE_PROCESS)
+    # Snapshots left by a previous run would count as dead workers' totals
+    if METRICS_MULTIPROC_DIR:
+        shutil.rmtree(METRICS_MULTIPROC_DIR, ignore_errors=True)
+
+def on_exit(server):
+    if METRICS_MULTIPROC_DIR:
+        shutil.rmtree(METRICS_MULTIPROC_DIR, ignore_errors=True)
+
+def when_ready(server):
+    if VECTOR_STORE_BACKEND == "flat" and os.path.exists(os.path.join("chroma_db", "chroma.sqlite3")) \
+            and not os.path.isdir(os.path.join("chroma_db", "flat_index")):
+        server.log.warning(
+            f"Serving {workers} workers from the flat vector store, which is empty while chroma_db/ holds "
+            "Chroma data: re-upload the knowledge documents, or run one worker with VECTOR_STORE_BACKEND=chroma."
+        )
+
+def post_fork(server, worker):
+    import app
+    app.reinitialize_after_fork()
+    server.log.info(f"Worker {worker.pid} reinitialized after fork")
@@ -0,0 +1,3 @@
+"""
+Load-test tools (run from backend/: python -m loadtest.<name>)
+"""
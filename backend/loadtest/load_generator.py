@@ -0,0 +1,308 @@
+"""
+Closed-loop load generator for /api/chat replaying realistic conversation mixes
+
+Each virtual user repeatedly picks a scenario by weight and plays it in a new
+session, waiting --think-ms between messages:
+    faq    one default FAQ question (answered from the FAQ collection)
+    rag    one question about the uploaded documents (knowledge retrieval + LLM)
+    tool   one question the LLM routes to a function (courses, exams, tuition, services)
+    multi  a 3-5 message session mixing the above with follow-ups
+Reports throughput, p50/p95/p99 latency by response `source` and by scenario,
+and error rates (non-200 responses, transport errors, `error` payloads).
+
+Run from backend/ against a server you started (point OPENAI_BASE_URL at
+loadtest.mock_openai to keep the LLM offline):
+    python -m loadtest.load_generator --url http://127.0.0.1:5001 --users 32 --duration 60
+
+Or let it start the mock and the server for each worker x thread config:
+    python -m loadtest.load_generator --mock --spawn gunicorn --configs 1x8 2x8 4x16 --users 64
+    python -m loadtest.load_generator --mock --spawn uvicorn --configs 1 2 --mock-args="--error-rate 0.05"
+
+--seed-documents uploads frontend/public/documents/*.txt through
+/api/knowledge/upload-text first, so rag questions have something to retrieve.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import signal
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DOCUMENTS_DIR = BACKEND_DIR.parent / "frontend" / "public" / "documents"
+
+RAG_QUESTIONS = [
+    "Ký túc xá có những loại phòng nào và giá bao nhiêu?",
+    "Thủ tục đăng ký ở ký túc xá như thế nào?",
+    "Điều kiện để nhận học bổng khuyến khích học tập là gì?",
+    "Học bổng được xét vào thời điểm nào trong năm?",
+    "Sinh viên bị cảnh báo học vụ khi nào?",
+    "Quy định về số tín chỉ tối thiểu mỗi học kỳ là gì?",
+    "Các bước đăng ký môn học trên cổng thông tin?",
+    "Có thể hủy môn học sau khi đăng ký không?",
+    "Trường có những câu lạc bộ ngoại khóa nào?",
+    "Hoạt động ngoại khóa được tính điểm rèn luyện ra sao?"
+]
+TOOL_TEMPLATES = [
+    "Cho mình thông tin môn {course_id}",
+    "Lịch thi môn {course_id} khi nào?",
+    "Học phí cho {credits} tín chỉ là bao nhiêu?",
+    "Trường có dịch vụ {service} không?",
+    "Cho mình xem danh sách môn học của trường"
+]
+SERVICE_PHRASES = ["thư viện", "ký túc xá", "tư vấn nghề nghiệp", "tư vấn học tập", "hỗ trợ IT", "y tế"]
+FOLLOW_UPS = [
+    "Cảm ơn, cho mình hỏi thêm chi tiết được không?",
+    "Vậy hạn chót là khi nào?",
+    "Mình cần chuẩn bị giấy tờ gì?",
+    "Có thể làm trực tuyến không?"
+]
+DEFAULT_MIX = "faq=0.35,rag=0.3,tool=0.2,multi=0.15"
+
+def _load_json(name: str) -> List[Dict[str, Any]]:
+    with open(BACKEND_DIR / "data" / name, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+class Scenarios:
+    """Message sequences per scenario, drawn from the repo's FAQ and course data"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.faq_questions = [faq["question"] for faq in _load_json("default_faqs.json")]
+        self.course_ids = [course["course_id"] for course in _load_json("courses.json")]
+
+    def faq(self) -> List[str]:
+        return [self.rng.choice(self.faq_questions)]
+
+    def rag(self) -> List[str]:
+        return [self.rng.choice(RAG_QUESTIONS)]
+
+    def tool(self) -> List[str]:
+        template = self.rng.choice(TOOL_TEMPLATES)
+        return [template.format(course_id=self.rng.choice(self.course_ids), credits=self.rng.randint(12, 24),
+                                service=self.rng.choice(SERVICE_PHRASES))]
+
+    def multi(self) -> List[str]:
+        messages = []
+        for _ in range(self.rng.randint(3, 5)):
+            kind = self.rng.choice(["faq", "rag", "tool", "follow_up", "follow_up"])
+            messages += [self.rng.choice(FOLLOW_UPS)] if kind == "follow_up" else getattr(self, kind)()
+        return messages
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("faq", "rag", "tool", "multi"):
+            raise ValueError(f"Unknown scenario '{name}' in --mix")
+        mix[name] = float(weight)
+    return mix
+
+class LoadRun:
+    """Virtual users against one server; collects one sample per chat request"""
+
+    def __init__(self, base_url: str, users: int, duration_s: float, think_s: float, mix: Dict[str, float],
+                 timeout_s: float, seed: int):
+        self.base_url = base_url.rstrip("/")
+        self.users = users
+        self.duration_s = duration_s
+        self.think_s = think_s
+        self.mix = mix
+        self.timeout_s = timeout_s
+        self.seed = seed
+        self.samples: List[Dict[str, Any]] = []
+
+    async def _send(self, client: httpx.AsyncClient, session_id: str, message: str, scenario: str):
+        sample = {"scenario": scenario, "source": None, "status": None, "error": None}
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/chat", json={"message": message, "session_id": session_id})
+            sample["status"] = response.status_code
+            payload = response.json()
+            sample["source"] = payload.get("source")
+            if response.status_code != 200:
+                sample["error"] = f"http_{response.status_code}"
+            elif "error" in payload:
+                sample["error"] = "error_payload"
+        except (httpx.HTTPError, ValueError) as e:
+            sample["error"] = type(e).__name__
+        sample["latency_s"] = time.perf_counter() - started
+        sample["source"] = sample["source"] or "error"
+        self.samples.append(sample)
+
+    async def _user(self, client: httpx.AsyncClient, user: int, stop_at: float):
+        rng = random.Random(self.seed * 1000 + user)
+        scenarios = Scenarios(rng)
+        names, weights = list(self.mix), list(self.mix.values())
+        session = 0
+        while time.monotonic() < stop_at:
+            scenario = rng.choices(names, weights)[0]
+            # One session per scenario run keeps us under the per-session rate limit
+            session_id = f"loadtest-{self.seed}-{user}-{session}"
+            session += 1
+            for message in getattr(scenarios, scenario)():
+                if time.monotonic() >= stop_at:
+                    break
+                await self._send(client, session_id, message, scenario)
+                await asyncio.sleep(rng.expovariate(1 / self.think_s) if self.think_s > 0 else 0)
+
+    async def run(self) -> Dict[str, Any]:
+        limits = httpx.Limits(max_connections=self.users, max_keepalive_connections=self.users)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout_s, limits=limits) as client:
+            started = time.monotonic()
+            stop_at = started + self.duration_s
+            await asyncio.gather(*(self._user(client, user, stop_at) for user in range(self.users)))
+            elapsed = time.monotonic() - started
+        return summarize(self.samples, elapsed)
+
+def _latency_stats(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    values = np.asarray([s["latency_s"] for s in samples]) * 1000
+    errors = sum(1 for s in samples if s["error"])
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        "error_rate": round(errors / len(samples), 4)
+    }
+
+def summarize(samples: List[Dict[str, Any]], elapsed_s: float) -> Dict[str, Any]:
+    """Throughput, latency percentiles by source and scenario, and error counts"""
+    if not samples:
+        return {"requests": 0, "elapsed_s": round(elapsed_s, 1)}
+    by_source, by_scenario, errors = defaultdict(list), defaultdict(list), defaultdict(int)
+    for sample in samples:
+        by_source[sample["source"]].append(sample)
+        by_scenario[sample["scenario"]].append(sample)
+        if sample["error"]:
+            errors[sample["error"]] += 1
+    return {
+        "requests": len(samples),
+        "elapsed_s": round(elapsed_s, 1),
+        "throughput_rps": round(len(samples) / elapsed_s, 2),
+        "overall": _latency_stats(samples),
+        "by_source": {source: _latency_stats(group) for source, group in sorted(by_source.items())},
+        "by_scenario": {scenario: _latency_stats(group) for scenario, group in sorted(by_scenario.items())},
+        "errors": dict(errors)
+    }
+
+def seed_documents(base_url: str):
+    """Upload the sample documents (upsert, so repeated runs do not duplicate chunks)"""
+    with httpx.Client(base_url=base_url, timeout=300) as client:
+        for path in sorted(DOCUMENTS_DIR.glob("*.txt")):
+            response = client.post("/api/knowledge/upload-text", json={
+                "title": path.stem, "content": path.read_text(encoding="utf-8"),
+                "category": "loadtest", "upsert": True
+            })
+            print(f"Seeded {path.name}: HTTP {response.status_code}", file=sys.stderr)
+
+def wait_ready(base_url: str, timeout_s: float, process: Optional[subprocess.Popen] = None):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode} before becoming ready")
+        try:
+            if httpx.get(f"{base_url}/api/health/ready", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"{base_url} not ready after {timeout_s:.0f}s")
+
+def spawn_server(kind: str, config: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    """gunicorn with "WORKERSxTHREADS" or uvicorn (asgi.py) with "WORKERS" """
+    workers, _, threads = config.partition("x")
+    if kind == "gunicorn":
+        env = {**env, "GUNICORN_WORKERS": workers, "GUNICORN_THREADS": threads or "8",
+               "GUNICORN_BIND": f"127.0.0.1:{port}"}
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+                   "--workers", workers, "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, start_new_session=True)
+
+def stop_process(process: subprocess.Popen):
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5001", help="Server to load (ignored with --spawn)")
+    parser.add_argument("--users", type=int, default=32, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of load per run")
+    parser.add_argument("--think-ms", type=float, default=500, help="Mean pause between a user's messages")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights")
+    parser.add_argument("--timeout", type=float, default=60, help="Client timeout per request")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--seed-documents", action="store_true", help="Upload the sample documents first")
+    parser.add_argument("--spawn", choices=["gunicorn", "uvicorn"], help="Start the server once per --configs entry")
+    parser.add_argument("--configs", nargs="+", default=["2x8"], help="WORKERSxTHREADS (gunicorn) or WORKERS (uvicorn)")
+    parser.add_argument("--port", type=int, default=5081, help="Port for spawned servers")
+    parser.add_argument("--mock", action="store_true", help="Start loadtest.mock_openai and point the server at it")
+    parser.add_argument("--mock-port", type=int, default=5099)
+    parser.add_argument("--mock-args", default="", help="Extra mock_openai arguments, e.g. \"--error-rate 0.05\"")
+    parser.add_argument("--output", help="Write the report JSON here instead of stdout")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    mock = None
+    env = dict(os.environ)
+    if args.mock:
+        mock = subprocess.Popen(
+            [sys.executable, "-m", "loadtest.mock_openai", "--port", str(args.mock_port), "--seed", str(args.seed),
+             *shlex.split(args.mock_args)],
+            cwd=BACKEND_DIR, start_new_session=True
+        )
+        env["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}/v1"
+        env.setdefault("OPENAI_API_KEY", "sk-loadtest")
+
+    report = {"mix": mix, "users": args.users, "duration_s": args.duration, "think_ms": args.think_ms,
+              "mock_args": args.mock_args if args.mock else None, "runs": []}
+    try:
+        for config in (args.configs if args.spawn else [None]):
+            server = None
+            base_url = args.url
+            if args.spawn:
+                base_url = f"http://127.0.0.1:{args.port}"
+                server = spawn_server(args.spawn, config, args.port, env)
+            try:
+                wait_ready(base_url, 300, server)
+                if args.seed_documents:
+                    seed_documents(base_url)
+                result = asyncio.run(LoadRun(base_url, args.users, args.duration, args.think_ms / 1000, mix,
+                                             args.timeout, args.seed).run())
+            finally:
+                if server is not None:
+                    stop_process(server)
+            label = f"{args.spawn}:{config}" if args.spawn else base_url
+            report["runs"].append({"config": label, **result})
+            print(f"{label}: {result.get('throughput_rps', 0)} req/s, "
+                  f"p95 {result.get('overall', {}).get('p95_ms')} ms, "
+                  f"errors {result.get('overall', {}).get('error_rate')}", file=sys.stderr)
+    finally:
+        if mock is not None:
+            stop_process(mock)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Local stand-in for the OpenAI chat-completions API, for load tests that must
+not spend real quota
+
+Serves POST /v1/chat/completions (plain and stream=true SSE) with latencies
+drawn from a configurable distribution, Vietnamese canned answers sized to a
+token budget, function/tool calls for questions the real model would route to
+our functions (courses, exams, tuition, services), and injected HTTP errors or
+hung requests. GET /stats reports what was served.
+
+Run from backend/:
+    python -m loadtest.mock_openai --port 5099 --latency lognormal:0.8,0.5 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:5099/v1 gunicorn -c gunicorn.conf.py wsgi:app
+
+Latency specs (seconds): fixed:0.5, uniform:0.2,1.5, normal:0.8,0.2,
+lognormal:MEDIAN,SIGMA, exponential:MEAN. The sampled value is the time to the
+first token; generation then takes completion_tokens / --tokens-per-s.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+ERROR_BODIES = {
+    429: ("rate_limit_exceeded", "Rate limit reached (injected by mock)"),
+    500: ("server_error", "The server had an error processing your request (injected by mock)"),
+    502: ("bad_gateway", "Bad gateway (injected by mock)"),
+    503: ("service_unavailable", "The engine is currently overloaded (injected by mock)")
+}
+
+ANSWER_SENTENCES = [
+    "Theo quy định của trường, sinh viên cần hoàn thành thủ tục trên cổng thông tin đào tạo.",
+    "Bạn nên liên hệ phòng đào tạo trong giờ hành chính để được hướng dẫn chi tiết.",
+    "Thông tin này được cập nhật vào đầu mỗi học kỳ.",
+    "Nếu cần hỗ trợ thêm, bạn có thể gửi email cho cố vấn học tập của khoa.",
+    "Hạn chót thường là hai tuần sau khi có thông báo chính thức.",
+    "Sinh viên đủ điều kiện sẽ nhận được kết quả qua email trường."
+]
+
+_COURSE_ID_RE = re.compile(r"\b([A-Za-z]{2,4}\s?\d{3,4})\b")
+_NUMBER_RE = re.compile(r"\b(\d{1,2})\s*tín chỉ")
+SERVICE_KEYWORDS = {
+    "thư viện": "Library", "ký túc": "Dormitory", "tư vấn nghề": "Career", "tư vấn học tập": "Academic Advising",
+    "hỗ trợ it": "IT Support", "hỗ trợ tài chính": "Financial Aid", "sức khỏe": "Health", "y tế": "Health"
+}
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Latency sampler from a "kind:params" spec (seconds, never negative)"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    samplers = {
+        "fixed": lambda rng: values[0],
+        "uniform": lambda rng: rng.uniform(values[0], values[1]),
+        "normal": lambda rng: rng.gauss(values[0], values[1]),
+        "lognormal": lambda rng: rng.lognormvariate(math.log(values[0]), values[1]),
+        "exponential": lambda rng: rng.expovariate(1 / values[0])
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution '{kind}'. Available: {', '.join(samplers)}")
+    sampler = samplers[kind]
+    sampler(random.Random(0))  # Fail at startup on missing parameters
+    return lambda rng: max(0.0, sampler(rng))
+
+def count_tokens(text: str) -> int:
+    """Rough token count for Vietnamese text (about 1.3 tokens per syllable)"""
+    return max(1, int(len(text.split()) * 1.3))
+
+def route_function(question: str, function_names: List[str]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """The function call a real model would most likely make for this question, if any"""
+    text = question.lower()
+    course = _COURSE_ID_RE.search(question)
+    candidates = []
+    if course and ("thi" in text or "kiểm tra" in text):
+        candidates.append(("get_exam_schedule", {"course_id": course.group(1).replace(" ", "").upper()}))
+    if course:
+        candidates.append(("get_course_info", {"course_id": course.group(1).replace(" ", "").upper()}))
+    credits = _NUMBER_RE.search(text)
+    if credits and "học phí" in text:
+        candidates.append(("calculate_tuition", {"credit_hours": int(credits.group(1))}))
+    if "tất cả môn" in text or "danh sách môn" in text:
+        candidates.append(("get_all_courses", {}))
+    for keyword, service in SERVICE_KEYWORDS.items():
+        if keyword in text and "dịch vụ" in text:
+            candidates.append(("get_student_services", {"service_name": service}))
+            break
+    for name, arguments in candidates:
+        if name in function_names:
+            return name, arguments
+    return None
+
+class MockBehaviour:
+    """Latency, answer length, function-call and error settings plus served-request counters"""
+
+    def __init__(self, latency: str = "lognormal:0.8,0.5", tokens_per_s: float = 0.0,
+                 completion_tokens: int = 120, function_rate: float = 1.0, error_rate: float = 0.0,
+                 error_statuses: Tuple[int, ...] = (500, 503, 429), hang_rate: float = 0.0,
+                 hang_s: float = 300.0, seed: Optional[int] = None):
+        self.sample_latency = parse_latency(latency)
+        self.latency_spec = latency
+        self.tokens_per_s = tokens_per_s
+        self.completion_tokens = completion_tokens
+        self.function_rate = function_rate
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.hang_rate = hang_rate
+        self.hang_s = hang_s
+        self.rng = random.Random(seed)
+        self.started_at = time.time()
+        self.counters = {
+            "requests": 0, "streamed": 0, "function_calls": 0, "errors": 0, "hangs": 0,
+            "in_flight": 0, "prompt_tokens": 0, "completion_tokens": 0
+        }
+
+    def generation_time(self, tokens: int) -> float:
+        return tokens / self.tokens_per_s if self.tokens_per_s > 0 else 0.0
+
+    def answer(self, question: str, max_tokens: Optional[int]) -> Tuple[str, str]:
+        """Answer text and finish_reason, cut at max_tokens"""
+        target = max(8, int(self.rng.gauss(self.completion_tokens, self.completion_tokens / 4)))
+        words = f"Về câu hỏi \"{question[:80]}\":".split()
+        while count_tokens(" ".join(words)) < target:
+            words.extend(self.rng.choice(ANSWER_SENTENCES).split())
+        finish_reason = "stop"
+        if max_tokens and count_tokens(" ".join(words)) > max_tokens:
+            words = words[:max(1, int(max_tokens / 1.3))]
+            finish_reason = "length"
+        return " ".join(words), finish_reason
+
+def _error_response(status: int) -> JSONResponse:
+    code, message = ERROR_BODIES.get(status, ("server_error", "Injected error"))
+    return JSONResponse({"error": {"message": message, "type": code, "param": None, "code": code}}, status_code=status)
+
+def _last_message(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return messages[-1] if messages else {"role": "user", "content": ""}
+
+def create_app(behaviour: MockBehaviour) -> Starlette:
+    async def completions(request: Request):
+        body = await request.json()
+        counters = behaviour.counters
+        counters["requests"] += 1
+        rng = behaviour.rng
+
+        if rng.random() < behaviour.hang_rate:
+            counters["hangs"] += 1
+            await asyncio.sleep(behaviour.hang_s)
+        if rng.random() < behaviour.error_rate:
+            counters["errors"] += 1
+            await asyncio.sleep(behaviour.sample_latency(rng) / 4)
+            return _error_response(rng.choice(behaviour.error_statuses))
+
+        messages = body.get("messages", [])
+        last = _last_message(messages)
+        prompt_tokens = sum(count_tokens(str(m.get("content") or "")) for m in messages)
+        function_names = [f["name"] for f in body.get("functions", [])]
+        function_names += [t["function"]["name"] for t in body.get("tools", []) if t.get("type") == "function"]
+
+        # Function call only on a fresh user turn (a follow-up after a function result gets prose)
+        call = None
+        if function_names and last.get("role") == "user" and rng.random() < behaviour.function_rate:
+            call = route_function(str(last.get("content") or ""), function_names)
+
+        if call is not None:
+            name, arguments = call
+            counters["function_calls"] += 1
+            content, finish_reason = None, "tool_calls" if body.get("tools") else "function_call"
+            completion_tokens = count_tokens(json.dumps(arguments)) + 5
+            message = {"role": "assistant", "content": None}
+            if body.get("tools"):
+                message["tool_calls"] = [{"id": f"call_{uuid.uuid4().hex[:24]}", "type": "function",
+                                          "function": {"name": name, "arguments": json.dumps(arguments)}}]
+            else:
+                message["function_call"] = {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)}
+        else:
+            question = next((str(m.get("content")) for m in reversed(messages) if m.get("role") == "user"), "")
+            content, finish_reason = behaviour.answer(question, body.get("max_tokens"))
+            completion_tokens = count_tokens(content)
+            message = {"role": "assistant", "content": content}
+
+        counters["prompt_tokens"] += prompt_tokens
+        counters["completion_tokens"] += completion_tokens
+        first_token_s = behaviour.sample_latency(rng)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        base = {"id": completion_id, "created": int(time.time()), "model": body.get("model", "mock")}
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+
+        if body.get("stream"):
+            counters["streamed"] += 1
+            return StreamingResponse(
+                _stream(behaviour, base, message, content, finish_reason, first_token_s, usage,
+                        (body.get("stream_options") or {}).get("include_usage", False)),
+                media_type="text/event-stream"
+            )
+
+        counters["in_flight"] += 1
+        try:
+            await asyncio.sleep(first_token_s + behaviour.generation_time(completion_tokens))
+        finally:
+            counters["in_flight"] -= 1
+        return JSONResponse({
+            **base,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+            "usage": usage
+        })
+
+    async def models(request: Request):
+        return JSONResponse({"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "loadtest"}]})
+
+    async def stats(request: Request):
+        return JSONResponse({
+            **behaviour.counters,
+            "latency": behaviour.latency_spec,
+            "error_rate": behaviour.error_rate,
+            "uptime_s": round(time.time() - behaviour.started_at, 1)
+        })
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", completions, methods=["POST"]),
+        Route("/v1/models", models, methods=["GET"]),
+        Route("/stats", stats, methods=["GET"])
+    ])
+
+async def _stream(behaviour: MockBehaviour, base: Dict[str, Any], message: Dict[str, Any], content: Optional[str],
+                  finish_reason: str, first_token_s: float, usage: Dict[str, int], include_usage: bool):
+    """SSE chunks: role delta, then the function call or one delta per word, then finish and [DONE]"""
+    counters = behaviour.counters
+    counters["in_flight"] += 1
+    try:
+        def chunk(delta: Dict[str, Any], finish: Optional[str] = None, **extra) -> str:
+            payload = {**base, "object": "chat.completion.chunk",
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish, "logprobs": None}], **extra}
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        await asyncio.sleep(first_token_s)
+        yield chunk({"role": "assistant", "content": "" if content is not None else None})
+        if content is None:
+            if "tool_calls" in message:
+                call = message["tool_calls"][0]
+                yield chunk({"tool_calls": [{"index": 0, **call}]})
+            else:
+                yield chunk({"function_call": message["function_call"]})
+        else:
+            tokens_per_s = behaviour.tokens_per_s or 50.0
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                yield chunk({"content": word if i == 0 else f" {word}"})
+                await asyncio.sleep(1.3 / tokens_per_s)
+        yield chunk({}, finish_reason)
+        if include_usage:
+            yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+    finally:
+        counters["in_flight"] -= 1
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--latency", default="lognormal:0.8,0.5", help="Time-to-first-token distribution")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="Generation speed (0 = included in --latency)")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Mean answer length")
+    parser.add_argument("--function-rate", type=float, default=1.0,
+                        help="Probability of answering a routable question with a function call")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-statuses", type=int, nargs="+", default=[500, 503, 429])
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Share of requests that never answer in time")
+    parser.add_argument("--hang-s", type=float, default=300.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    behaviour = MockBehaviour(
+        latency=args.latency, tokens_per_s=args.tokens_per_s, completion_tokens=args.completion_tokens,
+        function_rate=args.function_rate, error_rate=args.error_rate, error_statuses=tuple(args.error_statuses),
+        hang_rate=args.hang_rate, hang_s=args.hang_s, seed=args.seed
+    )
+    uvicorn.run(create_app(behaviour), host=args.host, port=args.port, log_level="warning", backlog=4096)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Replay recorded sessions against a build and compare with the recorded run
+
+User messages from conversation_logs/sessions/*.json are streamed in their
+original global order, keeping the recorded gaps between them (divided by
+--speed; --speed 0 sends as fast as --concurrency allows) and the order within
+each session. Every message goes to /api/chat under a fresh session id
+("replay-<run>-<original id>") with X-Debug-Timings, so each response carries
+its stage trace.
+
+The report compares, against the recorded run:
+    sources  answer source distribution (faq, rag, openai, function, ...) and
+             how often a message got the same source as when it was recorded
+    stages   p50/p95/p99 per pipeline stage and for the whole request, from the
+             recorded trace log (TRACE_LOG_PATH) vs the replayed traces; with
+             --baseline-tolerance a slowdown beyond it exits with code 1
+
+Targets: --inprocess imports the app and drives it through the Flask test
+client (replayed conversations are logged to a scratch directory, not the real
+one); --url sends HTTP to a running server. Use the mock LLM so the replay
+spends no API quota: --mock starts loadtest.mock_openai and points the
+in-process app at it; for --url start the server with OPENAI_BASE_URL set to it.
+
+Run from backend/:
+    python -m loadtest.replay --inprocess --mock --speed 10 --limit 200
+    python -m loadtest.mock_openai --port 5099 &
+    OPENAI_BASE_URL=http://127.0.0.1:5099/v1 gunicorn -c gunicorn.conf.py wsgi:app &
+    python -m loadtest.replay --url http://127.0.0.1:5001 --speed 0 --concurrency 32 --output replay.json
+"""
+import argparse
+import heapq
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks import baseline
+from loadtest.load_generator import BACKEND_DIR, stop_process, wait_ready
+
+REPLAY_PREFIX = "replay-"
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def load_session(path: Path) -> List[Dict[str, Any]]:
+    """
+    User messages of one session log with their time and recorded answer source
+
+    Returns:
+        List[Dict]: {"at", "session", "message", "recorded_source"} in session order
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    session_id = data.get("session_id", path.stem)
+    started = _parse_time(data.get("timestamp")) or 0.0
+    events, at = [], started
+    for message in data.get("messages", []):
+        at = _parse_time(message.get("timestamp")) or at
+        if message.get("role") == "user":
+            events.append({"at": at, "session": session_id, "message": message.get("content", ""),
+                           "recorded_source": None})
+        elif message.get("role") == "assistant" and events and events[-1]["recorded_source"] is None:
+            events[-1]["recorded_source"] = message.get("source", "unknown")
+    return events
+
+def stream_messages(sessions_dir: str, limit: Optional[int] = None, since: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """User messages of all sessions merged into one timeline (earliest first); replays are skipped"""
+    paths = sorted(p for p in Path(sessions_dir).glob("*.json") if not p.name.startswith(REPLAY_PREFIX))
+    since_ts = _parse_time(since) if since else None
+    sessions = []
+    for path in paths:
+        try:
+            events = load_session(path)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {path.name}: {e}", file=sys.stderr)
+            continue
+        if events and (since_ts is None or events[0]["at"] >= since_ts):
+            sessions.append(events)
+    sessions.sort(key=lambda events: events[0]["at"])
+    if limit:
+        sessions = sessions[:limit]
+    return heapq.merge(*sessions, key=lambda event: event["at"])
+
+def stage_totals(record: Dict[str, Any]) -> Dict[str, float]:
+    """Duration per top-level stage of a trace record, plus the whole request as "total" """
+    totals = defaultdict(float)
+    for span in record.get("spans", []):
+        if "parent" not in span:
+            totals[span["name"]] += span["duration_ms"]
+    totals["total"] = record.get("duration_ms", 0.0)
+    return totals
+
+def load_recorded_traces(trace_path: str, sessions: Optional[set] = None) -> List[Dict[str, Any]]:
+    """Chat trace records from every process's NDJSON log and rotated backups (only these sessions when given)"""
+    from utils.tracing import trace_log_files
+
+    records = []
+    for path in trace_log_files(trace_path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                session = record.get("session", "")
+                if session.startswith(REPLAY_PREFIX):
+                    continue
+                # Records written before traces carried the session id cannot be matched and are all kept
+                if sessions is not None and session and session not in sessions:
+                    continue
+                records.append(record)
+    return records
+
+def latency_cases(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Stage latency percentiles in the benchmarks.baseline case format"""
+    samples = defaultdict(list)
+    for record in records:
+        for stage, duration in stage_totals(record).items():
+            samples[stage].append(duration)
+    cases = []
+    for stage, values in sorted(samples.items()):
+        values = np.asarray(values)
+        cases.append({
+            "case": stage,
+            "count": len(values),
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p95_ms": round(float(np.percentile(values, 95)), 2),
+            "p99_ms": round(float(np.percentile(values, 99)), 2)
+        })
+    return cases
+
+class HttpTarget:
+    def __init__(self, base_url: str, timeout_s: float, concurrency: int):
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        self.client = httpx.Client(base_url=base_url.rstrip("/"), timeout=timeout_s, limits=limits)
+
+    def post(self, payload: Dict[str, Any], headers: Dict[str, str]):
+        response = self.client.post("/api/chat", json=payload, headers=headers)
+        return response.status_code, response.json()
+
+    def close(self):
+        self.client.close()
+
+class InProcessTarget:
+    """The Flask app in this process; replayed conversations are logged under log_dir"""
+
+    def __init__(self, log_dir: str):
+        import logging
+        import app as app_module
+        from conversation_logger import ConversationLogger
+
+        logging.getLogger().setLevel(logging.WARNING)
+        if app_module.chroma_db is None:
+            raise SystemExit("App services failed to initialize; see the log above")
+        app_module.bind_services(app_module.chroma_db, ConversationLogger(log_dir=log_dir))
+        self.client = app_module.app.test_client()
+
+    def post(self, payload: Dict[str, Any], headers: Dict[str, str]):
+        response = self.client.post("/api/chat", json=payload, headers=headers)
+        return response.status_code, response.get_json(silent=True) or {}
+
+    def close(self):
+        pass
+
+class Replay:
+    """Schedules recorded messages against a target and collects one sample per message"""
+
+    def __init__(self, target, speed: float, concurrency: int, max_gap_s: Optional[float]):
+        self.target = target
+        self.speed = speed
+        self.max_gap_s = max_gap_s
+        self.run_id = uuid.uuid4().hex[:6]
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay")
+        self.samples: List[Dict[str, Any]] = []
+        self._samples_lock = threading.Lock()
+
+    def _send(self, event: Dict[str, Any], scheduled: float, previous: Optional[Future]):
+        # Messages of one session stay in order: wait for the previous answer (submitted earlier, so never starved)
+        if previous is not None:
+            previous.result()
+        sample = {"session": event["session"], "recorded_source": event["recorded_source"],
+                  "lag_ms": round((time.perf_counter() - scheduled) * 1000, 2), "error": None, "trace": None}
+        started = time.perf_counter()
+        try:
+            status, payload = self.target.post(
+                {"message": event["message"], "session_id": f"{REPLAY_PREFIX}{self.run_id}-{event['session']}"},
+                {"X-Debug-Timings": "1"}
+            )
+            sample["status"] = status
+            sample["source"] = payload.get("source") or "error"
+            sample["trace"] = payload.get("debug_timings")
+            if status != 200:
+                sample["error"] = f"http_{status}"
+        except Exception as e:
+            sample["status"], sample["source"], sample["error"] = None, "error", type(e).__name__
+        sample["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        with self._samples_lock:
+            self.samples.append(sample)
+
+    def run(self, events: Iterator[Dict[str, Any]]) -> float:
+        """Send every event at its (scaled) recorded offset; returns the elapsed seconds"""
+        started = time.perf_counter()
+        last_sessions: Dict[str, Future] = {}
+        first_at = previous_at = None
+        offset = 0.0
+        futures = []
+        for event in events:
+            if first_at is None:
+                first_at = previous_at = event["at"]
+            gap = max(0.0, event["at"] - previous_at)
+            previous_at = event["at"]
+            if self.speed > 0:
+                gap /= self.speed
+                offset += min(gap, self.max_gap_s) if self.max_gap_s is not None else gap
+            scheduled = started + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            future = self.executor.submit(self._send, event, scheduled, last_sessions.get(event["session"]))
+            last_sessions[event["session"]] = future
+            futures.append(future)
+        for future in futures:
+            future.result()
+        self.executor.shutdown()
+        return time.perf_counter() - started
+
+def _shares(counter: Counter) -> Dict[str, Dict[str, Any]]:
+    total = sum(counter.values()) or 1
+    return {source: {"count": count, "share": round(count / total, 4)} for source, count in counter.most_common()}
+
+def compare_sources(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    recorded = Counter(s["recorded_source"] or "unanswered" for s in samples)
+    replayed = Counter(s["source"] for s in samples)
+    transitions = Counter(f"{s['recorded_source'] or 'unanswered'}->{s['source']}" for s in samples
+                          if s["source"] != s["recorded_source"])
+    return {
+        "recorded": _shares(recorded),
+        "replayed": _shares(replayed),
+        "agreement": round(sum(1 for s in samples if s["source"] == s["recorded_source"]) / len(samples), 4),
+        "changed": dict(transitions.most_common())
+    }
+
+def _wait_mock(base_url: str, process: subprocess.Popen, timeout_s: float = 30):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Mock LLM exited with code {process.returncode}")
+        try:
+            httpx.get(f"{base_url}/v1/models", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit(f"Mock LLM not reachable at {base_url}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Replay over HTTP against this server")
+    target.add_argument("--inprocess", action="store_true", help="Replay through the Flask test client")
+    parser.add_argument("--sessions-dir", default="conversation_logs/sessions")
+    parser.add_argument("--traces", help="Recorded trace log (default: TRACE_LOG_PATH)")
+    parser.add_argument("--limit", type=int, help="Replay only the first N sessions")
+    parser.add_argument("--since", help="Only sessions starting at or after this ISO time")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time compression (0 = no gaps)")
+    parser.add_argument("--max-gap", type=float, help="Cap idle gaps to this many seconds (after --speed)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max messages in flight")
+    parser.add_argument("--timeout", type=float, default=60, help="HTTP timeout per request")
+    parser.add_argument("--mock", action="store_true", help="Start loadtest.mock_openai for the in-process app")
+    parser.add_argument("--mock-port", type=int, default=5099)
+    parser.add_argument("--mock-args", default="", help="Extra mock_openai arguments")
+    parser.add_argument("--log-dir", help="Conversation log directory for the in-process replay (default: temporary)")
+    parser.add_argument("--baseline-tolerance", type=float, default=0.25,
+                        help="Allowed relative stage slowdown vs the recorded run")
+    parser.add_argument("--output", help="Write the report JSON here instead of stdout")
+    args = parser.parse_args()
+    if args.mock and args.url:
+        parser.error("--mock only applies to --inprocess; start the server with OPENAI_BASE_URL pointing at the mock")
+
+    # Recorded data is read before the replay appends its own traces to the same log
+    events = list(stream_messages(args.sessions_dir, args.limit, args.since))
+    if not events:
+        raise SystemExit(f"No user messages found in {args.sessions_dir}")
+    sessions = {event["session"] for event in events}
+
+    mock = None
+    if args.mock:
+        # Before config is imported: the app reads OPENAI_BASE_URL at import time
+        mock = subprocess.Popen(
+            [sys.executable, "-m", "loadtest.mock_openai", "--port", str(args.mock_port), *shlex.split(args.mock_args)],
+            cwd=BACKEND_DIR, start_new_session=True
+        )
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}/v1"
+    if args.inprocess:
+        os.environ["STARTUP_MODE"] = "eager"
+
+    log_dir = args.log_dir or tempfile.mkdtemp(prefix="replay-logs-")
+    try:
+        if mock is not None:
+            _wait_mock(f"http://127.0.0.1:{args.mock_port}", mock)
+        if args.traces is None:
+            from config import TRACE_LOG_PATH
+            args.traces = TRACE_LOG_PATH
+        recorded_traces = load_recorded_traces(args.traces, sessions)
+        print(f"Replaying {len(events)} messages from {len(sessions)} sessions "
+              f"({len(recorded_traces)} recorded traces)", file=sys.stderr)
+
+        if args.inprocess:
+            client = InProcessTarget(log_dir)
+        else:
+            wait_ready(args.url.rstrip("/"), 60)
+            client = HttpTarget(args.url, args.timeout, args.concurrency)
+        replay = Replay(client, args.speed, args.concurrency, args.max_gap)
+        elapsed = replay.run(iter(events))
+        client.close()
+    finally:
+        if mock is not None:
+            stop_process(mock)
+
+    samples = replay.samples
+    replayed_traces = [s["trace"] for s in samples if s["trace"]]
+    recorded_stages = {"results": {"stages": latency_cases(recorded_traces)}}
+    replayed_stages = {"results": {"stages": latency_cases(replayed_traces)}}
+    rows = baseline.compare(replayed_stages, recorded_stages, args.baseline_tolerance)
+    lags = np.asarray([s["lag_ms"] for s in samples])
+    report = {
+        "meta": {**baseline.metadata(), "run_id": replay.run_id, "target": args.url or "inprocess",
+                 "speed": args.speed, "concurrency": args.concurrency, "log_dir": log_dir if args.inprocess else None},
+        "messages": len(samples),
+        "sessions": len(sessions),
+        "elapsed_s": round(elapsed, 1),
+        "throughput_rps": round(len(samples) / elapsed, 2),
+        "error_rate": round(sum(1 for s in samples if s["error"]) / len(samples), 4),
+        "errors": dict(Counter(s["error"] for s in samples if s["error"])),
+        "schedule_lag_p95_ms": round(float(np.percentile(lags, 95)), 1),
+        "sources": compare_sources(samples),
+        "stages": {"recorded": recorded_stages["results"]["stages"], "replayed": replayed_stages["results"]["stages"],
+                   "comparison": rows}
+    }
+
+    if args.output:
+        baseline.save(report, args.output)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"Source agreement with the recorded run: {report['sources']['agreement']:.1%}", file=sys.stderr)
+    if not recorded_traces:
+        print("No recorded traces for these sessions; stage latencies were not compared", file=sys.stderr)
+    elif baseline.report(rows):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Inter-process coordination for University Assistant
+File locks that serialize writes across gunicorn workers sharing one
+persist directory, plus shared counters used to invalidate per-worker caches
+"""
+import fcntl
+import os
+import threading
+from pathlib import Path
+import logging
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class InterProcessLock:
+    """
+    Reentrant exclusive lock held across threads (RLock) and processes (flock).
+    The lock file is reopened after fork: a descriptor inherited from the
+    parent shares its flock, so it would not exclude the parent.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize lock
+
+        Args:
+            path: Lock file (created if missing)
+        """
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+        self._pid = None
+
+    def _ensure_fd(self):
+        if self._pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            if self._depth == 0:
+                self._ensure_fd()
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            self._depth += 1
+        except Exception:
+            self._lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+        return False
+
+class LeaderLock:
+    """
+    Non-blocking flock held for the life of the process, so exactly one worker
+    runs singleton background jobs. When the leader exits the lock is released
+    and the next worker to try takes over.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._fd = None
+        self._pid = None
+
+    def try_acquire(self) -> bool:
+        """Return True if this process is (or just became) the leader"""
+        if self._pid == os.getpid():
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        self._pid = os.getpid()
+        logger.info(f"Process {self._pid} acquired {self.path.name}")
+        return True
+
+class SharedCounter:
+    """Integer stored in a small file, so every worker sees the same version"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def read(self) -> int:
+        try:
+            with open(self.path, 'rb') as f:
+                return int(f.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def increment(self) -> int:
+        """Increment the counter (callers hold the write lock)"""
+        value = self.read() + 1
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(str(value).encode('ascii'))
+        os.replace(tmp_path, self.path)
+        return value
@@ -0,0 +1,129 @@
+"""
+Response archive for University Assistant
+Append-only JSONL files holding bot responses for logged user queries, so the
+query log collection only stores small metadata next to each embedding
+"""
+import fcntl
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+from process_lock import SharedCounter
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class ResponseArchive:
+    """
+    Responses are appended as one JSON line each and addressed by
+    (generation, byte offset). Compaction copies the lines still referenced
+    into the next generation's file, publishes it through a shared counter and
+    deletes the old file only after every reference points at the new one, so
+    a stored reference always names a file that holds its line.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize response archive
+
+        Args:
+            path: JSONL file of generation 0; later generations sit next to it
+                (<stem>.g<n>.jsonl)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.generation = SharedCounter(self.path.with_suffix(".generation"))
+        self._lock = threading.Lock()
+
+    def generation_path(self, generation: int) -> Path:
+        """File holding the lines of a generation"""
+        if generation == 0:
+            return self.path
+        return self.path.with_name(f"{self.path.stem}.g{generation}{self.path.suffix}")
+
+    def append(self, log_id: str, response: str, timestamp: str) -> Tuple[int, int]:
+        """
+        Append a response to the current generation (callers hold the write lock,
+        which compaction also holds while it publishes a new generation)
+
+        Args:
+            log_id (str): Query log entry the response belongs to
+            response (str): Bot response text
+            timestamp (str): ISO timestamp of the response
+
+        Returns:
+            Tuple[int, int]: Generation and byte offset of the stored line
+        """
+        line = json.dumps({"id": log_id, "timestamp": timestamp, "response": response}, ensure_ascii=False) + "\n"
+        generation = self.generation.read()
+        with self._lock, open(self.generation_path(generation), 'ab') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0, os.SEEK_END)
+                offset = f.tell()
+                f.write(line.encode('utf-8'))
+                return generation, offset
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read(self, offset: int, generation: int = 0) -> Optional[Dict[str, Any]]:
+        """Read the response stored at a byte offset of a generation"""
+        try:
+            with open(self.generation_path(generation), 'rb') as f:
+                f.seek(offset)
+                return json.loads(f.readline().decode('utf-8'))
+        except Exception as e:
+            logger.warning(f"Could not read archived response at {generation}:{offset}: {e}")
+            return None
+
+    def copy_lines(self, refs: Dict[str, Tuple[int, int]], generation: int, truncate: bool = False) -> Dict[str, int]:
+        """
+        Copy referenced lines to the end of a generation that is not published yet.
+        Older generations are only appended to, so this needs no lock.
+
+        Args:
+            refs (Dict[str, Tuple[int, int]]): log_id -> (generation, offset) of the line to copy
+            generation (int): Target generation
+            truncate (bool): Start the target file empty (left over from an interrupted compaction)
+
+        Returns:
+            Dict[str, int]: log_id -> offset in the target generation
+        """
+        new_offsets = {}
+        sources = {}
+        try:
+            with open(self.generation_path(generation), 'wb' if truncate else 'ab') as dst:
+                for log_id, (source, offset) in sorted(refs.items(), key=lambda item: item[1]):
+                    if source not in sources:
+                        sources[source] = open(self.generation_path(source), 'rb')
+                    src = sources[source]
+                    src.seek(offset)
+                    line = src.readline()
+                    if not line:
+                        continue
+                    new_offsets[log_id] = dst.tell()
+                    dst.write(line)
+                dst.flush()
+                os.fsync(dst.fileno())
+        finally:
+            for src in sources.values():
+                src.close()
+        return new_offsets
+
+    def publish(self, generation: int):
+        """Make a copied generation the target of new appends (callers hold the write lock)"""
+        if self.generation.increment() != generation:
+            raise RuntimeError(f"Response archive generation {generation} was published out of order")
+
+    def drop_generations_before(self, generation: int):
+        """Delete files of generations no reference points at any more"""
+        for old in range(generation):
+            self.generation_path(old).unlink(missing_ok=True)
+
+    def size(self) -> int:
+        """Size of the current generation in bytes"""
+        path = self.generation_path(self.generation.read())
+        return path.stat().st_size if path.exists() else 0
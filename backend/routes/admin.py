@@ -0,0 +1,49 @@
+"""
+Admin API routes (on-demand profiling)
+"""
+from flask import Blueprint, request, jsonify, Response
+import logging
+
+from utils.admin_auth import require_admin
+from utils.profiler import ProfilerBusy, profile_for
+from config import PROFILER_INTERVAL_MS, PROFILER_TOP_N
+
+logger = logging.getLogger(__name__)
+
+admin_bp = Blueprint('admin', __name__)
+
+def init_admin_routes(app):
+    """
+    Initialize admin routes
+
+    Args:
+        app: Flask app instance
+    """
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+
+@admin_bp.route('/profile', methods=['POST'])
+@require_admin
+def profile():
+    """
+    Sample all threads of the worker that receives this request
+
+    Query params: seconds (default 10), interval_ms, top, idle=1 to keep waiting
+    threads, format=collapsed for plain collapsed stacks (flamegraph.pl input)
+    """
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval_ms = float(request.args.get('interval_ms', PROFILER_INTERVAL_MS))
+        top = int(request.args.get('top', PROFILER_TOP_N))
+    except ValueError:
+        return jsonify({'error': 'seconds, interval_ms and top must be numbers'}), 400
+    if interval_ms < 1:
+        return jsonify({'error': 'interval_ms must be at least 1'}), 400
+    
+    try:
+        profiler = profile_for(seconds, interval_ms, include_idle=request.args.get('idle') == '1')
+    except ProfilerBusy as e:
+        return jsonify({'error': str(e)}), 409
+    
+    if request.args.get('format') == 'collapsed':
+        return Response(profiler.collapsed() + "\n", mimetype='text/plain')
+    return jsonify(profiler.report(limit=top))
@@ -1,25 +1,34 @@
 """
 Chat API routes
 """
-from flask import Blueprint, request, jsonify
-from datetime import datetime
-import json
+from flask import Blueprint, request, jsonify, current_app, g
+import threading
+import time
 import logging
 
-from utils.rag_utils import SYSTEM_PROMPT_BASE, retrieve_context_from_knowledge_base, augment_system_prompt
-from utils.openai_functions import FUNCTIONS, FUNCTION_MAP
+from utils.openai_functions import FUNCTIONS
+from utils.admission import AdmissionRejected, get_llm_admission
+from utils.chat_pipeline import (
+    conversation_history, find_faq_answer, log_faq_answer, faq_response, retrieve_context,
+    prepare_messages, local_response, execute_function_call, log_exchange,
+    chat_response, with_skipped_stages, error_response
+)
+from utils.deadline import Deadline, DEADLINE_HEADER
+from utils.tracing import (
+    DEBUG_TIMINGS_HEADER, start_trace, current_trace, complete_trace, debug_requested, span, record_span
+)
+from utils.metrics import CHAT_IN_PROGRESS, observe_chat_request
+from utils.profiler import PROFILE_HEADER, SamplingProfiler
+from utils.admin_auth import admin_authorized
 from config import (
-    OPENAI_MODEL, RAG_TOP_K, RAG_RELEVANCE_THRESHOLD,
-    FAQ_TOP_K, FAQ_SIMILARITY_THRESHOLD, FAQ_CONFIDENCE_THRESHOLD
+    OPENAI_MODEL,
+    DEADLINE_RAG_MIN_S, DEADLINE_LLM_MIN_S, DEADLINE_FUNCTION_FOLLOWUP_MIN_S
 )
 
 logger = logging.getLogger(__name__)
 
 chat_bp = Blueprint('chat', __name__)
 
-# Store conversation history (in production, use a proper database)
-conversation_history = {}
-
 def init_chat_routes(app, chroma_db, conversation_logger, openai_client):
     """
     Initialize chat routes with dependencies
@@ -28,18 +37,64 @@ def init_chat_routes(app, chroma_db, conversation_logger, openai_client):
         app: Flask app instance
         chroma_db: ChromaDB manager instance
         conversation_logger: Conversation logger instance
-        openai_client: OpenAI client instance
+        openai_client: ResilientChatClient instance
     """
     chat_bp.chroma_db = chroma_db
     chat_bp.conversation_logger = conversation_logger
     chat_bp.openai_client = openai_client
+    chat_bp.llm_admission = get_llm_admission()
     
     app.register_blueprint(chat_bp, url_prefix='/api')
 
+@chat_bp.before_request
+def start_request_trace():
+    """Trace every chat request (stage timings go to the NDJSON trace log)"""
+    if request.method != 'OPTIONS':
+        g.chat_started = time.perf_counter()
+        CHAT_IN_PROGRESS.inc()
+        start_trace(f"{request.method} {request.path}", debug=debug_requested(request.headers.get(DEBUG_TIMINGS_HEADER)))
+        # Per-request profile (admin only): samples just this request's thread, waits included
+        if request.headers.get(PROFILE_HEADER) and admin_authorized(request.headers.get('Authorization')):
+            g.profiler = SamplingProfiler(thread_ids=[threading.get_ident()], include_idle=True).start()
+
+@chat_bp.after_request
+def finish_request_trace(response):
+    """
+    Record request metrics; add Server-Timing and, if requested, the trace
+    (X-Debug-Timings) and the request profile (X-Profile) to the JSON body
+    """
+    if 'chat_started' not in g:
+        return response
+    payload = response.get_json(silent=True)
+    observe_chat_request(payload, response.status_code, g.chat_started)
+    body_changed = False
+    trace = current_trace()
+    if trace is not None:
+        response.headers.extend(complete_trace(trace, payload, response.status_code))
+        body_changed = trace.debug
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        if isinstance(payload, dict):
+            payload["profile"] = profiler.report()
+            body_changed = True
+    if body_changed and isinstance(payload, dict):
+        response.set_data(current_app.json.dumps(payload))
+    return response
+
+@chat_bp.teardown_request
+def finish_request_metrics(error=None):
+    if g.pop('chat_started', None) is not None:
+        CHAT_IN_PROGRESS.dec()
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+
 @chat_bp.route('/chat', methods=['POST'])
 def chat():
     """Main chat endpoint"""
     try:
+        deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER))
         data = request.get_json()
         user_message = data.get('message', '')
         session_id = data.get('session_id', 'default')
@@ -50,202 +105,114 @@ def chat():
         chroma_db = chat_bp.chroma_db
         conversation_logger = chat_bp.conversation_logger
         client = chat_bp.openai_client
+        llm_admission = chat_bp.llm_admission
         
         # Initialize response variables
-        assistant_message = ""
         response_source = "openai"
         rag_used = False
         
+        # Retrieval results of steps 1-2, reused by the local answer instead of searching again
+        hits = {}
+        
         # Step 1: Check ChromaDB for similar FAQs first
         if chroma_db:
             try:
-                similar_faqs = chroma_db.search_similar_faqs(
-                    user_message, 
-                    top_k=FAQ_TOP_K, 
-                    similarity_threshold=FAQ_SIMILARITY_THRESHOLD
-                )
-                
-                if similar_faqs["found_matches"] and len(similar_faqs["faqs"]) > 0:
-                    best_faq = similar_faqs["faqs"][0]
-                    confidence = best_faq["similarity"]
-                    
-                    logger.info(f"Found FAQ match with confidence: {confidence:.3f}")
-                    
-                    if confidence >= FAQ_CONFIDENCE_THRESHOLD:
-                        assistant_message = best_faq["answer"]
-                        response_source = "faq"
-                        
-                        # Log the message exchange
-                        if conversation_logger:
-                            conversation_logger.log_message(session_id, {
-                                "role": "user",
-                                "content": user_message
-                            })
-                            conversation_logger.log_message(session_id, {
-                                "role": "assistant", 
-                                "content": assistant_message,
-                                "source": response_source,
-                                "faq_confidence": confidence
-                            })
-                        
-                        # Log to ChromaDB
-                        chroma_db.log_user_query(user_message, assistant_message, session_id, "faq")
-                        
-                        return jsonify({
-                            'response': assistant_message,
-                            'source': response_source,
-                            'confidence': confidence,
-                            'session_id': session_id,
-                            'timestamp': datetime.now().isoformat()
-                        })
+                with span("faq_search"):
+                    best_faq = find_faq_answer(chroma_db, user_message, hits)
+                if best_faq:
+                    with span("faq_log"):
+                        log_faq_answer(chroma_db, conversation_logger, session_id, user_message, best_faq)
+                    return jsonify(with_skipped_stages(faq_response(session_id, best_faq), deadline))
             
             except Exception as faq_error:
                 logger.warning(f"FAQ search failed: {faq_error}")
         
-        # Step 2: RAG - Retrieve context from knowledge base
+        # Step 2: RAG - Retrieve context from knowledge base (skipped when the budget is low)
         retrieved_context = ""
-        if chroma_db:
-            try:
-                retrieved_context = retrieve_context_from_knowledge_base(
-                    chroma_db,
-                    user_message, 
-                    top_k=RAG_TOP_K, 
-                    relevance_threshold=RAG_RELEVANCE_THRESHOLD
-                )
-                if retrieved_context:
-                    rag_used = True
-                    response_source = "rag"
-                    logger.info("Retrieved context from knowledge base for RAG")
-            except Exception as rag_error:
-                logger.warning(f"RAG retrieval failed: {rag_error}")
-        
-        # Step 3: Proceed with OpenAI workflow
-        # Get or create conversation history with augmented prompt
-        if session_id not in conversation_history:
-            augmented_prompt = augment_system_prompt(SYSTEM_PROMPT_BASE, retrieved_context)
-            conversation_history[session_id] = [
-                {"role": "system", "content": augmented_prompt}
-            ]
-        else:
-            # Update system prompt with new context if available
+        if chroma_db and deadline.allows("rag", DEADLINE_RAG_MIN_S):
+            with span("rag"):
+                retrieved_context = retrieve_context(chroma_db, user_message, hits)
             if retrieved_context:
-                augmented_prompt = augment_system_prompt(SYSTEM_PROMPT_BASE, retrieved_context)
-                conversation_history[session_id][0] = {"role": "system", "content": augmented_prompt}
-        
-        # Add user message to history
-        conversation_history[session_id].append({
-            "role": "user", 
-            "content": user_message
-        })
+                rag_used = True
+                response_source = "rag"
         
-        # Call OpenAI API
-        try:
-            response = client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=conversation_history[session_id],
-                functions=FUNCTIONS,
-                function_call="auto"
-            )
-        except Exception as api_error:
-            logger.error(f"OpenAI API error: {str(api_error)}")
-            fallback_message = f'Xin chào! Tôi là trợ lý ảo của trường đại học. Bạn đã gửi: "{user_message}". Hiện tại tôi đang trong chế độ demo. Vui lòng cấu hình API key để sử dụng đầy đủ tính năng.'
-            
-            if conversation_logger:
-                conversation_logger.log_message(session_id, {
-                    "role": "user",
-                    "content": user_message
-                })
-                conversation_logger.log_message(session_id, {
-                    "role": "assistant",
-                    "content": fallback_message,
-                    "source": "demo"
-                })
-            
-            return jsonify({
-                'response': fallback_message,
-                'source': 'demo',
-                'session_id': session_id,
-                'timestamp': datetime.now().isoformat()
-            })
+        def answer_locally(reason: str, status: int = 200):
+            with span("local_answer"):
+                payload = local_response(conversation_logger, session_id, user_message,
+                                         retrieved_context, hits, reason)
+            return jsonify(with_skipped_stages(payload, deadline)), status
         
-        response_message = response.choices[0].message
+        # Open circuit breaker: answer locally without queueing for an LLM slot
+        if client.breaker.is_open():
+            logger.warning(f"LLM circuit open, answering locally - Session: {session_id}")
+            return answer_locally("circuit_open")
         
-        # Handle function calls
-        if hasattr(response_message, 'function_call') and response_message.function_call:
-            function_name = response_message.function_call.name
-            function_args = json.loads(response_message.function_call.arguments)
-            
-            logger.info(f"Executing function: {function_name} with args: {function_args}")
-            
-            # Call the appropriate function
-            if function_name in FUNCTION_MAP:
-                result = FUNCTION_MAP[function_name](**function_args)
-            else:
-                result = "Xin lỗi, tôi không thể xử lý yêu cầu này."
-            
-            response_source = "function"
-            
-            # Add function result to conversation
-            conversation_history[session_id].append({
-                "role": "function",
-                "name": function_name,
-                "content": str(result)
-            })
-            
-            # Get final response from OpenAI
-            final_response = client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=conversation_history[session_id]
-            )
+        # Step 3: Proceed with OpenAI workflow once admission control grants an LLM slot
+        try:
+            if not deadline.allows("llm", DEADLINE_LLM_MIN_S):
+                return answer_locally("deadline")
             
-            assistant_message = final_response.choices[0].message.content
-        else:
-            assistant_message = response_message.content
-            if not rag_used:
-                response_source = "openai"
-        
-        # Add assistant response to history
-        conversation_history[session_id].append({
-            "role": "assistant",
-            "content": assistant_message
-        })
-        
-        # Log conversation
-        if conversation_logger:
-            try:
-                conversation_logger.log_message(session_id, {
-                    "role": "user",
-                    "content": user_message
-                })
-                log_data = {
-                    "role": "assistant",
-                    "content": assistant_message,
-                    "source": response_source
-                }
-                if rag_used:
-                    log_data["rag_used"] = True
-                conversation_logger.log_message(session_id, log_data)
-            except Exception as log_error:
-                logger.warning(f"Conversation logging failed: {log_error}")
+            queue_timeout = deadline.wait_budget(DEADLINE_LLM_MIN_S, llm_admission.queue_timeout)
+            admission_requested = time.perf_counter()
+            with llm_admission.slot(session_id, timeout=queue_timeout):
+                record_span("admission_wait", admission_requested)
+                if not deadline.allows("llm", DEADLINE_LLM_MIN_S):
+                    return answer_locally("deadline")
+                
+                messages = prepare_messages(session_id, user_message, retrieved_context)
+                
+                # Call OpenAI API (timeouts and max_tokens capped to the remaining budget)
+                try:
+                    with span("llm_completion"):
+                        response = client.create(
+                            deadline=deadline.expires_at,
+                            model=OPENAI_MODEL,
+                            messages=messages,
+                            functions=FUNCTIONS,
+                            function_call="auto",
+                            max_tokens=deadline.max_tokens()
+                        )
+                except Exception as api_error:
+                    logger.error(f"OpenAI API error: {str(api_error)}")
+                    return answer_locally("llm_error")
+                
+                response_message = response.choices[0].message
+                
+                # Handle function calls
+                if hasattr(response_message, 'function_call') and response_message.function_call:
+                    with span("function_call"):
+                        function_result = execute_function_call(session_id, response_message.function_call)
+                    response_source = "function"
+                    
+                    # Get final response from OpenAI, or return the function result directly if out of budget
+                    assistant_message = function_result
+                    if deadline.allows("function_followup", DEADLINE_FUNCTION_FOLLOWUP_MIN_S):
+                        try:
+                            with span("llm_followup"):
+                                final_response = client.create(
+                                    deadline=deadline.expires_at,
+                                    model=OPENAI_MODEL,
+                                    messages=conversation_history[session_id],
+                                    max_tokens=deadline.max_tokens()
+                                )
+                            assistant_message = final_response.choices[0].message.content
+                        except Exception as api_error:
+                            logger.error(f"OpenAI API error after function call: {str(api_error)}")
+                            deadline.skip("function_followup")
+                else:
+                    assistant_message = response_message.content
+                    if not rag_used:
+                        response_source = "openai"
+        except AdmissionRejected as rejected:
+            logger.warning(f"LLM request shed ({rejected.reason}) - Session: {session_id}")
+            return answer_locally(rejected.reason, 429 if rejected.reason == "rate_limited" else 200)
         
-        # Log to ChromaDB for future FAQ matching
-        if chroma_db:
-            try:
-                chroma_db.log_user_query(user_message, assistant_message, session_id, response_source)
-            except Exception as chroma_error:
-                logger.warning(f"ChromaDB logging failed: {chroma_error}")
+        with span("log_exchange"):
+            log_exchange(chroma_db, conversation_logger, session_id, user_message,
+                         assistant_message, response_source, rag_used)
         
-        return jsonify({
-            'response': assistant_message,
-            'source': response_source,
-            'session_id': session_id,
-            'timestamp': datetime.now().isoformat()
-        })
+        return jsonify(with_skipped_stages(chat_response(session_id, assistant_message, response_source), deadline))
         
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
-        return jsonify({
-            'error': 'Có lỗi xảy ra khi xử lý yêu cầu của bạn. Vui lòng thử lại.',
-            'session_id': data.get('session_id', 'default') if 'data' in locals() else 'default'
-        }), 500
-
+        return jsonify(error_response(data if 'data' in locals() else None)), 500
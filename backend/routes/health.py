@@ -5,11 +5,16 @@ from flask import Blueprint, jsonify
 from datetime import datetime
 import logging
 
+from embeddings import embedding_model_id
+from utils.admission import get_llm_admission
+from utils.llm_client import get_circuit_breaker
+from utils.status_snapshot import StatusSnapshot
+
 logger = logging.getLogger(__name__)
 
 health_bp = Blueprint('health', __name__)
 
-def init_health_routes(app, chroma_db, conversation_logger, api_key):
+def init_health_routes(app, chroma_db, conversation_logger, api_key, startup_state=None, llm_client=None):
     """
     Initialize health check routes with dependencies
     
@@ -18,37 +23,93 @@ def init_health_routes(app, chroma_db, conversation_logger, api_key):
         chroma_db: ChromaDB manager instance
         conversation_logger: Conversation logger instance
         api_key: OpenAI API key
+        startup_state: StartupState tracking readiness and phase timings
+        llm_client: ResilientChatClient (retry, hedging and circuit breaker stats)
     """
     health_bp.chroma_db = chroma_db
     health_bp.conversation_logger = conversation_logger
     health_bp.api_key = api_key
+    health_bp.startup_state = startup_state
+    health_bp.llm_client = llm_client
+    health_bp.status_snapshot = StatusSnapshot(_collect_status)
     
     app.register_blueprint(health_bp, url_prefix='/api')
 
-@health_bp.route('/health', methods=['GET'])
-def health_check():
-    """Enhanced health check with service status"""
+def _collect_status():
+    """Full service status; runs on the snapshot thread, never on a probe request"""
     chroma_db = health_bp.chroma_db
     conversation_logger = health_bp.conversation_logger
-    api_key = health_bp.api_key
     
-    health_data = {
+    status = {
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
         'service': 'Student Support Chatbot (Enhanced)',
         'services': {
             'chromadb': chroma_db is not None,
             'conversation_logger': conversation_logger is not None,
-            'openai_api': api_key != "sk-demo-key-for-testing"
+            'openai_api': health_bp.api_key != "sk-demo-key-for-testing"
         }
     }
     
     # Add detailed service info if available
     if chroma_db:
         try:
-            health_data['chromadb_analytics'] = chroma_db.get_analytics()
+            status['chromadb_analytics'] = chroma_db.get_analytics()
         except:
-            health_data['chromadb_analytics'] = {"error": "Could not fetch analytics"}
+            status['chromadb_analytics'] = {"error": "Could not fetch analytics"}
+        status['embedding_model'] = {
+            'loaded': chroma_db.embedding_model_loaded,
+            'id': embedding_model_id()
+        }
+        status['retrieval_cache'] = chroma_db.retrieval_cache.stats()
+        if chroma_db.embedding_batcher:
+            status['embedding_batcher'] = chroma_db.embedding_batcher.stats()
     
-    return jsonify(health_data)
+    if conversation_logger:
+        status['conversation_logger'] = {'pending_writes': conversation_logger.pending_writes}
+    
+    status['llm_admission'] = get_llm_admission().stats()
+    status['circuit_breaker'] = get_circuit_breaker().stats()
+    if health_bp.llm_client:
+        status['llm_client'] = health_bp.llm_client.stats()
+    
+    return status
+
+def _details():
+    details = {**health_bp.status_snapshot.get(), 'timestamp': datetime.now().isoformat()}
+    if health_bp.startup_state:
+        details['startup'] = health_bp.startup_state.to_dict()
+    return details
 
+@health_bp.route('/health', methods=['GET'])
+def health_check():
+    """Enhanced health check with service status (same body as /health/details)"""
+    return jsonify(_details())
+
+@health_bp.route('/health/details', methods=['GET'])
+def health_details():
+    """Service status from the background snapshot (age in "age_s")"""
+    return jsonify(_details())
+
+@health_bp.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'alive'})
+
+@health_bp.route('/health/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: 200 once vector store, embedding model and indexes are warmed up"""
+    startup_state = health_bp.startup_state
+    ready = startup_state.ready if startup_state is not None else health_bp.chroma_db is not None
+    
+    snapshot = health_bp.status_snapshot.get()
+    body = {
+        'ready': ready,
+        'embedding_model_loaded': snapshot.get('embedding_model', {}).get('loaded', False),
+        'collections': snapshot.get('chromadb_analytics', {}).get('collections'),
+        'circuit_breaker': snapshot.get('circuit_breaker', {}).get('state'),
+        'last_upstream_success_at': snapshot.get('circuit_breaker', {}).get('last_success_at'),
+        'snapshot_age_s': snapshot['age_s']
+    }
+    if startup_state is not None:
+        body.update(startup_state.to_dict())
+    return jsonify(body), 200 if ready else 503
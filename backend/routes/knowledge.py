@@ -7,7 +7,8 @@ from urllib.parse import unquote
 import logging
 
 from utils.file_processor import allowed_file, extract_text_from_file
-from config import ALLOWED_EXTENSIONS
+from utils.chunking import CHUNKERS
+from config import ALLOWED_EXTENSIONS, DEFAULT_CHUNKER, UPSERT_CHUNKER
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,20 @@ def init_knowledge_routes(app, chroma_db):
     knowledge_bp.chroma_db = chroma_db
     app.register_blueprint(knowledge_bp, url_prefix='/api/knowledge')
 
+def _parse_flag(value) -> bool:
+    """Boolean form field or JSON value: true/1/yes (any case) or a JSON true"""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+def _upsert_counts(upsert_result):
+    """Chunk diff counts reported by upload endpoints in upsert mode"""
+    return {
+        'chunks_added': upsert_result['added'],
+        'chunks_kept': upsert_result['kept'],
+        'chunks_removed': upsert_result['removed']
+    }
+
 @knowledge_bp.route('/upload-file', methods=['POST'])
 def upload_file():
     """Upload file and add to knowledge base"""
@@ -45,6 +60,10 @@ def upload_file():
         # Get optional parameters
         category = request.form.get('category', 'general')
         title = request.form.get('title', secure_filename(file.filename))
+        upsert = _parse_flag(request.form.get('upsert', 'false'))
+        chunker = request.form.get('chunker') or (UPSERT_CHUNKER if upsert else DEFAULT_CHUNKER)
+        if chunker not in CHUNKERS:
+            return jsonify({'error': f"Unknown chunker. Supported: {', '.join(CHUNKERS)}"}), 400
         
         # Read file content
         file_content = file.read()
@@ -61,22 +80,38 @@ def upload_file():
         if not text_content or len(text_content.strip()) == 0:
             return jsonify({'error': 'File is empty or could not extract text'}), 400
         
-        # Add to knowledge base
-        chunk_ids = chroma_db.add_document_from_text(
-            title=title,
-            content=text_content,
-            category=category
-        )
-        
-        return jsonify({
+        # Add to knowledge base (upsert only re-embeds chunks that changed)
+        if upsert:
+            upsert_result = chroma_db.upsert_document(
+                title=title,
+                content=text_content,
+                category=category,
+                chunker=chunker
+            )
+            chunk_ids = upsert_result['chunk_ids']
+        else:
+            upsert_result = None
+            chunk_ids = chroma_db.add_document_from_text(
+                title=title,
+                content=text_content,
+                category=category,
+                chunker=chunker
+            )
+        
+        response_data = {
             'success': True,
             'message': 'File uploaded and processed successfully',
             'title': title,
             'category': category,
+            'chunker': chunker,
             'chunks_count': len(chunk_ids),
             'chunk_ids': chunk_ids,
             'text_length': len(text_content)
-        }), 200
+        }
+        if upsert_result:
+            response_data.update(_upsert_counts(upsert_result))
+        
+        return jsonify(response_data), 200
         
     except Exception as e:
         logger.error(f"Error uploading file: {e}")
@@ -94,6 +129,10 @@ def upload_text():
         title = data.get('title', '')
         content = data.get('content', '')
         category = data.get('category', 'general')
+        upsert = _parse_flag(data.get('upsert', False))
+        chunker = data.get('chunker') or (UPSERT_CHUNKER if upsert else DEFAULT_CHUNKER)
+        if chunker not in CHUNKERS:
+            return jsonify({'error': f"Unknown chunker. Supported: {', '.join(CHUNKERS)}"}), 400
         
         if not title or not content:
             return jsonify({'error': 'Title and content are required'}), 400
@@ -102,20 +141,36 @@ def upload_text():
         if not chroma_db:
             return jsonify({'error': 'ChromaDB not initialized'}), 500
         
-        chunk_ids = chroma_db.add_document_from_text(
-            title=title,
-            content=content,
-            category=category
-        )
-        
-        return jsonify({
+        if upsert:
+            upsert_result = chroma_db.upsert_document(
+                title=title,
+                content=content,
+                category=category,
+                chunker=chunker
+            )
+            chunk_ids = upsert_result['chunk_ids']
+        else:
+            upsert_result = None
+            chunk_ids = chroma_db.add_document_from_text(
+                title=title,
+                content=content,
+                category=category,
+                chunker=chunker
+            )
+        
+        response_data = {
             'success': True,
             'message': 'Text added to knowledge base successfully',
             'title': title,
             'category': category,
+            'chunker': chunker,
             'chunks_count': len(chunk_ids),
             'chunk_ids': chunk_ids
-        }), 200
+        }
+        if upsert_result:
+            response_data.update(_upsert_counts(upsert_result))
+        
+        return jsonify(response_data), 200
         
     except Exception as e:
         logger.error(f"Error uploading text: {e}")
@@ -0,0 +1,44 @@
+"""
+Metrics API routes (Prometheus text exposition)
+"""
+from flask import Blueprint, Response
+import logging
+
+from utils.admission import get_llm_admission
+from utils.llm_client import get_circuit_breaker
+from utils.metrics import get_metrics_registry
+from config import METRICS_ENABLED
+
+logger = logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+BREAKER_STATES = ("closed", "open", "half_open")
+
+def _llm_gauges():
+    """Admission queue and circuit breaker state, read at scrape time"""
+    admission = get_llm_admission().stats()
+    yield ("llm_admission_in_flight", "LLM calls holding an admission slot", {}, admission["in_flight"])
+    yield ("llm_admission_queue_length", "Requests waiting for an LLM slot", {}, admission["queue_length"])
+    yield ("llm_admission_max_concurrent", "LLM admission slots per process", {}, admission["max_concurrent"])
+    state = get_circuit_breaker().stats()["state"]
+    for name in BREAKER_STATES:
+        yield ("llm_circuit_breaker_state", "1 for the current LLM circuit breaker state",
+               {"state": name}, 1 if state == name else 0)
+
+def init_metrics_routes(app):
+    """
+    Initialize metrics routes (not registered when METRICS_ENABLED is off)
+
+    Args:
+        app: Flask app instance
+    """
+    if not METRICS_ENABLED:
+        return
+    get_metrics_registry().register_collector(_llm_gauges)
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint (merged over all workers when METRICS_MULTIPROC_DIR is set)"""
+    return Response(get_metrics_registry().render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,96 @@
+"""
+Startup state tracking for University Assistant
+Per-phase timings and readiness for eager or background (lazy) initialization
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional
+import logging
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class StartupState:
+    """
+    Records how long each startup phase took and whether the heavy services
+    (vector store, embedding model, indexes) are ready to serve traffic.
+    """
+
+    def __init__(self, mode: str = "eager"):
+        """
+        Initialize startup state
+
+        Args:
+            mode (str): "eager" (initialize before serving) or "lazy" (warm up in background)
+        """
+        self.mode = mode
+        self.status = "starting"
+        self.error: Optional[str] = None
+        self.started_at = datetime.now().isoformat()
+        self.ready_at: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a startup phase (milliseconds)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+            with self._lock:
+                self.phases[name] = elapsed_ms
+            logger.info(f"Startup phase '{name}' took {elapsed_ms} ms")
+
+    def mark_ready(self):
+        with self._lock:
+            self.status = "ready"
+            self.ready_at = datetime.now().isoformat()
+            self.phases["total_to_ready"] = round((time.perf_counter() - self._start) * 1000, 1)
+        logger.info(f"Services ready after {self.phases['total_to_ready']} ms ({self.mode} startup)")
+
+    def mark_failed(self, error: Exception):
+        with self._lock:
+            self.status = "failed"
+            self.error = str(error)
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def run_in_background(self, warm_up: Callable[[], None]) -> threading.Thread:
+        """
+        Run the warm-up function on a daemon thread and mark readiness when it returns
+
+        Args:
+            warm_up: Callable performing the heavy initialization
+
+        Returns:
+            threading.Thread: The warm-up thread
+        """
+        def run():
+            try:
+                warm_up()
+                self.mark_ready()
+            except Exception as e:
+                logger.error(f"❌ Background warm-up failed: {e}")
+                self.mark_failed(e)
+
+        thread = threading.Thread(target=run, name="startup-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "status": self.status,
+                "error": self.error,
+                "started_at": self.started_at,
+                "ready_at": self.ready_at,
+                "phases_ms": dict(self.phases)
+            }
@@ -0,0 +1,27 @@
+"""
+Shared fixtures
+"""
+import pytest
+
+import chroma_manager
+from benchmarks.bench_hot_paths import HashingEmbedder
+from utils import tracing
+
+@pytest.fixture
+def trace_log(tmp_path, monkeypatch):
+    """Send this process's NDJSON trace records to a temporary file"""
+    path = tmp_path / "traces" / "chat_traces.ndjson"
+    monkeypatch.setattr(tracing, "TRACE_LOG_PATH", str(path))
+    monkeypatch.setattr(tracing, "_trace_handler_pid", None)
+    yield path
+    for handler in list(tracing._trace_logger.handlers):
+        tracing._trace_logger.removeHandler(handler)
+        handler.close()
+
+@pytest.fixture(params=["flat", "chroma"])
+def manager(request, tmp_path, monkeypatch):
+    """ChromaDBManager on each vector store backend, embedding with the model-free hashing embedder"""
+    if request.param == "chroma":
+        pytest.importorskip("chromadb")
+    monkeypatch.setattr(chroma_manager, "create_embedding_function", HashingEmbedder)
+    return chroma_manager.ChromaDBManager(persist_directory=tmp_path / "db", backend=request.param)
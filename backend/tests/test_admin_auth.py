@@ -0,0 +1,61 @@
+"""
+Tests for the admin token guard
+Admin endpoints are hidden (404) without ADMIN_TOKEN and refuse (401) a
+missing, wrong or non-bearer token; a valid token reaches the profiler
+"""
+from flask import Flask
+import pytest
+
+from routes.admin import init_admin_routes
+from utils import admin_auth
+from utils.admin_auth import admin_authorized
+
+TOKEN = "s3cret-admin-token"
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    init_admin_routes(app)
+    return app.test_client()
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(admin_auth, "ADMIN_TOKEN", TOKEN)
+    return TOKEN
+
+@pytest.mark.parametrize("authorization", [None, f"Bearer {TOKEN}"], ids=["no-header", "any-token"])
+def test_admin_endpoints_are_not_found_without_admin_token(client, monkeypatch, authorization):
+    monkeypatch.setattr(admin_auth, "ADMIN_TOKEN", "")
+    headers = {"Authorization": authorization} if authorization else {}
+
+    response = client.post("/api/admin/profile?seconds=0.01", headers=headers)
+
+    assert response.status_code == 404
+    assert not admin_authorized(authorization)
+
+@pytest.mark.parametrize("authorization", [
+    None,
+    "Bearer wrong-token",
+    f"Bearer {TOKEN}x",
+    f"Basic {TOKEN}",
+    TOKEN,
+], ids=["missing", "wrong", "prefix-match", "basic-scheme", "no-scheme"])
+def test_wrong_token_is_unauthorized(client, admin_token, authorization):
+    headers = {"Authorization": authorization} if authorization else {}
+
+    response = client.post("/api/admin/profile?seconds=0.01", headers=headers)
+
+    assert response.status_code == 401
+    assert response.json == {"error": "Unauthorized"}
+
+def test_valid_token_reaches_the_profiler(client, admin_token):
+    headers = {"Authorization": f"bearer  {TOKEN} "}
+
+    report = client.post("/api/admin/profile?seconds=0.05&interval_ms=5", headers=headers)
+    collapsed = client.post("/api/admin/profile?seconds=0.02&format=collapsed", headers=headers)
+    invalid = client.post("/api/admin/profile?seconds=soon", headers=headers)
+
+    assert report.status_code == 200
+    assert report.json["samples"] > 0
+    assert collapsed.status_code == 200 and collapsed.mimetype == "text/plain"
+    assert invalid.status_code == 400
@@ -0,0 +1,163 @@
+"""
+Tests for LLM admission control
+Concurrency slots, bounded FIFO queue with overflow and timeout, and the
+per-session token bucket
+"""
+import asyncio
+import threading
+import time
+from contextlib import ExitStack
+
+import pytest
+
+from utils import admission
+from utils.admission import AdmissionRejected, LLMAdmission, SessionRateLimiter
+
+def _admission(max_concurrent=1, max_queue=1, queue_timeout=5.0):
+    return LLMAdmission(max_concurrent=max_concurrent, max_queue=max_queue, queue_timeout=queue_timeout,
+                        rate_per_min=0, burst=1)
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+def test_slots_up_to_max_concurrent_are_admitted_immediately():
+    controller = _admission(max_concurrent=2)
+    with controller.slot("a"), controller.slot("b"):
+        assert controller.stats()["in_flight"] == 2
+    assert controller.stats()["in_flight"] == 0
+    assert controller.stats()["admitted"] == 2
+
+def test_queue_overflow_is_rejected_and_waiter_gets_the_released_slot():
+    controller = _admission(max_concurrent=1, max_queue=1)
+    events = []
+
+    def queued():
+        with controller.slot("b"):
+            events.append("b admitted")
+
+    with ExitStack() as held:
+        held.enter_context(controller.slot("a"))
+        waiter = threading.Thread(target=queued)
+        waiter.start()
+        _wait_for(lambda: controller.stats()["queue_length"] == 1)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            with controller.slot("c"):
+                pass
+        assert rejected.value.reason == "queue_full"
+        assert events == []
+
+    waiter.join(5)
+    stats = controller.stats()
+    assert events == ["b admitted"]
+    assert stats["in_flight"] == 0 and stats["queue_length"] == 0
+    assert (stats["admitted"], stats["queued"], stats["rejected_queue_full"]) == (2, 1, 1)
+
+def test_queued_request_times_out():
+    controller = _admission(max_concurrent=1, max_queue=2)
+    with controller.slot("a"):
+        started = time.monotonic()
+        with pytest.raises(AdmissionRejected) as rejected:
+            with controller.slot("b", timeout=0.05):
+                pass
+        assert rejected.value.reason == "queue_timeout"
+        assert time.monotonic() - started < 1.0
+        assert controller.stats()["queue_length"] == 0
+    stats = controller.stats()
+    assert stats["in_flight"] == 0
+    assert stats["rejected_queue_timeout"] == 1
+
+def test_waiters_are_admitted_in_fifo_order():
+    controller = _admission(max_concurrent=1, max_queue=3)
+    order = []
+
+    def queued(name):
+        with controller.slot(name):
+            order.append(name)
+
+    with controller.slot("first"):
+        threads = []
+        for name in ("w1", "w2", "w3"):
+            threads.append(threading.Thread(target=queued, args=(name,)))
+            threads[-1].start()
+            _wait_for(lambda: controller.stats()["queue_length"] == len(threads))
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["w1", "w2", "w3"]
+    assert controller.stats()["in_flight"] == 0
+
+def test_async_slot_timeout_and_cancellation_leave_no_waiters():
+    controller = _admission(max_concurrent=1, max_queue=2)
+
+    async def scenario():
+        async with controller.async_slot("a"):
+            with pytest.raises(AdmissionRejected):
+                async with controller.async_slot("b", timeout=0.05):
+                    pass
+
+            async def wait_in_queue():
+                async with controller.async_slot("c"):
+                    pass
+            task = asyncio.ensure_future(wait_in_queue())
+            await asyncio.sleep(0.05)
+            assert controller.stats()["queue_length"] == 1
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert controller.stats()["queue_length"] == 0
+
+    asyncio.run(scenario())
+    stats = controller.stats()
+    assert stats["in_flight"] == 0
+    assert stats["rejected_queue_timeout"] == 1
+
+def test_session_rate_limit_allows_a_burst_then_refills(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    limiter = SessionRateLimiter(rate_per_min=60, burst=2)
+
+    assert [limiter.allow("s1") for _ in range(3)] == [True, True, False]
+    assert limiter.allow("s2") is True
+    now[0] += 0.5
+    assert limiter.allow("s1") is False
+    now[0] += 0.5
+    assert limiter.allow("s1") is True
+    now[0] += 60
+    assert [limiter.allow("s1") for _ in range(3)] == [True, True, False]
+
+def test_zero_rate_disables_the_session_limit():
+    limiter = SessionRateLimiter(rate_per_min=0, burst=1)
+    assert all(limiter.allow("s1") for _ in range(100))
+
+def test_rate_limited_session_is_rejected_before_queueing():
+    controller = LLMAdmission(max_concurrent=1, max_queue=1, queue_timeout=5.0, rate_per_min=1, burst=1)
+    with controller.slot("s1"):
+        pass
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        with controller.slot("s1"):
+            pass
+
+    assert rejected.value.reason == "rate_limited"
+    stats = controller.stats()
+    assert stats["rejected_rate_limited"] == 1
+    assert stats["queued"] == 0
+    with controller.slot("s2"):
+        assert controller.stats()["in_flight"] == 1
+
+def test_idle_sessions_are_pruned(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    limiter = SessionRateLimiter(rate_per_min=60, burst=1, max_sessions=3)
+    for session in ("a", "b", "c"):
+        limiter.allow(session)
+    now[0] += 5
+
+    limiter.allow("d")
+    limiter.allow("e")
+
+    assert set(limiter._buckets) == {"d", "e"}
@@ -0,0 +1,98 @@
+"""
+Tests for the chat pipeline's local answers
+The fallback answers from what steps 1-2 retrieved for the request and never
+searches again, in particular when the deadline skipped RAG
+"""
+from flask import Flask
+import pytest
+
+from routes.chat import init_chat_routes
+from utils.chat_pipeline import find_faq_answer, local_response, retrieve_context
+from utils.deadline import DEADLINE_HEADER
+
+FAQ = {
+    "question": "Hạn đóng học phí học kỳ này là khi nào?",
+    "answer": "Hạn đóng học phí học kỳ này là ngày 15 tháng 9 qua cổng thông tin đào tạo.",
+    "category": "tuition",
+    "similarity": 0.72
+}
+CHUNK = {
+    "id": "doc-1",
+    "title": "Quy định học phí (Part 1)",
+    "content": "Sinh viên đóng học phí trước ngày 15 tháng 9. Sinh viên nộp muộn bị tính phí phạt theo quy định.",
+    "category": "tuition",
+    "original_title": "Quy định học phí",
+    "chunk_index": 0,
+    "total_chunks": 1,
+    "relevance": 0.9
+}
+
+class FakeChroma:
+    """Counts searches; FAQ candidates stay below the direct-answer confidence"""
+
+    def __init__(self):
+        self.faq_searches = 0
+        self.knowledge_searches = 0
+        self.logged = []
+
+    def search_similar_faqs(self, query, top_k=3, similarity_threshold=0.7):
+        self.faq_searches += 1
+        return {"found_matches": True, "faqs": [FAQ]}
+
+    def search_knowledge(self, query, top_k=5):
+        self.knowledge_searches += 1
+        return [CHUNK]
+
+    def log_user_query(self, *args):
+        self.logged.append(args)
+
+class FakeClient:
+    def __init__(self):
+        self.breaker = type("Breaker", (), {"is_open": lambda self: False})()
+
+    def create(self, **kwargs):
+        raise AssertionError("the LLM must not be called")
+
+QUESTION = "Khi nào hết hạn đóng học phí?"
+
+def test_retrieval_steps_record_their_hits():
+    chroma, hits = FakeChroma(), {}
+
+    assert find_faq_answer(chroma, QUESTION, hits) is None
+    context = retrieve_context(chroma, QUESTION, hits)
+
+    assert hits == {"faqs": [FAQ], "knowledge": [CHUNK]}
+    assert "📚 Quy định học phí" in context
+
+def test_local_answer_uses_the_retrieved_hits():
+    payload = local_response(None, "s1", QUESTION, "", {"faqs": [FAQ], "knowledge": [CHUNK]}, "llm_error")
+
+    assert payload["source"] == "extractive"
+    assert "15 tháng 9" in payload["response"]
+    assert "Quy định học phí (Part 1)" in payload["sources"]
+
+def test_local_answer_after_skipped_rag_uses_faq_candidates_only():
+    payload = local_response(None, "s1", QUESTION, "", {"faqs": [FAQ]}, "deadline")
+
+    assert payload["source"] == "extractive"
+    assert "Quy định học phí" not in payload["response"]
+
+@pytest.mark.parametrize("reason, source", [("deadline", "demo"), ("queue_full", "degraded"), ("rate_limited", "degraded")])
+def test_local_answer_without_hits(reason, source):
+    assert local_response(None, "s1", QUESTION, "", {}, reason)["source"] == source
+
+@pytest.mark.parametrize("header", ["0", "-5", "1"])
+def test_exhausted_deadline_answers_without_searching_knowledge(trace_log, header):
+    chroma = FakeChroma()
+    app = Flask(__name__)
+    init_chat_routes(app, chroma, None, FakeClient())
+
+    response = app.test_client().post("/api/chat", json={"message": QUESTION, "session_id": "s1"},
+                                      headers={DEADLINE_HEADER: header})
+
+    payload = response.get_json()
+    assert response.status_code == 200
+    assert payload["source"] == "extractive"
+    assert payload["skipped_stages"] == ["rag", "llm"]
+    assert chroma.faq_searches == 1
+    assert chroma.knowledge_searches == 0
@@ -0,0 +1,91 @@
+"""
+Tests for the document chunkers
+Semantic chunk size bounds, heading and sentence boundaries, and the fixed
+splitter's windows
+"""
+import pytest
+
+from benchmarks import corpus
+from utils.chunking import estimate_tokens, is_heading, iter_chunks, iter_fixed_chunks, iter_semantic_chunks
+
+def _words(text):
+    return text.split()
+
+@pytest.mark.parametrize("seed", range(3))
+def test_semantic_chunks_stay_within_max_tokens(seed):
+    text = corpus.generate_text(50_000, seed=seed)
+
+    chunks = list(iter_semantic_chunks(text, target_tokens=120, max_tokens=160, min_tokens=30))
+
+    assert len(chunks) > 10
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= 160
+    # No overlap and nothing dropped: the chunks are the document, re-spaced
+    assert [word for chunk in chunks for word in _words(chunk)] == _words(text)
+
+def test_semantic_chunks_reach_target_before_cutting():
+    text = "\n\n".join(corpus.paragraph(corpus.random.Random(i), 1, 2) for i in range(60))
+
+    chunks = list(iter_semantic_chunks(text, target_tokens=80, max_tokens=120, min_tokens=20))
+
+    assert all(estimate_tokens(chunk) >= 40 for chunk in chunks[:-1])
+
+def test_oversized_paragraph_is_split_at_sentences_then_words():
+    sentences = [f"Sinh viên số {i} cần đăng ký học phần trước hạn chót." for i in range(30)]
+    run_on = " ".join(["từ"] * 100)
+    text = " ".join(sentences) + " " + run_on
+
+    chunks = list(iter_semantic_chunks(text, target_tokens=30, max_tokens=40, min_tokens=10))
+
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= 40
+    # Sentences are kept whole; only the run-on sentence is cut between words
+    for chunk in chunks[:-3]:
+        assert chunk.endswith(".")
+    assert _words(" ".join(chunks)) == _words(text)
+
+def test_line_wrapped_text_without_blank_lines_is_bounded():
+    lines = [corpus.sentence(corpus.random.Random(i)) for i in range(200)]
+
+    chunks = list(iter_semantic_chunks(iter(line + "\n" for line in lines), target_tokens=60, max_tokens=80))
+
+    assert len(chunks) > 5
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= 80
+
+def test_heading_starts_a_new_chunk_and_stays_with_its_text():
+    section = " ".join(corpus.sentence(corpus.random.Random(i)) for i in range(4))
+    text = f"# Học phí\n{section}\n\nII. Lịch thi\n{section}\n\nKÝ TÚC XÁ\n{section}"
+
+    chunks = list(iter_semantic_chunks(text, target_tokens=500, max_tokens=600, min_tokens=10))
+
+    assert [chunk.splitlines()[0] for chunk in chunks] == ["# Học phí", "II. Lịch thi", "KÝ TÚC XÁ"]
+
+def test_heading_does_not_split_a_tiny_chunk():
+    text = "# Giới thiệu\nNgắn.\n\n## Chi tiết\nCũng ngắn."
+
+    chunks = list(iter_semantic_chunks(text, target_tokens=100, max_tokens=150, min_tokens=30))
+
+    assert len(chunks) == 1
+
+@pytest.mark.parametrize("line, expected", [
+    ("# Quy định", True),
+    ("III. Học bổng", True),
+    ("LỊCH THI CUỐI KỲ", True),
+    ("Sinh viên cần đăng ký.", False),
+    ("", False),
+    ("AB", False)
+])
+def test_is_heading(line, expected):
+    assert is_heading(line) is expected
+
+def test_fixed_chunks_overlap_and_cover_the_text():
+    text = corpus.generate_text(5_000, seed=1)
+
+    chunks = list(iter_fixed_chunks(text, 1000, 200))
+
+    assert all(len(chunk) == 1000 for chunk in chunks[:-1])
+    for left, right in zip(chunks, chunks[1:]):
+        assert left[-200:] == right[:200]
+    assert chunks[0] + "".join(chunk[200:] for chunk in chunks[1:]) == text
+
+def test_iter_chunks_rejects_unknown_chunker():
+    with pytest.raises(ValueError):
+        iter_chunks("nội dung", "sentence", 1000, 200)
@@ -0,0 +1,84 @@
+"""
+Tests for the per-request deadline
+X-Request-Deadline parsing and clamping, remaining budget, skipped stages,
+wait budgets and max_tokens capping
+"""
+import types
+
+import pytest
+
+from config import (
+    REQUEST_DEADLINE_S, REQUEST_DEADLINE_MAX_S, DEADLINE_LLM_OVERHEAD_S, DEADLINE_LLM_TOKENS_PER_S, LLM_MAX_TOKENS
+)
+from utils import deadline as deadline_module
+from utils.deadline import Deadline
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Monotonic clock the test advances by hand"""
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(deadline_module, "time", fake)
+    return fake
+
+@pytest.mark.parametrize("value, budget_s", [
+    ("1500", 1.5),
+    ("0", 0.0),
+    ("-250", 0.0),
+    ("2500.5", 2.5005),
+    (str(REQUEST_DEADLINE_MAX_S * 1000 + 1), REQUEST_DEADLINE_MAX_S),
+    (None, REQUEST_DEADLINE_S),
+    ("", REQUEST_DEADLINE_S),
+    ("soon", REQUEST_DEADLINE_S),
+])
+def test_from_header_parses_milliseconds_and_clamps(clock, value, budget_s):
+    deadline = Deadline.from_header(value)
+
+    assert deadline.budget_s == pytest.approx(min(budget_s, REQUEST_DEADLINE_MAX_S))
+    assert deadline.remaining() == pytest.approx(deadline.budget_s)
+
+def test_remaining_counts_down_and_never_goes_negative(clock):
+    deadline = Deadline(2.0)
+
+    clock.now += 0.5
+    assert deadline.remaining() == pytest.approx(1.5)
+    clock.now += 5
+    assert deadline.remaining() == 0.0
+
+def test_allows_records_each_skipped_stage_in_order(clock):
+    deadline = Deadline(3.0)
+
+    assert deadline.allows("rag", 2.5)
+    clock.now += 1.0
+    assert not deadline.allows("rag", 2.5)
+    assert deadline.allows("llm", 2.0)
+    deadline.skip("function_followup")
+    clock.now += 1.5
+    assert not deadline.allows("llm", 2.0)
+
+    assert deadline.skipped_stages == ["rag", "function_followup", "llm"]
+
+def test_zero_budget_skips_every_stage(clock):
+    deadline = Deadline.from_header("0")
+
+    assert not deadline.allows("rag", 0.001)
+    assert not deadline.allows("llm", 0.001)
+    assert deadline.skipped_stages == ["rag", "llm"]
+
+def test_wait_budget_leaves_the_reserve_for_the_work(clock):
+    deadline = Deadline(5.0)
+
+    assert deadline.wait_budget(reserve_s=2.0, cap_s=10.0) == pytest.approx(3.0)
+    assert deadline.wait_budget(reserve_s=2.0, cap_s=1.0) == pytest.approx(1.0)
+    clock.now += 4.0
+    assert deadline.wait_budget(reserve_s=2.0, cap_s=10.0) == 0.0
+
+def test_max_tokens_follows_the_remaining_budget(clock):
+    deadline = Deadline(REQUEST_DEADLINE_MAX_S)
+    assert deadline.max_tokens() == LLM_MAX_TOKENS
+
+    clock.now += REQUEST_DEADLINE_MAX_S - (DEADLINE_LLM_OVERHEAD_S + 2.0)
+    assert deadline.max_tokens() == min(LLM_MAX_TOKENS, int(2.0 * DEADLINE_LLM_TOKENS_PER_S))
+
+    clock.now += 10
+    assert deadline.max_tokens() == 64
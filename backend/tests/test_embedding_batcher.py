@@ -0,0 +1,89 @@
+"""
+Tests for EmbeddingBatcher
+Concurrent calls coalesced into one forward pass, flush when max_wait runs
+out, full batches bypassing the queue, and errors reaching every waiting caller
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from embedding_batcher import EmbeddingBatcher
+
+class RecordingEmbedder:
+    """Embeds each text as [len(text)] and records the texts of every forward pass"""
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+        self._lock = threading.Lock()
+
+    def __call__(self, input):
+        with self._lock:
+            self.calls.append(list(input))
+        if self.error is not None:
+            raise self.error
+        return [[float(len(text))] for text in input]
+
+def _call_concurrently(batcher, inputs):
+    with ThreadPoolExecutor(max_workers=len(inputs)) as pool:
+        futures = [pool.submit(batcher, texts) for texts in inputs]
+        return [future.exception() or future.result() for future in futures]
+
+def test_concurrent_calls_share_one_forward_pass():
+    embedder = RecordingEmbedder()
+    # The batch fills up long before max_wait, so it is dispatched as soon as the last caller arrives
+    batcher = EmbeddingBatcher(embedder, max_batch=6, max_wait_ms=5000)
+    inputs = [["a"], ["bb", "ccc"], ["dddd"], ["eeeee", "ffffff"]]
+
+    results = _call_concurrently(batcher, inputs)
+
+    assert results == [[[1.0]], [[2.0], [3.0]], [[4.0]], [[5.0], [6.0]]]
+    assert len(embedder.calls) == 1
+    assert sorted(embedder.calls[0]) == ["a", "bb", "ccc", "dddd", "eeeee", "ffffff"]
+    stats = batcher.stats()
+    assert (stats["batches"], stats["texts"], stats["avg_batch_size"]) == (1, 6, 6.0)
+    assert stats["batch_size_distribution"]["<=8"] == 1
+
+def test_partial_batch_is_flushed_when_max_wait_runs_out():
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch=32, max_wait_ms=30)
+
+    started = time.perf_counter()
+    assert batcher(["xin chào"]) == [[8.0]]
+    elapsed = time.perf_counter() - started
+
+    assert 0.025 <= elapsed < 1.0
+    assert embedder.calls == [["xin chào"]]
+    assert batcher.stats()["queue_delay_p50_ms"] >= 25
+
+def test_full_batches_bypass_the_queue():
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch=2, max_wait_ms=5000)
+
+    assert batcher(["a", "bb"]) == [[1.0], [2.0]]
+    assert batcher([]) == []
+
+    assert embedder.calls == [["a", "bb"]]
+    assert batcher.stats()["bypassed_calls"] == 1
+    assert batcher.stats()["batches"] == 0
+
+def test_error_is_raised_in_every_waiting_caller_and_the_batcher_recovers():
+    embedder = RecordingEmbedder(error=RuntimeError("model crashed"))
+    batcher = EmbeddingBatcher(embedder, max_batch=3, max_wait_ms=5000)
+
+    results = _call_concurrently(batcher, [["a"], ["b"], ["c"]])
+
+    assert len(embedder.calls) == 1
+    assert all(isinstance(result, RuntimeError) and str(result) == "model crashed" for result in results)
+
+    embedder.error = None
+    batcher.max_wait = 0.01
+    assert batcher(["dd"]) == [[2.0]]
+
+def test_error_from_a_bypassing_call_reaches_the_caller():
+    batcher = EmbeddingBatcher(RecordingEmbedder(error=ValueError("too long")), max_batch=1)
+
+    with pytest.raises(ValueError):
+        batcher(["a"])
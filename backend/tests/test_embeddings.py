@@ -0,0 +1,15 @@
+"""
+Tests for the embedding providers' configuration defaults
+"""
+import inspect
+
+import pytest
+
+from config import EMBEDDING_BATCH_SIZE
+from embeddings import OnnxEmbedder, SentenceTransformerEmbedder
+
+@pytest.mark.parametrize("embedder", [OnnxEmbedder, SentenceTransformerEmbedder])
+def test_default_batch_size_is_the_configured_int(embedder):
+    default = inspect.signature(embedder.__init__).parameters["batch_size"].default
+    assert isinstance(default, int)
+    assert default == EMBEDDING_BATCH_SIZE
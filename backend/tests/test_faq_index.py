@@ -0,0 +1,94 @@
+"""
+Tests for FAQIndex
+Exact top-k against a brute-force reference and against a Chroma collection,
+and int8 quantization keeping the same ranking
+"""
+import numpy as np
+import pytest
+
+from faq_index import FAQIndex
+
+DIM = 32
+
+def _corpus(count, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(count, DIM)).astype(np.float32)
+    questions = [f"câu hỏi {i}" for i in range(count)]
+    metadatas = [{"answer": f"trả lời {i}", "n": i} for i in range(count)]
+    return questions, embeddings, metadatas
+
+def _unit(vectors):
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+def _build(quantize, count=200, seed=0):
+    questions, embeddings, metadatas = _corpus(count, seed)
+    index = FAQIndex(quantize=quantize)
+    index.build(questions, embeddings.tolist(), metadatas)
+    return index, embeddings
+
+def test_search_returns_top_k_by_cosine_in_squared_l2_space():
+    index, embeddings = _build(quantize=False)
+    query = np.random.default_rng(1).normal(size=DIM).astype(np.float32)
+
+    results = index.search(query.tolist(), top_k=5)
+
+    cosine = _unit(embeddings) @ _unit(query)
+    expected = np.argsort(-cosine)[:5]
+    assert [metadata["n"] for _, metadata, _ in results] == expected.tolist()
+    assert [question for question, _, _ in results] == [f"câu hỏi {i}" for i in expected]
+    assert [distance for _, _, distance in results] == pytest.approx((2 - 2 * cosine[expected]).tolist(), abs=1e-5)
+
+def test_quantized_index_keeps_ranking_and_distances():
+    exact, _ = _build(quantize=False)
+    quantized, _ = _build(quantize=True)
+    queries = np.random.default_rng(2).normal(size=(20, DIM)).astype(np.float32)
+
+    for query in queries:
+        expected = exact.search(query.tolist(), top_k=3)
+        actual = quantized.search(query.tolist(), top_k=3)
+        assert actual[0][1]["n"] == expected[0][1]["n"]
+        assert [d for _, _, d in actual] == pytest.approx([d for _, _, d in expected], abs=0.02)
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_search_matches_chroma(tmp_path, quantize):
+    chromadb = pytest.importorskip("chromadb")
+    questions, embeddings, metadatas = _corpus(100, seed=3)
+    normalized = _unit(embeddings)
+    # search_ef above the collection size makes Chroma's HNSW search exhaustive, so both sides are exact
+    collection = chromadb.PersistentClient(path=str(tmp_path)).create_collection(
+        "faq", metadata={"hnsw:search_ef": 200, "hnsw:construction_ef": 200}, embedding_function=None
+    )
+    collection.add(ids=[str(i) for i in range(len(questions))], documents=questions,
+                   metadatas=metadatas, embeddings=normalized.tolist())
+    index = FAQIndex(quantize=quantize)
+    index.build(questions, embeddings.tolist(), metadatas)
+    queries = _unit(np.random.default_rng(4).normal(size=(10, DIM)).astype(np.float32))
+
+    for query in queries:
+        chroma = collection.query(query_embeddings=[query.tolist()], n_results=3)
+        results = index.search(query.tolist(), top_k=3)
+        assert results[0][0] == chroma["documents"][0][0]
+        assert [d for _, _, d in results] == pytest.approx(chroma["distances"][0], abs=0.02 if quantize else 1e-4)
+
+def test_top_k_larger_than_index_returns_everything_sorted():
+    index, _ = _build(quantize=False, count=4)
+
+    results = index.search(np.ones(DIM).tolist(), top_k=10)
+
+    distances = [distance for _, _, distance in results]
+    assert len(results) == 4
+    assert distances == sorted(distances)
+
+def test_empty_index_and_non_positive_top_k():
+    index = FAQIndex()
+    index.build([], [], [])
+    assert len(index) == 0
+    assert index.search(np.ones(DIM).tolist()) == []
+
+    built, _ = _build(quantize=False, count=5)
+    assert built.search(np.ones(DIM).tolist(), top_k=0) == []
+
+def test_build_rejects_mismatched_lengths():
+    questions, embeddings, metadatas = _corpus(3)
+    with pytest.raises(ValueError):
+        FAQIndex().build(questions, embeddings.tolist(), metadatas[:2])
@@ -0,0 +1,78 @@
+"""
+Tests for the FAQ seed bundle
+Round trip, and the loader rejecting a bundle whose checksum, embedding
+model, FAQ list or format does not match (the manager then embeds the FAQs)
+"""
+import json
+
+import numpy as np
+import pytest
+
+import chroma_manager
+from benchmarks.bench_hot_paths import HashingEmbedder
+from embeddings import embedding_model_id
+from faq_seed import build_bundle, load_bundle
+
+MODEL = "test-model/onnx/model.onnx"
+FAQS = [
+    {"question": "Học phí bao nhiêu?", "answer": "12 triệu mỗi học kỳ", "category": "tuition"},
+    {"question": "Thư viện mở cửa lúc mấy giờ?", "answer": "7h đến 21h", "category": "facilities"},
+]
+
+def _write(path, bundle):
+    path.write_text(json.dumps(bundle, ensure_ascii=False), encoding="utf-8")
+    return path
+
+@pytest.fixture
+def bundle():
+    return build_bundle(FAQS, HashingEmbedder(dim=16), MODEL)
+
+def test_bundle_round_trip(tmp_path, bundle):
+    faqs, embeddings = load_bundle(_write(tmp_path / "seed.json", bundle), MODEL, FAQS)
+
+    assert faqs == FAQS
+    assert np.asarray(embeddings) == pytest.approx(np.asarray(HashingEmbedder(dim=16)([f["question"] for f in FAQS])))
+
+@pytest.mark.parametrize("tamper", [
+    lambda bundle: bundle["faqs"][0].update(answer="miễn phí"),
+    lambda bundle: bundle.update(embeddings=bundle["embeddings"][::-1]),
+    lambda bundle: bundle.update(checksum="0" * 64),
+], ids=["answer", "embeddings", "checksum"])
+def test_checksum_mismatch_is_rejected(tmp_path, bundle, tamper):
+    tamper(bundle)
+
+    assert load_bundle(_write(tmp_path / "seed.json", bundle), MODEL, FAQS) is None
+
+def test_bundle_for_another_embedding_model_is_rejected(tmp_path, bundle):
+    path = _write(tmp_path / "seed.json", bundle)
+
+    assert load_bundle(path, "test-model/sentence-transformers", FAQS) is None
+
+def test_bundle_for_another_faq_list_is_rejected(tmp_path, bundle):
+    path = _write(tmp_path / "seed.json", bundle)
+
+    assert load_bundle(path, MODEL, FAQS[:1]) is None
+
+def test_unsupported_missing_or_corrupt_bundles_are_rejected(tmp_path, bundle):
+    newer = build_bundle(FAQS, HashingEmbedder(dim=16), MODEL)
+    newer["format_version"] = 2
+
+    assert load_bundle(_write(tmp_path / "newer.json", newer), MODEL, FAQS) is None
+    assert load_bundle(tmp_path / "missing.json", MODEL, FAQS) is None
+    (tmp_path / "truncated.json").write_text(json.dumps(bundle)[:100], encoding="utf-8")
+    assert load_bundle(tmp_path / "truncated.json", MODEL, FAQS) is None
+
+@pytest.mark.parametrize("model_matches", [True, False], ids=["bundle", "model-mismatch"])
+def test_manager_seeds_from_the_bundle_only_when_it_matches(tmp_path, monkeypatch, model_matches):
+    faqs = chroma_manager.load_default_faqs()
+    # Recognizable embeddings: not what the manager's own embedder would produce
+    seeded = build_bundle(faqs, lambda texts: np.eye(len(texts), 32), embedding_model_id() if model_matches else MODEL)
+    monkeypatch.setattr(chroma_manager, "FAQ_SEED_BUNDLE_PATH", str(_write(tmp_path / "seed.json", seeded)))
+    monkeypatch.setattr(chroma_manager, "create_embedding_function", HashingEmbedder)
+
+    manager = chroma_manager.ChromaDBManager(persist_directory=tmp_path / "db", backend="flat")
+
+    stored = manager.faq_collection.get(include=["documents", "embeddings"])
+    assert len(stored["ids"]) == len(faqs)
+    dims = {len(embedding) for embedding in stored["embeddings"]}
+    assert dims == ({32} if model_matches else {384})
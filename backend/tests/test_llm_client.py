@@ -0,0 +1,222 @@
+"""
+Tests for the circuit breaker and its use by the resilient chat clients
+State transitions, half-open probe ownership, and how each kind of failure
+settles a probe
+"""
+import asyncio
+import time
+
+import httpx
+import openai
+import pytest
+
+from config import LLM_READ_TIMEOUT_S
+from utils.llm_client import (
+    AsyncResilientChatClient, CircuitBreaker, CircuitOpenError, LLMDeadlineExceeded, ResilientChatClient
+)
+
+RESET_TIMEOUT = 0.02
+
+class _FakeClient:
+    """Stands in for openai.OpenAI / AsyncOpenAI: only chat.completions.create is used"""
+
+    def __init__(self, create):
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = type("Completions", (), {})()
+        self.chat.completions.create = create
+
+def _open_breaker(failure_threshold=2):
+    breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=RESET_TIMEOUT)
+    for _ in range(failure_threshold):
+        breaker.record_failure()
+    return breaker
+
+def _half_open_breaker():
+    breaker = _open_breaker()
+    time.sleep(RESET_TIMEOUT * 1.5)
+    return breaker
+
+def _status_error(status):
+    request = httpx.Request("POST", "https://llm.invalid/chat/completions")
+    error_class = openai.BadRequestError if status == 400 else openai.InternalServerError
+    return error_class("upstream error", response=httpx.Response(status, request=request), body=None)
+
+def _client(create, breaker):
+    return ResilientChatClient(_FakeClient(create), breaker=breaker, max_retries=0, hedge_after=0,
+                               request_deadline=5.0)
+
+def _raising(error):
+    def create(**kwargs):
+        raise error
+    return create
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.stats()["times_opened"] == 1
+
+def test_breaker_lets_one_probe_through_after_the_reset_timeout():
+    breaker = _open_breaker()
+    assert not breaker.allow()
+
+    time.sleep(RESET_TIMEOUT * 1.5)
+
+    assert not breaker.is_open()
+    assert breaker.allow("probe")
+    assert breaker.state == "half_open"
+    assert not breaker.allow("other")
+
+def test_probe_success_closes_the_breaker():
+    breaker = _half_open_breaker()
+    assert breaker.allow()
+
+    breaker.record_success()
+
+    assert breaker.state == "closed"
+    assert breaker.stats()["consecutive_failures"] == 0
+    assert breaker.allow() and breaker.allow()
+
+def test_probe_failure_reopens_the_breaker():
+    breaker = _half_open_breaker()
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert breaker.is_open()
+    assert breaker.stats()["times_opened"] == 2
+    time.sleep(RESET_TIMEOUT * 1.5)
+    assert breaker.allow()
+
+def test_only_the_probe_owner_releases_the_probe():
+    breaker = _half_open_breaker()
+    owner = object()
+    assert breaker.allow(owner)
+
+    breaker.release_probe(object())
+    breaker.release_probe(None)
+    assert not breaker.allow()
+
+    breaker.release_probe(owner)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+def test_open_breaker_short_circuits_without_calling_upstream():
+    client = _client(lambda **kwargs: "unused", _open_breaker())
+
+    with pytest.raises(CircuitOpenError):
+        client.create(messages=[])
+
+    assert client.stats()["short_circuited"] == 1
+    assert client.stats()["attempts"] == 0
+
+@pytest.mark.parametrize("error", [ValueError("bad payload"), _status_error(500)], ids=["unexpected", "5xx"])
+def test_failed_half_open_probe_reopens_and_frees_the_probe(error):
+    breaker = _half_open_breaker()
+    client = _client(_raising(error), breaker)
+
+    with pytest.raises(type(error)):
+        client.create(messages=[])
+
+    assert breaker.state == "open"
+    assert not breaker._probe_in_flight
+    time.sleep(RESET_TIMEOUT * 1.5)
+    assert breaker.allow()
+
+def test_deadline_exceeded_does_not_count_as_an_upstream_failure():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client = _client(_raising(LLMDeadlineExceeded("deadline")), breaker)
+
+    for _ in range(5):
+        with pytest.raises(LLMDeadlineExceeded):
+            client.create(messages=[])
+
+    assert breaker.state == "closed"
+    assert breaker.stats()["consecutive_failures"] == 0
+    assert client.stats()["deadline_exceeded"] == 5
+
+def test_deadline_exceeded_on_half_open_probe_only_releases_the_probe():
+    breaker = _half_open_breaker()
+    client = _client(_raising(LLMDeadlineExceeded("deadline")), breaker)
+
+    with pytest.raises(LLMDeadlineExceeded):
+        client.create(messages=[])
+
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+def test_timeout_shortened_by_the_request_deadline_is_a_deadline_error():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    timeouts = []
+
+    def create(timeout, **kwargs):
+        timeouts.append(timeout)
+        raise openai.APITimeoutError(request=httpx.Request("POST", "https://llm.invalid/chat/completions"))
+    client = _client(create, breaker)
+
+    with pytest.raises(LLMDeadlineExceeded):
+        client.create(deadline=time.monotonic() + 0.5, messages=[])
+
+    assert timeouts[0] < LLM_READ_TIMEOUT_S
+    assert breaker.state == "closed"
+
+def test_timeout_at_the_full_read_timeout_counts_as_a_failure():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+
+    def create(timeout, **kwargs):
+        assert timeout == LLM_READ_TIMEOUT_S
+        raise openai.APITimeoutError(request=httpx.Request("POST", "https://llm.invalid/chat/completions"))
+    client = _client(create, breaker)
+
+    with pytest.raises(openai.APITimeoutError):
+        client.create(deadline=time.monotonic() + LLM_READ_TIMEOUT_S + 60, messages=[])
+
+    assert breaker.state == "open"
+
+def test_4xx_on_half_open_probe_closes_the_breaker():
+    breaker = _half_open_breaker()
+    client = _client(_raising(_status_error(400)), breaker)
+
+    with pytest.raises(openai.BadRequestError):
+        client.create(messages=[])
+
+    assert breaker.state == "closed"
+
+def test_successful_call_closes_a_half_open_breaker():
+    breaker = _half_open_breaker()
+    client = _client(lambda **kwargs: "completion", breaker)
+
+    assert client.create(messages=[]) == "completion"
+    assert breaker.state == "closed"
+    assert client.stats()["attempts"] == 1
+
+def test_cancelled_async_probe_is_released():
+    breaker = _half_open_breaker()
+
+    async def hang(**kwargs):
+        await asyncio.sleep(10)
+    client = AsyncResilientChatClient(_FakeClient(hang), breaker=breaker, max_retries=0, hedge_after=0,
+                                      request_deadline=5.0)
+
+    async def scenario():
+        task = asyncio.ensure_future(client.create(messages=[]))
+        await asyncio.sleep(0.02)
+        assert not breaker.allow()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert breaker.state == "half_open"
+    assert breaker.allow()
@@ -0,0 +1,96 @@
+"""
+Tests for the metrics registry
+Prometheus text rendering, and merging worker snapshots in multi-process mode
+(live vs exited workers, retired totals staying monotonic)
+"""
+import json
+import os
+import subprocess
+
+from utils.metrics import MetricsRegistry
+
+def _registry(multiproc_dir=None, requests=0, in_progress=0, latencies=()):
+    registry = MetricsRegistry(multiproc_dir=multiproc_dir)
+    counter = registry.counter("chat_requests_total", "Chat requests", ("source",))
+    if requests:
+        counter.inc(requests, source="faq")
+    registry.gauge("chat_requests_in_progress", "In progress").set(in_progress)
+    histogram = registry.histogram("llm_request_duration_seconds", "LLM latency", buckets=(0.1, 1.0))
+    for latency in latencies:
+        histogram.observe(latency)
+    return registry
+
+def _write_snapshot(directory, pid, **values):
+    snapshot = _registry(**values).snapshot()
+    snapshot["pid"] = pid
+    (directory / f"{pid}.json").write_text(json.dumps(snapshot), encoding="utf-8")
+
+def _exited_pid():
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+def _samples(text):
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+
+def test_render_counters_gauges_and_cumulative_histograms():
+    registry = _registry(requests=3, in_progress=2, latencies=(0.05, 0.5, 0.5, 4.0))
+    registry.counter("chat_requests_total", "Chat requests", ("source",)).inc(source='say "hi"\n')
+    registry.register_collector(lambda: [("retrieval_cache_entries", "Cache entries", {}, 7)])
+
+    text = registry.render()
+
+    assert "# TYPE chat_requests_total counter" in text
+    assert "# TYPE llm_request_duration_seconds histogram" in text
+    assert _samples(text) == {
+        'chat_requests_total{source="faq"}': "3",
+        'chat_requests_total{source="say \\"hi\\"\\n"}': "1",
+        "chat_requests_in_progress": "2",
+        'llm_request_duration_seconds_bucket{le="0.1"}': "1",
+        'llm_request_duration_seconds_bucket{le="1.0"}': "3",
+        'llm_request_duration_seconds_bucket{le="+Inf"}': "4",
+        "llm_request_duration_seconds_sum": "5.05",
+        "llm_request_duration_seconds_count": "4",
+        "retrieval_cache_entries": "7",
+    }
+
+def test_multiprocess_render_sums_workers_and_drops_gauges_of_exited_ones(tmp_path):
+    registry = _registry(tmp_path, requests=1, in_progress=1, latencies=(0.5,))
+    _write_snapshot(tmp_path, os.getppid(), requests=2, in_progress=3, latencies=(0.05,))
+    exited = _exited_pid()
+    _write_snapshot(tmp_path, exited, requests=4, in_progress=5, latencies=(2.0,))
+
+    samples = _samples(registry.render())
+
+    assert samples['chat_requests_total{source="faq"}'] == "7"
+    assert samples["chat_requests_in_progress"] == "4"
+    assert samples['llm_request_duration_seconds_bucket{le="0.1"}'] == "1"
+    assert samples["llm_request_duration_seconds_count"] == "3"
+    # The exited worker's file is folded into retired.json
+    assert not (tmp_path / f"{exited}.json").exists()
+    assert (tmp_path / "retired.json").exists()
+
+def test_retired_totals_are_counted_once_on_every_scrape(tmp_path):
+    registry = _registry(tmp_path)
+    _write_snapshot(tmp_path, _exited_pid(), requests=4)
+    registry.render()
+    _write_snapshot(tmp_path, _exited_pid(), requests=2)
+
+    first = _samples(registry.render())
+    second = _samples(registry.render())
+
+    assert first['chat_requests_total{source="faq"}'] == second['chat_requests_total{source="faq"}'] == "6"
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == sorted([f"{os.getpid()}.json", "retired.json"])
+
+def test_first_flush_retires_a_file_left_under_a_reused_pid(tmp_path):
+    _write_snapshot(tmp_path, os.getpid(), requests=5)
+    registry = _registry(tmp_path, requests=1)
+
+    registry.flush()
+
+    assert _samples(registry.render())['chat_requests_total{source="faq"}'] == "6"
+
+def test_single_process_render_ignores_the_multiproc_dir(tmp_path):
+    _write_snapshot(tmp_path, os.getppid(), requests=2)
+
+    assert _samples(_registry(requests=1).render())['chat_requests_total{source="faq"}'] == "1"
@@ -0,0 +1,95 @@
+"""
+Tests for the inter-process primitives
+InterProcessLock excludes other processes and is reentrant, LeaderLock elects
+exactly one process, SharedCounter round-trips through its file
+"""
+import multiprocessing
+import os
+
+from process_lock import InterProcessLock, LeaderLock, SharedCounter
+
+fork = multiprocessing.get_context("fork")
+
+def _increment_many(lock_path, counter_path, times):
+    lock = InterProcessLock(lock_path)
+    counter = SharedCounter(counter_path)
+    for _ in range(times):
+        with lock:
+            counter.increment()
+
+def _hold_leader(lock_path, acquired, release):
+    leader = LeaderLock(lock_path)
+    acquired.put(leader.try_acquire())
+    release.wait(10)
+
+def _try_leader(lock_path, result):
+    result.put(LeaderLock(lock_path).try_acquire())
+
+def test_shared_counter_read_and_increment(tmp_path):
+    counter = SharedCounter(tmp_path / "version")
+    assert counter.read() == 0
+    assert counter.increment() == 1
+    assert counter.increment() == 2
+    assert SharedCounter(tmp_path / "version").read() == 2
+
+def test_inter_process_lock_is_reentrant(tmp_path):
+    lock = InterProcessLock(tmp_path / "write.lock")
+    with lock:
+        with lock:
+            assert lock._depth == 2
+        assert lock._depth == 1
+    assert lock._depth == 0
+
+def test_inter_process_lock_serializes_processes(tmp_path):
+    lock_path, counter_path = tmp_path / "write.lock", tmp_path / "version"
+    # Created (and its fd opened) before fork: children must reopen it to exclude each other
+    lock = InterProcessLock(lock_path)
+    with lock:
+        pass
+
+    workers = [fork.Process(target=_increment_many, args=(lock_path, counter_path, 200)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    _increment_many(lock_path, counter_path, 200)
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    # Unlocked read-modify-write cycles would lose increments
+    assert SharedCounter(counter_path).read() == 1000
+
+def test_inter_process_lock_reopens_after_fork(tmp_path):
+    lock = InterProcessLock(tmp_path / "write.lock")
+    with lock:
+        parent_fd = lock._fd
+
+    result = fork.Queue()
+    def child():
+        lock._ensure_fd()
+        result.put(lock._pid == os.getpid() and lock._fd != parent_fd)
+    process = fork.Process(target=child)
+    process.start()
+    process.join(10)
+    assert result.get(timeout=5)
+
+def test_leader_lock_elects_one_process(tmp_path):
+    lock_path = tmp_path / "leader.lock"
+    acquired, release, result = fork.Queue(), fork.Event(), fork.Queue()
+    leader = fork.Process(target=_hold_leader, args=(lock_path, acquired, release))
+    leader.start()
+    try:
+        assert acquired.get(timeout=10) is True
+
+        assert LeaderLock(lock_path).try_acquire() is False
+        follower = fork.Process(target=_try_leader, args=(lock_path, result))
+        follower.start()
+        follower.join(10)
+        assert result.get(timeout=5) is False
+    finally:
+        release.set()
+        leader.join(10)
+
+    # The leader exited, so its flock is gone and the next process takes over
+    successor = LeaderLock(lock_path)
+    assert successor.try_acquire() is True
+    assert successor.try_acquire() is True
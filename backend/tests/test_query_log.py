@@ -0,0 +1,103 @@
+"""
+Tests for the user query log
+Dedup of repeated queries, compaction (retention, legacy migration, writes
+landing between batches) and ResponseArchive generations
+"""
+from datetime import datetime, timedelta
+
+from response_archive import ResponseArchive
+
+def _metadata(manager, log_id):
+    return manager.queries_collection.get(ids=[log_id], include=['metadatas'])['metadatas'][0]
+
+def _age(manager, log_id, days):
+    seen = datetime.now() - timedelta(days=days)
+    manager.queries_collection.update(
+        ids=[log_id], metadatas=[{"last_seen": seen.isoformat(), "last_seen_ts": seen.timestamp()}]
+    )
+
+def test_archive_round_trip_across_generations(tmp_path):
+    archive = ResponseArchive(tmp_path / "responses.jsonl")
+    first = archive.append("q-1", "Học phí là 12 triệu", "2024-01-01T00:00:00")
+    second = archive.append("q-2", "Thư viện mở cửa 7h", "2024-01-02T00:00:00")
+
+    assert first == (0, 0)
+    assert archive.read(second[1])["response"] == "Thư viện mở cửa 7h"
+
+    offsets = archive.copy_lines({"q-2": second}, 1, truncate=True)
+    archive.publish(1)
+    appended = archive.append("q-3", "Điểm chuẩn 25", "2024-01-03T00:00:00")
+    archive.drop_generations_before(1)
+
+    assert offsets == {"q-2": 0}
+    assert appended[0] == 1
+    assert not archive.path.exists()
+    assert archive.read(offsets["q-2"], 1) == {"id": "q-2", "timestamp": "2024-01-02T00:00:00",
+                                               "response": "Thư viện mở cửa 7h"}
+    assert archive.read(appended[1], 1)["id"] == "q-3"
+    assert ResponseArchive(tmp_path / "responses.jsonl").generation.read() == 1
+
+def test_repeated_query_keeps_one_entry_and_its_first_session(manager):
+    first = manager.log_user_query("Học phí bao nhiêu?", "12 triệu", "session-a", source="faq")
+    second = manager.log_user_query("  học phí   BAO nhiêu? ", "13 triệu", "session-b", source="openai")
+
+    assert first == second
+    assert manager.queries_collection.count() == 1
+    metadata = _metadata(manager, first)
+    assert metadata["count"] == 2
+    assert (metadata["session_id"], metadata["source"]) == ("session-a", "faq")
+    assert (metadata["last_session_id"], metadata["last_source"]) == ("session-b", "openai")
+    assert manager.get_logged_response(first) == "13 triệu"
+
+def test_compaction_applies_retention_and_keeps_latest_responses(manager):
+    ids = [manager.log_user_query(f"câu hỏi {i}", f"trả lời {i}", "s") for i in range(5)]
+    manager.log_user_query("câu hỏi 4", "trả lời mới 4", "s")
+    _age(manager, ids[0], days=100)
+    for days, log_id in enumerate(reversed(ids[1:])):
+        _age(manager, log_id, days=days + 1)
+
+    report = manager.compact_query_log(max_age_days=30, max_entries=3, batch_size=2)
+
+    assert (report["removed_expired"], report["removed_over_limit"], report["kept"]) == (1, 1, 3)
+    assert manager.get_logged_response(ids[0]) is None
+    assert manager.get_logged_response(ids[1]) is None
+    assert manager.get_logged_response(ids[4]) == "trả lời mới 4"
+    assert manager.response_archive.generation.read() == 1
+    assert not manager.response_archive.path.exists()
+    # Only the latest response of each kept entry is copied
+    lines = manager.response_archive.generation_path(1).read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 3
+
+    manager.log_user_query("câu hỏi 2", "trả lời sau compaction", "s")
+    assert manager.get_logged_response(ids[2]) == "trả lời sau compaction"
+
+def test_compaction_migrates_responses_stored_in_metadata(manager):
+    manager.queries_collection.add(
+        ids=["q-legacy"],
+        documents=["ký túc xá ở đâu"],
+        metadatas=[{"session_id": "old", "source": "openai", "timestamp": datetime.now().isoformat(),
+                    "response": "Ký túc xá ở khu B"}]
+    )
+
+    report = manager.compact_query_log()
+
+    assert report["migrated_responses"] == 1
+    assert "response" not in _metadata(manager, "q-legacy")
+    assert manager.get_logged_response("q-legacy") == "Ký túc xá ở khu B"
+
+def test_response_logged_during_the_archive_copy_is_not_lost(manager):
+    log_id = manager.log_user_query("lịch thi", "tuần 15", "s")
+    copy_lines = manager.response_archive.copy_lines
+
+    def copy_then_log(refs, generation, truncate=False):
+        offsets = copy_lines(refs, generation, truncate)
+        if truncate:
+            # Lands while compaction does not hold the write lock
+            manager.log_user_query("lịch thi", "tuần 16", "s")
+        return offsets
+    manager.response_archive.copy_lines = copy_then_log
+
+    assert "error" not in manager.compact_query_log()
+
+    assert _metadata(manager, log_id)["response_generation"] == 1
+    assert manager.get_logged_response(log_id) == "tuần 16"
@@ -0,0 +1,114 @@
+"""
+Tests for RAG context building
+Overlapping and adjacent chunks merged once per document, gaps marked, and
+the token budget respected with and without neighbouring chunks
+"""
+import pytest
+
+from utils.chunking import estimate_tokens, iter_fixed_chunks
+from utils.rag_utils import PASSAGE_SEPARATOR, build_context, render_context, stitch
+
+TEXT = " ".join(f"Câu {i}: sinh viên cần hoàn thành thủ tục số {i} trước hạn." for i in range(40))
+CHUNKS = list(iter_fixed_chunks(TEXT, 300, 60))
+
+def _item(index, title="Quy chế", chunks=CHUNKS, relevance=0.9):
+    return {
+        "id": f"{title}-{index}",
+        "title": f"{title} (Part {index + 1})",
+        "content": chunks[index],
+        "category": "regulations",
+        "original_title": title,
+        "chunk_index": index,
+        "total_chunks": len(chunks),
+        "relevance": relevance
+    }
+
+def _fetcher(calls, chunks=CHUNKS):
+    def fetch(refs):
+        calls.append(refs)
+        return [_item(index, title, chunks) for title, index in refs]
+    return fetch
+
+def test_stitch_keeps_the_overlap_once():
+    assert stitch(CHUNKS[0], CHUNKS[1]) == TEXT[:540]
+    assert stitch("không trùng lặp.", "Đoạn tiếp theo.") == "không trùng lặp.\nĐoạn tiếp theo."
+
+def test_adjacent_hits_are_merged_under_one_heading():
+    context = build_context([_item(1), _item(0)], max_tokens=10_000)
+
+    assert context.count("📚 Quy chế") == 1
+    assert context == f"📚 Quy chế\n{TEXT[:540].strip()}\n"
+
+def test_non_adjacent_hits_are_separated():
+    context = build_context([_item(0), _item(2)], max_tokens=10_000)
+
+    assert context.count(PASSAGE_SEPARATOR) == 1
+    assert context.index(CHUNKS[0].strip()) < context.index(PASSAGE_SEPARATOR) < context.index(CHUNKS[2].strip())
+
+def test_documents_keep_rank_order_and_duplicates_are_dropped():
+    other = list(iter_fixed_chunks("Lịch thi cuối kỳ được công bố trên cổng đào tạo. " * 10, 200, 40))
+    items = [_item(0, "Lịch thi", other), _item(3), _item(0, "Lịch thi", other)]
+
+    context = build_context(items, max_tokens=10_000)
+
+    assert context.index("📚 Lịch thi") < context.index("📚 Quy chế")
+    assert context.count(other[0].strip()) == 1
+
+@pytest.mark.parametrize("max_tokens", [60, 120, 200, 400])
+def test_context_stays_within_the_budget(max_tokens):
+    items = [_item(index) for index in (4, 0, 2, 6)]
+
+    context = build_context(items, fetch_chunks=_fetcher([]), max_tokens=max_tokens, neighbor_max_tokens=200)
+
+    assert 0 < estimate_tokens(context) <= max_tokens
+
+def test_lower_ranked_hit_that_does_not_fit_is_skipped_for_a_smaller_one():
+    small = {**_item(5), "id": "small", "content": "Ngắn gọn.", "chunk_index": 9}
+    budget = estimate_tokens(render_context([_item(0), small])) + 1
+
+    context = build_context([_item(0), _item(3), small], max_tokens=budget)
+
+    assert CHUNKS[3].strip() not in context
+    assert "Ngắn gọn." in context
+
+def test_oversized_top_hit_is_truncated():
+    context = build_context([_item(0)], max_tokens=20)
+
+    assert context.rstrip().endswith(" …")
+    assert estimate_tokens(context) <= 20
+
+def test_neighbour_closing_a_gap_is_fetched_and_merged():
+    calls = []
+
+    context = build_context([_item(0), _item(2)], fetch_chunks=_fetcher(calls), max_tokens=10_000,
+                            neighbor_max_tokens=200)
+
+    assert calls == [[("Quy chế", 1), ("Quy chế", 3)]]
+    assert PASSAGE_SEPARATOR not in context
+    assert TEXT[:780].strip() in context
+
+def test_neighbours_over_the_per_chunk_limit_are_left_out():
+    context = build_context([_item(0), _item(2)], fetch_chunks=_fetcher([]), max_tokens=10_000,
+                            neighbor_max_tokens=5)
+
+    assert context == build_context([_item(0), _item(2)], max_tokens=10_000)
+
+def test_neighbours_are_not_fetched_past_document_edges_or_when_disabled():
+    calls = []
+    last = len(CHUNKS) - 1
+
+    build_context([_item(0), _item(last)], fetch_chunks=_fetcher(calls), max_tokens=10_000)
+    build_context([_item(3)], fetch_chunks=_fetcher(calls), neighbor_max_tokens=0)
+
+    assert calls == [[("Quy chế", 1), ("Quy chế", last - 1)]]
+
+def test_failing_neighbour_fetch_falls_back_to_the_hits():
+    def fetch(refs):
+        raise RuntimeError("vector store unavailable")
+
+    context = build_context([_item(0), _item(2)], fetch_chunks=fetch, max_tokens=10_000)
+
+    assert context == build_context([_item(0), _item(2)], max_tokens=10_000)
+
+def test_no_items_gives_empty_context():
+    assert build_context([]) == ""
@@ -0,0 +1,62 @@
+"""
+Tests for the retrieval cache
+Query normalization, LRU eviction and copies, and invalidation when a write
+bumps the collection version
+"""
+import unicodedata
+
+from utils.retrieval_cache import RetrievalCache, normalize_query
+
+def test_normalize_query_collapses_whitespace_case_and_unicode_form():
+    decomposed = unicodedata.normalize("NFD", "Học phí")
+
+    assert normalize_query(f"  {decomposed}\tBAO   nhiêu?\n") == "học phí bao nhiêu?"
+    assert normalize_query(decomposed) == normalize_query("học phí")
+
+def test_normalize_query_folds_diacritics_only_when_asked():
+    assert normalize_query("Điểm chuẩn ngành Dược") == "điểm chuẩn ngành dược"
+    assert normalize_query("Điểm chuẩn ngành Dược", fold_diacritics=True) == "diem chuan nganh duoc"
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RetrievalCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == (True, 1)
+
+    cache.put("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+    assert cache.stats() == {"entries": 2, "max_entries": 2, "hits": 3, "misses": 1, "hit_rate": 0.75}
+
+def test_cached_results_are_copies():
+    cache = RetrievalCache()
+    result = [{"title": "Học phí"}]
+    cache.put("q", result)
+    result[0]["title"] = "changed"
+
+    _, cached = cache.get("q")
+    cached.append({"title": "extra"})
+
+    assert cache.get("q") == (True, [{"title": "Học phí"}])
+
+def test_zero_entries_disables_caching():
+    cache = RetrievalCache(max_entries=0)
+    cache.put("q", [])
+    assert cache.get("q") == (False, None)
+    assert cache.stats()["entries"] == 0
+
+def test_write_bumps_the_version_and_invalidates_cached_searches(manager):
+    manager.add_knowledge("Học phí", "Học phí học kỳ là 12 triệu đồng", "tuition")
+    first = manager.search_knowledge("học phí học kỳ", top_k=5)
+    assert manager.search_knowledge("  Học phí   HỌC KỲ ", top_k=5) == first
+    hits = manager.retrieval_cache.stats()["hits"]
+
+    manager.add_knowledge("Học phí chất lượng cao", "Học phí học kỳ chương trình chất lượng cao là 30 triệu", "tuition")
+    second = manager.search_knowledge("học phí học kỳ", top_k=5)
+
+    assert manager.retrieval_cache.stats()["hits"] == hits
+    assert len(second) == len(first) + 1
+    assert manager.search_knowledge("học phí học kỳ", top_k=5) == second
+    assert manager.retrieval_cache.stats()["hits"] == hits + 1
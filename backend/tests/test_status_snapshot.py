@@ -0,0 +1,99 @@
+"""
+Tests for the background-refreshed status snapshot
+Probes are served from the cached snapshot, the refresher thread replaces it,
+and a failing collector keeps the last good one
+"""
+import threading
+
+from flask import Flask
+import pytest
+
+from routes.health import health_bp, init_health_routes
+from utils.status_snapshot import StatusSnapshot
+
+class CountingCollector:
+    def __init__(self):
+        self.calls = 0
+        self.error = None
+        self.collected = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.collected.set()
+        if self.error is not None:
+            raise self.error
+        return {"status": "healthy", "collection": self.calls}
+
+def test_first_get_collects_inline_then_serves_the_cached_snapshot():
+    collector = CountingCollector()
+    snapshot = StatusSnapshot(collector, interval_s=60)
+
+    first = snapshot.get()
+    second = snapshot.get()
+
+    assert collector.calls == 1
+    assert first["collection"] == second["collection"] == 1
+    assert {"snapshot_at", "collect_ms", "age_s"} <= set(second)
+    assert second["age_s"] >= first["age_s"]
+
+def test_refresh_replaces_the_snapshot():
+    collector = CountingCollector()
+    snapshot = StatusSnapshot(collector, interval_s=60)
+    snapshot.get()
+
+    snapshot.refresh()
+
+    assert snapshot.get()["collection"] == 2
+    assert snapshot.get()["age_s"] < 1
+
+def test_failing_collector_keeps_the_previous_snapshot():
+    collector = CountingCollector()
+    snapshot = StatusSnapshot(collector, interval_s=60)
+    snapshot.refresh()
+    collector.error = RuntimeError("vector store busy")
+
+    snapshot.refresh()
+
+    assert snapshot.get()["collection"] == 1
+    assert "error" not in snapshot.get()
+
+def test_failing_first_collection_reports_the_error():
+    collector = CountingCollector()
+    collector.error = RuntimeError("vector store busy")
+
+    assert StatusSnapshot(collector).get()["error"] == "vector store busy"
+
+def test_refresher_thread_keeps_refreshing_until_stopped():
+    collector = CountingCollector()
+    snapshot = StatusSnapshot(collector, interval_s=0.01)
+
+    thread = snapshot.start()
+    assert snapshot.start() is None  # Once per process
+    for _ in range(3):
+        assert collector.collected.wait(2)
+        collector.collected.clear()
+    snapshot.stop()
+    thread.join(2)
+
+    assert not thread.is_alive()
+    assert snapshot.get()["collection"] >= 3
+
+@pytest.fixture
+def health_client():
+    app = Flask(__name__)
+    init_health_routes(app, None, None, "sk-demo-key-for-testing")
+    collector = CountingCollector()
+    health_bp.status_snapshot = StatusSnapshot(collector, interval_s=60)
+    return app.test_client(), collector
+
+def test_health_endpoints_read_the_snapshot_instead_of_collecting(health_client):
+    client, collector = health_client
+
+    for path in ("/api/health", "/api/health/details", "/api/health/details"):
+        assert client.get(path).json["collection"] == 1
+    ready = client.get("/api/health/ready")
+
+    assert collector.calls == 1
+    assert ready.status_code == 503
+    assert ready.json["ready"] is False
+    assert ready.json["snapshot_age_s"] >= 0
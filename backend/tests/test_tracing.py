@@ -0,0 +1,111 @@
+"""
+Tests for per-request tracing
+Nested spans, Server-Timing header values, and the NDJSON record written to
+this process's trace log (plus debug_timings when the client opts in)
+"""
+import json
+import os
+import re
+
+import pytest
+
+from utils import tracing
+from utils.tracing import complete_trace, record_span, server_timing, span, start_trace, traced
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+    monkeypatch.setattr(tracing, "SERVER_TIMING_ENABLED", True)
+
+@traced("chroma.search")
+def _search():
+    with span("chroma.query"):
+        pass
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+def _run_request(debug=False):
+    trace = start_trace("POST /api/chat", debug=debug)
+    with span("faq_search"):
+        _search()
+    for _ in range(2):
+        with span("llm"):
+            pass
+    return trace
+
+def test_spans_nest_under_the_enclosing_stage(trace_log):
+    trace = _run_request()
+
+    spans = {s["name"]: s for s in trace.spans}
+    assert spans["chroma.query"]["parent"] == "chroma.search"
+    assert spans["chroma.search"]["parent"] == "faq_search"
+    assert "parent" not in spans["faq_search"]
+    assert list(trace.stage_totals()) == ["faq_search", "llm"]
+    tracing.finish_trace(trace)
+
+def test_server_timing_lists_top_level_stages_then_the_total(trace_log):
+    trace = _run_request()
+
+    header = server_timing(trace)
+
+    assert re.fullmatch(r"faq_search;dur=[\d.]+, llm;dur=[\d.]+, total;dur=[\d.]+", header)
+    llm = [s["duration_ms"] for s in trace.spans if s["name"] == "llm"]
+    assert f"llm;dur={round(sum(llm), 3)}" in header
+    tracing.finish_trace(trace)
+
+def test_complete_trace_writes_one_ndjson_record_and_returns_the_header(trace_log):
+    trace = _run_request()
+    payload = {"response": "...", "source": "faq", "session_id": "s-1"}
+
+    headers = complete_trace(trace, payload, 200)
+
+    assert list(headers) == ["Server-Timing"]
+    assert headers["Server-Timing"].startswith("faq_search;dur=")
+    assert "debug_timings" not in payload
+    [record] = _records(tracing.trace_log_path())
+    assert tracing.trace_log_path().name == f"chat_traces.{os.getpid()}.ndjson"
+    assert tracing.trace_log_path().parent == trace_log.parent
+    assert (record["trace_id"], record["name"]) == (trace.trace_id, "POST /api/chat")
+    assert (record["status"], record["source"], record["session"]) == (200, "faq", "s-1")
+    assert [s["name"] for s in record["spans"]] == ["chroma.query", "chroma.search", "faq_search", "llm", "llm"]
+    assert tracing.current_trace() is None
+
+def test_debug_request_gets_the_trace_in_the_body(trace_log):
+    trace = _run_request(debug=True)
+    payload = {"response": "...", "source": "rag"}
+
+    complete_trace(trace, payload, 200)
+
+    assert payload["debug_timings"] == _records(tracing.trace_log_path())[0]
+
+def test_failed_span_is_marked_and_record_span_uses_the_current_parent(trace_log):
+    trace = start_trace("POST /api/chat")
+    with pytest.raises(RuntimeError):
+        with span("llm"):
+            record_span("llm.queue_wait", tracing.time.perf_counter())
+            raise RuntimeError("upstream down")
+
+    complete_trace(trace, None, 500)
+
+    [record] = _records(tracing.trace_log_path())
+    assert record["spans"][0] == {**record["spans"][0], "name": "llm.queue_wait", "parent": "llm"}
+    assert record["spans"][1]["error"] is True
+    assert record["status"] == 500
+
+def test_server_timing_can_be_disabled_without_losing_the_record(trace_log, monkeypatch):
+    monkeypatch.setattr(tracing, "SERVER_TIMING_ENABLED", False)
+
+    assert complete_trace(_run_request(), {"source": "faq"}, 200) == {}
+    assert len(_records(tracing.trace_log_path())) == 1
+
+def test_no_trace_when_disabled(trace_log, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+
+    trace = start_trace("POST /api/chat")
+    with span("faq_search"):
+        _search()
+
+    assert trace is None
+    assert complete_trace(trace, {"source": "faq"}, 200) == {}
+    assert not trace_log.parent.exists()
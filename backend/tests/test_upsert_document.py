@@ -0,0 +1,96 @@
+"""
+Tests for ChromaDBManager.upsert_document
+Chunk diffing by content hash (added/kept/removed), repeated identical chunks,
+re-chunking with a different chunker, and one version bump per upsert
+"""
+TITLE = "Quy chế đào tạo"
+
+def _paragraph(i, edit=""):
+    # About one semantic chunk (target 120 tokens) per paragraph
+    return " ".join(f"quy định {i} điều {j}{edit}" for j in range(32))
+
+def _document(*paragraphs):
+    return "\n\n".join(paragraphs)
+
+def _stored(manager, title=TITLE):
+    stored = manager.knowledge_collection.get(where={"original_title": title}, include=["metadatas", "embeddings"])
+    rows = sorted(zip(stored["ids"], stored["metadatas"], stored["embeddings"]), key=lambda row: row[1]["chunk_index"])
+    return [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows]
+
+def _version(manager):
+    return manager._collection_versions["knowledge"].read()
+
+def test_first_upsert_adds_every_chunk(manager):
+    result = manager.upsert_document(TITLE, _document(*(_paragraph(i) for i in range(4))))
+
+    assert (result["added"], result["kept"], result["removed"]) == (4, 0, 0)
+    ids, metadatas, _ = _stored(manager)
+    assert ids == result["chunk_ids"]
+    assert [m["total_chunks"] for m in metadatas] == [4] * 4
+
+def test_edit_replaces_only_the_changed_chunk_with_one_version_bump(manager):
+    first = manager.upsert_document(TITLE, _document(*(_paragraph(i) for i in range(4))))
+    _, _, embeddings_before = _stored(manager)
+    version = _version(manager)
+
+    result = manager.upsert_document(TITLE, _document(*(_paragraph(i, "a" if i == 2 else "") for i in range(4))))
+
+    assert (result["added"], result["kept"], result["removed"]) == (1, 3, 1)
+    assert _version(manager) == version + 1
+    ids, metadatas, embeddings = _stored(manager)
+    assert ids == result["chunk_ids"]
+    assert [ids[i] for i in (0, 1, 3)] == [first["chunk_ids"][i] for i in (0, 1, 3)]
+    assert ids[2] != first["chunk_ids"][2]
+    assert "điều 0a" in metadatas[2]["content"]
+    # Kept chunks are not re-embedded
+    for i in (0, 1, 3):
+        assert list(embeddings[i]) == list(embeddings_before[i])
+
+def test_moved_chunk_is_kept_with_its_new_position(manager):
+    first = manager.upsert_document(TITLE, _document(_paragraph(0), _paragraph(1), _paragraph(2)))
+
+    result = manager.upsert_document(TITLE, _document(_paragraph(2), _paragraph(0), _paragraph(1)))
+
+    assert (result["added"], result["kept"], result["removed"]) == (0, 3, 0)
+    assert result["chunk_ids"] == [first["chunk_ids"][i] for i in (2, 0, 1)]
+    _, metadatas, _ = _stored(manager)
+    assert metadatas[0]["title"] == f"{TITLE} (Part 1/3)"
+    assert "quy định 2 " in metadatas[0]["content"]
+
+def test_repeated_identical_chunks_each_get_their_own_id(manager):
+    content = _document(_paragraph(0), _paragraph(1), _paragraph(0))
+
+    first = manager.upsert_document(TITLE, content)
+    again = manager.upsert_document(TITLE, content)
+
+    assert (first["added"], first["kept"], first["removed"]) == (3, 0, 0)
+    assert len(set(first["chunk_ids"])) == 3
+    assert (again["added"], again["kept"], again["removed"]) == (0, 3, 0)
+    assert sorted(again["chunk_ids"]) == sorted(first["chunk_ids"])
+
+    fewer = manager.upsert_document(TITLE, _document(_paragraph(0), _paragraph(1)))
+
+    assert (fewer["added"], fewer["kept"], fewer["removed"]) == (0, 2, 1)
+    assert len(_stored(manager)[0]) == 2
+
+def test_rechunking_fixed_to_semantic_replaces_every_chunk(manager):
+    content = _document(*(_paragraph(i) for i in range(4)))
+    fixed = manager.upsert_document(TITLE, content, chunk_size=500, chunk_overlap=100, chunker="fixed")
+    version = _version(manager)
+
+    semantic = manager.upsert_document(TITLE, content, chunker="semantic")
+
+    assert (semantic["added"], semantic["kept"], semantic["removed"]) == (4, 0, len(fixed["chunk_ids"]))
+    assert _version(manager) == version + 1
+    ids, metadatas, _ = _stored(manager)
+    assert ids == semantic["chunk_ids"]
+    assert not set(ids) & set(fixed["chunk_ids"])
+    assert [m["content"] for m in metadatas] == [_paragraph(i) for i in range(4)]
+
+def test_other_documents_are_untouched(manager):
+    other = manager.upsert_document("Học bổng", _document(_paragraph(9)))
+
+    manager.upsert_document(TITLE, _document(_paragraph(0)))
+    manager.upsert_document(TITLE, _document(_paragraph(1)))
+
+    assert _stored(manager, "Học bổng")[0] == other["chunk_ids"]
@@ -0,0 +1,195 @@
+"""
+Tests for the vector store backends
+FlatVectorStore add/update/delete/compact/reopen, and ChromaVectorStore
+compaction by copy-and-swap seen from a second handle and with writes
+landing between batches
+"""
+import threading
+
+import numpy as np
+import pytest
+
+from process_lock import SharedCounter
+from vector_store import ChromaVectorStore, FlatVectorStore
+
+DIM = 8
+
+def _vectors(count, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, DIM)).astype(np.float32)
+
+def _fill(store, count, seed=0):
+    vectors = _vectors(count, seed)
+    ids = [f"doc-{i}" for i in range(count)]
+    store.add(
+        ids=ids,
+        documents=[f"nội dung {i}" for i in range(count)],
+        metadatas=[{"n": i, "category": "even" if i % 2 == 0 else "odd"} for i in range(count)],
+        embeddings=vectors.tolist()
+    )
+    return ids, vectors
+
+@pytest.fixture
+def flat_store(tmp_path):
+    return FlatVectorStore(tmp_path, "knowledge")
+
+def test_flat_query_returns_exact_top_k(flat_store):
+    _, vectors = _fill(flat_store, 20)
+    query = vectors[3] + 0.01
+
+    result = flat_store.query(query_embeddings=[query.tolist()], n_results=5)
+
+    expected = np.sum((vectors - query) ** 2, axis=1)
+    order = np.argsort(expected)[:5]
+    assert result["ids"][0] == [f"doc-{i}" for i in order]
+    assert result["distances"][0] == pytest.approx(expected[order].tolist(), rel=1e-4, abs=1e-5)
+    assert result["documents"][0][0] == "nội dung 3"
+
+def test_flat_add_rejects_existing_id(flat_store):
+    _fill(flat_store, 3)
+    with pytest.raises(ValueError):
+        flat_store.add(ids=["doc-1"], documents=["x"], metadatas=[{}], embeddings=_vectors(1).tolist())
+
+def test_flat_update_and_delete(flat_store):
+    ids, vectors = _fill(flat_store, 6)
+
+    flat_store.update(ids=["doc-2"], metadatas=[{"n": 2, "category": "edited"}])
+    flat_store.delete(ids=["doc-0"])
+    flat_store.delete(where={"category": "odd"})
+
+    assert flat_store.count() == 2
+    result = flat_store.get(include=["metadatas", "embeddings"])
+    assert result["ids"] == ["doc-2", "doc-4"]
+    assert result["metadatas"][0]["category"] == "edited"
+    assert result["embeddings"][0] == pytest.approx(vectors[2].tolist())
+    hits = flat_store.query(query_embeddings=[vectors[1].tolist()], n_results=10)
+    assert sorted(hits["ids"][0]) == ["doc-2", "doc-4"]
+
+def test_flat_where_filters(flat_store):
+    _fill(flat_store, 10)
+
+    assert flat_store.get(where={"n": {"$gte": 7}})["ids"] == ["doc-7", "doc-8", "doc-9"]
+    assert flat_store.get(where={"$and": [{"category": "even"}, {"n": {"$in": [2, 3, 4]}}]})["ids"] == ["doc-2", "doc-4"]
+    hits = flat_store.query(query_embeddings=[_vectors(1, seed=5)[0].tolist()], n_results=10, where={"category": "odd"})
+    assert all(metadata["category"] == "odd" for metadata in hits["metadatas"][0])
+    assert len(hits["ids"][0]) == 5
+
+def test_flat_compact_keeps_live_records_and_survives_reopen(tmp_path):
+    store = FlatVectorStore(tmp_path, "knowledge")
+    ids, vectors = _fill(store, 12)
+    store.delete(ids=ids[:4])
+    replacement = _vectors(1, seed=9)[0]
+    store.update(ids=["doc-5"], embeddings=[replacement.tolist()])
+    size_before = store.vectors_path.stat().st_size
+
+    store.compact()
+
+    live = ids[4:]
+    assert store.vectors_path.stat().st_size == len(live) * DIM * 4 < size_before
+    assert len(store.records_path.read_text(encoding="utf-8").splitlines()) == 1
+
+    reopened = FlatVectorStore(tmp_path, "knowledge")
+    assert reopened.count() == len(live)
+    result = reopened.get(include=["documents", "metadatas", "embeddings"])
+    assert result["ids"] == live
+    assert result["documents"][0] == "nội dung 4"
+    assert result["embeddings"][1] == pytest.approx(replacement.tolist())
+    assert result["embeddings"][2] == pytest.approx(vectors[6].tolist())
+    top = reopened.query(query_embeddings=[vectors[8].tolist()], n_results=1)
+    assert top["ids"][0] == ["doc-8"]
+    assert top["distances"][0][0] == pytest.approx(0.0, abs=1e-5)
+
+def test_flat_second_handle_sees_appends_and_compaction(tmp_path):
+    writer = FlatVectorStore(tmp_path, "knowledge")
+    reader = FlatVectorStore(tmp_path, "knowledge")
+    ids, vectors = _fill(writer, 5)
+
+    assert reader.count() == 5
+    writer.delete(ids=ids[:2])
+    writer.compact()
+    writer.add(ids=["doc-new"], documents=["mới"], metadatas=[{}], embeddings=_vectors(1, seed=3).tolist())
+
+    assert reader.get()["ids"] == ids[2:] + ["doc-new"]
+    assert reader.query(query_embeddings=[vectors[4].tolist()], n_results=1)["ids"][0] == ["doc-4"]
+
+def test_flat_query_on_empty_store(flat_store):
+    result = flat_store.query(query_embeddings=[_vectors(1)[0].tolist()], n_results=3)
+    assert result["ids"] == [[]]
+    assert result["distances"] == [[]]
+
+@pytest.fixture
+def chroma_client(tmp_path):
+    chromadb = pytest.importorskip("chromadb")
+    return chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+
+def test_chroma_compact_switches_every_handle_to_the_new_generation(tmp_path, chroma_client):
+    counter_path = tmp_path / "queries.generation"
+    worker_a = ChromaVectorStore(chroma_client, "queries", generation=SharedCounter(counter_path))
+    worker_b = ChromaVectorStore(chroma_client, "queries", generation=SharedCounter(counter_path))
+    ids, vectors = _fill(worker_a, 6)
+    worker_a.delete(ids=ids[:2])
+
+    worker_a.compact(batch_size=3)
+
+    assert SharedCounter(counter_path).read() == 1
+    assert [c.name for c in chroma_client.list_collections()] == ["queries-g1"]
+    # The handle that did not compact follows the counter instead of writing to the dropped collection
+    worker_b.add(ids=["doc-new"], documents=["mới"], metadatas=[{"n": 99}], embeddings=_vectors(1, seed=3).tolist())
+    assert worker_a.count() == 5
+    assert sorted(worker_b.get()["ids"]) == sorted(ids[2:] + ["doc-new"])
+    hit = worker_b.query(query_embeddings=[vectors[3].tolist()], n_results=1)
+    assert hit["ids"][0] == ["doc-3"]
+
+def test_chroma_compact_with_a_lock_copies_writes_made_between_batches(tmp_path, chroma_client):
+    store = ChromaVectorStore(chroma_client, "queries", generation=SharedCounter(tmp_path / "queries.generation"))
+    ids, _ = _fill(store, 6)
+    copy = store._copy
+    batches = []
+
+    def copy_then_write(target, records):
+        copy(target, records)
+        batches.append(records['ids'])
+        if len(batches) == 1:
+            # Another worker writes while the lock is released between batches
+            store.update(ids=[records['ids'][0]], metadatas=[{"n": 100}])
+            store.add(ids=["doc-new"], documents=["mới"], metadatas=[{"n": 101}], embeddings=_vectors(1, seed=3).tolist())
+    store._copy = copy_then_write
+
+    store.compact(lock=threading.RLock(), changed={"n": {"$gte": 100}}, batch_size=2)
+
+    assert len(batches) == 4  # three batches plus the catch-up
+    assert store.generation.read() == 1
+    assert sorted(store.get()["ids"]) == sorted(ids + ["doc-new"])
+    assert store.get(ids=[batches[0][0]], include=["metadatas"])["metadatas"][0]["n"] == 100
+
+def test_chroma_compact_with_a_lock_needs_a_changed_filter(tmp_path, chroma_client):
+    store = ChromaVectorStore(chroma_client, "queries", generation=SharedCounter(tmp_path / "queries.generation"))
+    with pytest.raises(ValueError):
+        store.compact(lock=threading.RLock())
+
+def test_chroma_failed_compaction_keeps_the_old_collection(tmp_path, chroma_client):
+    store = ChromaVectorStore(chroma_client, "queries", generation=SharedCounter(tmp_path / "queries.generation"))
+    _fill(store, 4)
+    open_collection = store._open_collection
+
+    class FailingTarget:
+        def __init__(self, collection):
+            self.collection = collection
+
+        def upsert(self, **kwargs):
+            raise RuntimeError("disk full")
+
+        def __getattr__(self, name):
+            return getattr(self.collection, name)
+    store._open_collection = lambda generation: FailingTarget(open_collection(generation))
+
+    with pytest.raises(RuntimeError):
+        store.compact()
+
+    assert store.generation.read() == 0
+    assert [c.name for c in chroma_client.list_collections()] == ["queries"]
+    assert store.count() == 4
+
+def test_chroma_compact_requires_a_generation_counter(chroma_client):
+    store = ChromaVectorStore(chroma_client, "queries")
+    with pytest.raises(ValueError):
+        store.compact()
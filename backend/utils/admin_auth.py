@@ -0,0 +1,31 @@
+"""
+Bearer-token guard for operational endpoints (profiler)
+
+Disabled unless ADMIN_TOKEN is set: without a token every admin request is
+refused, so the endpoints are never open by accident.
+"""
+import functools
+import hmac
+from typing import Optional
+
+from flask import request, jsonify
+
+from config import ADMIN_TOKEN
+
+def admin_authorized(authorization: Optional[str]) -> bool:
+    """Check an Authorization header value ("Bearer <ADMIN_TOKEN>")"""
+    if not ADMIN_TOKEN or not authorization:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip(), ADMIN_TOKEN)
+
+def require_admin(view):
+    """Flask view decorator: 404 when admin endpoints are disabled, 401 without a valid token"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Not found'}), 404
+        if not admin_authorized(request.headers.get('Authorization')):
+            return jsonify({'error': 'Unauthorized'}), 401
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,205 @@
+"""
+Admission control for LLM calls
+Global concurrency limit, bounded FIFO wait queue with timeout and per-session
+rate limits, usable from Flask threads and from the asyncio (ASGI) chat route
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, Optional
+import logging
+
+from config import (
+    LLM_MAX_CONCURRENCY, LLM_QUEUE_MAX, LLM_QUEUE_TIMEOUT_S,
+    SESSION_RATE_LIMIT_PER_MIN, SESSION_RATE_BURST
+)
+
+logger = logging.getLogger(__name__)
+
+class AdmissionRejected(Exception):
+    """Raised when an LLM-bound request is shed"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason  # "queue_full", "queue_timeout" or "rate_limited"
+
+class _ThreadWaiter:
+    def __init__(self):
+        self.event = threading.Event()
+
+    def grant(self):
+        self.event.set()
+
+class _AsyncWaiter:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+
+    def grant(self):
+        self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+class SessionRateLimiter:
+    """Token bucket per session: `burst` requests at once, refilled at rate_per_min"""
+
+    def __init__(self, rate_per_min: float, burst: int, max_sessions: int = 10000):
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self.max_sessions = max_sessions
+        self._buckets: Dict[str, tuple] = {}  # session_id -> (tokens, last update)
+        self._lock = threading.Lock()
+
+    def allow(self, session_id: str) -> bool:
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(session_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[session_id] = (tokens, now)
+            if len(self._buckets) > self.max_sessions:
+                self._prune(now)
+            return allowed
+
+    def _prune(self, now: float):
+        """Drop sessions whose bucket has refilled completely"""
+        full_after = self.burst / self.rate
+        self._buckets = {
+            session_id: bucket for session_id, bucket in self._buckets.items()
+            if now - bucket[1] < full_after
+        }
+
+class LLMAdmission:
+    """
+    At most max_concurrent LLM-bound requests run at once; up to max_queue more
+    wait in FIFO order for at most queue_timeout seconds. Anything beyond that is
+    rejected immediately so the caller can answer with a degraded response.
+    FAQ answers never pass through here, so they never wait behind LLM calls.
+    """
+
+    def __init__(self, max_concurrent: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_QUEUE_MAX,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT_S,
+                 rate_per_min: float = SESSION_RATE_LIMIT_PER_MIN, burst: int = SESSION_RATE_BURST):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate_limiter = SessionRateLimiter(rate_per_min, burst)
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters = deque()
+        self._counters = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "rejected_rate_limited": 0
+        }
+
+    def _try_enter(self, session_id: str, waiter_factory):
+        """Return None if a slot was taken right away, else the queued waiter"""
+        if not self.rate_limiter.allow(session_id):
+            with self._lock:
+                self._counters["rejected_rate_limited"] += 1
+            raise AdmissionRejected("rate_limited")
+
+        with self._lock:
+            if self._in_flight < self.max_concurrent and not self._waiters:
+                self._in_flight += 1
+                self._counters["admitted"] += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                self._counters["rejected_queue_full"] += 1
+                raise AdmissionRejected("queue_full")
+            waiter = waiter_factory()
+            self._waiters.append(waiter)
+            self._counters["queued"] += 1
+            return waiter
+
+    def _abandon(self, waiter, counter: Optional[str] = "rejected_queue_timeout") -> bool:
+        """Give up waiting; False if the slot was handed over in the meantime"""
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                self._counters["admitted"] += 1
+                return False
+            if counter:
+                self._counters[counter] += 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            if self._waiters:
+                # Hand the slot straight to the oldest waiter (in_flight unchanged)
+                self._waiters.popleft().grant()
+            else:
+                self._in_flight -= 1
+
+    def _granted(self):
+        with self._lock:
+            self._counters["admitted"] += 1
+
+    @contextmanager
+    def slot(self, session_id: str, timeout: Optional[float] = None):
+        """Hold an LLM slot (blocking, for Flask threads)"""
+        waiter = self._try_enter(session_id, _ThreadWaiter)
+        if waiter is not None:
+            if waiter.event.wait(self.queue_timeout if timeout is None else timeout):
+                self._granted()
+            elif self._abandon(waiter):
+                raise AdmissionRejected("queue_timeout")
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def async_slot(self, session_id: str, timeout: Optional[float] = None):
+        """Hold an LLM slot (awaitable, for the ASGI chat route)"""
+        loop = asyncio.get_running_loop()
+        waiter = self._try_enter(session_id, lambda: _AsyncWaiter(loop))
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout if timeout is None else timeout)
+                self._granted()
+            except asyncio.TimeoutError:
+                if self._abandon(waiter):
+                    raise AdmissionRejected("queue_timeout")
+            except asyncio.CancelledError:
+                # Client went away while queued; pass on a slot granted meanwhile
+                if not self._abandon(waiter, counter=None):
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "queue_length": len(self._waiters),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                **self._counters
+            }
+
+# Singleton instance
+_llm_admission = None
+
+def get_llm_admission() -> LLMAdmission:
+    """Get singleton LLM admission controller"""
+    global _llm_admission
+    if _llm_admission is None:
+        _llm_admission = LLMAdmission()
+    return _llm_admission
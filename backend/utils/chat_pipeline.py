@@ -0,0 +1,321 @@
+"""
+Chat pipeline steps shared by the Flask chat route and the async (ASGI) chat route
+"""
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import json
+import logging
+
+from utils.rag_utils import SYSTEM_PROMPT_BASE, retrieve_knowledge_items, format_knowledge_context, augment_system_prompt
+from utils.openai_functions import FUNCTION_MAP
+from utils.extractive_answer import extract_answer, format_extractive_answer
+from config import (
+    RAG_TOP_K, RAG_RELEVANCE_THRESHOLD,
+    FAQ_TOP_K, FAQ_SIMILARITY_THRESHOLD, FAQ_CONFIDENCE_THRESHOLD,
+    EXTRACTIVE_ANSWER_ENABLED, EXTRACTIVE_MAX_PASSAGES, EXTRACTIVE_MIN_SCORE
+)
+
+logger = logging.getLogger(__name__)
+
+# Store conversation history (in production, use a proper database)
+conversation_history = {}
+
+def find_faq_answer(chroma_db, user_message: str, hits: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Step 1: Look for an FAQ similar enough to answer directly
+
+    Args:
+        hits (Optional[Dict]): Request's retrieval results; the FAQ candidates are kept under "faqs"
+
+    Returns:
+        Optional[Dict]: Best FAQ (question, answer, category, similarity) or None
+    """
+    similar_faqs = chroma_db.search_similar_faqs(
+        user_message,
+        top_k=FAQ_TOP_K,
+        similarity_threshold=FAQ_SIMILARITY_THRESHOLD
+    )
+    if hits is not None:
+        hits["faqs"] = similar_faqs["faqs"]
+
+    if similar_faqs["found_matches"] and len(similar_faqs["faqs"]) > 0:
+        best_faq = similar_faqs["faqs"][0]
+        logger.info(f"Found FAQ match with confidence: {best_faq['similarity']:.3f}")
+        if best_faq["similarity"] >= FAQ_CONFIDENCE_THRESHOLD:
+            return best_faq
+    return None
+
+def log_faq_answer(chroma_db, conversation_logger, session_id: str, user_message: str, best_faq: Dict[str, Any]):
+    """Log an FAQ answer to the conversation log and the query log"""
+    if conversation_logger:
+        conversation_logger.log_message(session_id, {
+            "role": "user",
+            "content": user_message
+        })
+        conversation_logger.log_message(session_id, {
+            "role": "assistant",
+            "content": best_faq["answer"],
+            "source": "faq",
+            "faq_confidence": best_faq["similarity"]
+        })
+
+    chroma_db.log_user_query(user_message, best_faq["answer"], session_id, "faq")
+
+def faq_response(session_id: str, best_faq: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'response': best_faq["answer"],
+        'source': 'faq',
+        'confidence': best_faq["similarity"],
+        'session_id': session_id,
+        'timestamp': datetime.now().isoformat()
+    }
+
+def retrieve_context(chroma_db, user_message: str, hits: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Step 2: RAG - Retrieve context from knowledge base ("" if nothing relevant)
+
+    Args:
+        hits (Optional[Dict]): Request's retrieval results; the relevant chunks are kept under "knowledge"
+    """
+    knowledge_items = retrieve_knowledge_items(
+        chroma_db,
+        user_message,
+        top_k=RAG_TOP_K,
+        relevance_threshold=RAG_RELEVANCE_THRESHOLD
+    )
+    if hits is not None:
+        hits["knowledge"] = knowledge_items
+    retrieved_context = format_knowledge_context(chroma_db, knowledge_items)
+    if retrieved_context:
+        logger.info("Retrieved context from knowledge base for RAG")
+    return retrieved_context
+
+def prepare_messages(session_id: str, user_message: str, retrieved_context: str) -> List[Dict[str, Any]]:
+    """
+    Step 3: Get or create conversation history with augmented prompt and append the user message
+
+    Returns:
+        List[Dict]: Messages to send to the LLM (the session's history list)
+    """
+    if session_id not in conversation_history:
+        augmented_prompt = augment_system_prompt(SYSTEM_PROMPT_BASE, retrieved_context)
+        conversation_history[session_id] = [
+            {"role": "system", "content": augmented_prompt}
+        ]
+    else:
+        # Update system prompt with new context if available
+        if retrieved_context:
+            augmented_prompt = augment_system_prompt(SYSTEM_PROMPT_BASE, retrieved_context)
+            conversation_history[session_id][0] = {"role": "system", "content": augmented_prompt}
+
+    # Add user message to history
+    conversation_history[session_id].append({
+        "role": "user",
+        "content": user_message
+    })
+    return conversation_history[session_id]
+
+def fallback_response(conversation_logger, session_id: str, user_message: str) -> Dict[str, Any]:
+    """Demo answer used when the LLM is unavailable"""
+    fallback_message = f'Xin chào! Tôi là trợ lý ảo của trường đại học. Bạn đã gửi: "{user_message}". Hiện tại tôi đang trong chế độ demo. Vui lòng cấu hình API key để sử dụng đầy đủ tính năng.'
+
+    if conversation_logger:
+        conversation_logger.log_message(session_id, {
+            "role": "user",
+            "content": user_message
+        })
+        conversation_logger.log_message(session_id, {
+            "role": "assistant",
+            "content": fallback_message,
+            "source": "demo"
+        })
+
+    return {
+        'response': fallback_message,
+        'source': 'demo',
+        'session_id': session_id,
+        'timestamp': datetime.now().isoformat()
+    }
+
+DEGRADED_MESSAGES = {
+    "rate_limited": "⏳ Bạn đang gửi tin nhắn quá nhanh. Vui lòng chờ một chút rồi hỏi lại nhé.",
+    "busy": "⚠️ Hệ thống đang có rất nhiều sinh viên truy cập nên tôi chưa thể trả lời chi tiết ngay. Vui lòng thử lại sau ít phút."
+}
+
+def degraded_response(conversation_logger, session_id: str, user_message: str,
+                      retrieved_context: str, reason: str) -> Dict[str, Any]:
+    """
+    Answer without the LLM when the request is shed by admission control:
+    the knowledge base excerpt if one was retrieved, otherwise a busy message
+    """
+    if reason == "rate_limited":
+        message = DEGRADED_MESSAGES["rate_limited"]
+    elif retrieved_context:
+        message = f"{DEGRADED_MESSAGES['busy']}\n\nThông tin liên quan tìm được:\n\n{retrieved_context.strip()}"
+    else:
+        message = DEGRADED_MESSAGES["busy"]
+
+    if conversation_logger:
+        conversation_logger.log_message(session_id, {
+            "role": "user",
+            "content": user_message
+        })
+        conversation_logger.log_message(session_id, {
+            "role": "assistant",
+            "content": message,
+            "source": "degraded",
+            "degraded_reason": reason
+        })
+
+    return {
+        'response': message,
+        'source': 'degraded',
+        'session_id': session_id,
+        'timestamp': datetime.now().isoformat()
+    }
+
+EXTRACTIVE_INTRO = "⚠️ Hiện tôi chưa thể trả lời chi tiết. Dưới đây là thông tin liên quan nhất tìm được trong cơ sở dữ liệu của trường:"
+
+def extractive_response(conversation_logger, session_id: str, user_message: str,
+                        hits: Dict[str, Any], reason: str) -> Optional[Dict[str, Any]]:
+    """
+    Answer from the best-matching knowledge base sentences and FAQ near-misses,
+    without the LLM. Only uses what steps 1-2 already retrieved for this request:
+    no search is repeated, so a request that skipped RAG for its deadline is
+    answered from the FAQ candidates alone.
+
+    Args:
+        hits (Dict): "faqs" from find_faq_answer and "knowledge" from retrieve_context (either may be missing)
+
+    Returns:
+        Optional[Dict]: Response with source "extractive", or None if nothing relevant was found
+    """
+    knowledge_items = hits.get("knowledge") or []
+    faq_candidates = hits.get("faqs") or []
+    if not EXTRACTIVE_ANSWER_ENABLED or not (knowledge_items or faq_candidates):
+        return None
+    try:
+        extracted = extract_answer(user_message, knowledge_items, faq_candidates,
+                                   max_passages=EXTRACTIVE_MAX_PASSAGES, min_score=EXTRACTIVE_MIN_SCORE)
+    except Exception as extract_error:
+        logger.warning(f"Extractive answer failed: {extract_error}")
+        return None
+    if not extracted:
+        return None
+
+    intro = DEGRADED_MESSAGES["busy"] if reason in ("queue_full", "queue_timeout") else EXTRACTIVE_INTRO
+    message = format_extractive_answer(extracted, intro)
+    logger.info(f"Extractive answer ({reason}) from {len(extracted['passages'])} passages in {extracted['elapsed_ms']}ms")
+
+    if conversation_logger:
+        conversation_logger.log_message(session_id, {
+            "role": "user",
+            "content": user_message
+        })
+        conversation_logger.log_message(session_id, {
+            "role": "assistant",
+            "content": message,
+            "source": "extractive",
+            "fallback_reason": reason
+        })
+
+    return {
+        'response': message,
+        'source': 'extractive',
+        'sources': extracted["sources"],
+        'session_id': session_id,
+        'timestamp': datetime.now().isoformat()
+    }
+
+def local_response(conversation_logger, session_id: str, user_message: str,
+                   retrieved_context: str, hits: Dict[str, Any], reason: str) -> Dict[str, Any]:
+    """
+    Answer without the LLM, from the request's own retrieval results
+
+    Args:
+        hits (Dict): Retrieval results of steps 1-2 (see extractive_response)
+        reason (str): "circuit_open", "llm_error" or "deadline" (LLM unavailable), or an
+            AdmissionRejected reason ("queue_full", "queue_timeout", "rate_limited")
+
+    Returns:
+        Dict: Extractive answer when one is found, otherwise the degraded
+        (load shedding) or demo (LLM unavailable) message
+    """
+    if reason != "rate_limited":
+        extracted = extractive_response(conversation_logger, session_id, user_message, hits, reason)
+        if extracted:
+            return extracted
+    if reason in ("circuit_open", "llm_error", "deadline"):
+        return fallback_response(conversation_logger, session_id, user_message)
+    return degraded_response(conversation_logger, session_id, user_message, retrieved_context, reason)
+
+def execute_function_call(session_id: str, function_call) -> str:
+    """Run a function requested by the LLM, add its result to the conversation and return it"""
+    function_name = function_call.name
+    function_args = json.loads(function_call.arguments)
+
+    logger.info(f"Executing function: {function_name} with args: {function_args}")
+
+    # Call the appropriate function
+    if function_name in FUNCTION_MAP:
+        result = FUNCTION_MAP[function_name](**function_args)
+    else:
+        result = "Xin lỗi, tôi không thể xử lý yêu cầu này."
+
+    conversation_history[session_id].append({
+        "role": "function",
+        "name": function_name,
+        "content": str(result)
+    })
+    return str(result)
+
+def log_exchange(chroma_db, conversation_logger, session_id: str, user_message: str,
+                 assistant_message: str, response_source: str, rag_used: bool):
+    """Add the answer to history and log it to the conversation log and the query log"""
+    conversation_history[session_id].append({
+        "role": "assistant",
+        "content": assistant_message
+    })
+
+    if conversation_logger:
+        try:
+            conversation_logger.log_message(session_id, {
+                "role": "user",
+                "content": user_message
+            })
+            log_data = {
+                "role": "assistant",
+                "content": assistant_message,
+                "source": response_source
+            }
+            if rag_used:
+                log_data["rag_used"] = True
+            conversation_logger.log_message(session_id, log_data)
+        except Exception as log_error:
+            logger.warning(f"Conversation logging failed: {log_error}")
+
+    # Log to ChromaDB for future FAQ matching
+    if chroma_db:
+        try:
+            chroma_db.log_user_query(user_message, assistant_message, session_id, response_source)
+        except Exception as chroma_error:
+            logger.warning(f"ChromaDB logging failed: {chroma_error}")
+
+def chat_response(session_id: str, assistant_message: str, response_source: str) -> Dict[str, Any]:
+    return {
+        'response': assistant_message,
+        'source': response_source,
+        'session_id': session_id,
+        'timestamp': datetime.now().isoformat()
+    }
+
+def with_skipped_stages(payload: Dict[str, Any], deadline) -> Dict[str, Any]:
+    """Report the pipeline stages skipped to meet the request deadline"""
+    payload['skipped_stages'] = list(deadline.skipped_stages)
+    return payload
+
+def error_response(data) -> Dict[str, Any]:
+    return {
+        'error': 'Có lỗi xảy ra khi xử lý yêu cầu của bạn. Vui lòng thử lại.',
+        'session_id': data.get('session_id', 'default') if isinstance(data, dict) else 'default'
+    }
@@ -0,0 +1,154 @@
+"""
+Document chunkers for the knowledge base
+
+"fixed" is the original splitter: chunk_size characters with chunk_overlap
+characters repeated between neighbours. "semantic" cuts at paragraph, heading
+and sentence boundaries and sizes chunks in tokens, without overlap. It is a
+generator over the input lines, so it only ever holds the chunk being built.
+
+Token counts are estimates (words plus punctuation marks); the embedding
+model's wordpiece count is higher for Vietnamese, so the default targets keep
+chunks inside EMBEDDING_MAX_SEQ_LENGTH instead of being truncated.
+"""
+import re
+from typing import Iterable, Iterator, List, Union
+
+from config import SEMANTIC_CHUNK_TARGET_TOKENS, SEMANTIC_CHUNK_MAX_TOKENS, SEMANTIC_CHUNK_MIN_TOKENS
+
+CHUNKERS = ("fixed", "semantic")
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_LINE_RE = re.compile(r"[^\n]*\n|[^\n]+$")
+_SENTENCE_RE = re.compile(r".+?(?:[.!?…]+(?=\s|$)|$)\s*", re.DOTALL)
+_WORD_RE = re.compile(r"\S+\s*")
+_ROMAN_HEADING_RE = re.compile(r"^[IVXLC]+\.\s+\S")
+
+def estimate_tokens(text: str) -> int:
+    return len(_TOKEN_RE.findall(text))
+
+def is_heading(line: str) -> bool:
+    """Markdown heading, Roman-numbered section ("II. ...") or an all-caps title line"""
+    stripped = line.strip()
+    if not stripped or len(stripped) > 120:
+        return False
+    return stripped.startswith("#") or bool(_ROMAN_HEADING_RE.match(stripped)) or (
+        stripped.isupper() and len(stripped) >= 3
+    )
+
+def iter_fixed_chunks(text: str, chunk_size: int, chunk_overlap: int) -> Iterator[str]:
+    """chunk_size-character windows advancing by chunk_size - chunk_overlap"""
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        yield text[start:end]
+        start = end - chunk_overlap
+        if start >= len(text):
+            break
+
+def _iter_lines(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    if isinstance(source, str):
+        for match in _LINE_RE.finditer(source):
+            yield match.group(0).rstrip("\n")
+    else:
+        for piece in source:
+            for match in _LINE_RE.finditer(piece):
+                yield match.group(0).rstrip("\n")
+
+def _split_oversized(paragraph: str, max_tokens: int) -> Iterator[str]:
+    """Pieces of at most max_tokens: whole sentences where possible, words otherwise"""
+    for match in _SENTENCE_RE.finditer(paragraph):
+        sentence = match.group(0)
+        if estimate_tokens(sentence) <= max_tokens:
+            yield sentence
+            continue
+        words: List[str] = []
+        tokens = 0
+        for word_match in _WORD_RE.finditer(sentence):
+            word = word_match.group(0)
+            word_tokens = estimate_tokens(word)
+            if words and tokens + word_tokens > max_tokens:
+                yield "".join(words)
+                words, tokens = [], 0
+            words.append(word)
+            tokens += word_tokens
+        if words:
+            yield "".join(words)
+
+class _ChunkBuilder:
+    """Accumulates paragraphs (or sentence pieces) into chunks of about target tokens"""
+
+    def __init__(self, target_tokens: int, max_tokens: int, min_tokens: int):
+        self.target_tokens = target_tokens
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self.parts: List[str] = []
+        self.tokens = 0
+
+    def flush(self) -> Iterator[str]:
+        if self.parts:
+            chunk = "\n\n".join(part.strip() for part in self.parts).strip()
+            self.parts, self.tokens = [], 0
+            if chunk:
+                yield chunk
+
+    def add(self, text: str, tokens: int) -> Iterator[str]:
+        if tokens > self.max_tokens:
+            for piece in _split_oversized(text, self.max_tokens):
+                yield from self.add(piece, estimate_tokens(piece))
+            return
+        if self.tokens + tokens > self.max_tokens:
+            yield from self.flush()
+        self.parts.append(text)
+        self.tokens += tokens
+        if self.tokens >= self.target_tokens:
+            yield from self.flush()
+
+    def section_break(self) -> Iterator[str]:
+        """A heading starts a new chunk unless the current one is still tiny"""
+        if self.tokens >= self.min_tokens:
+            yield from self.flush()
+
+def iter_semantic_chunks(source: Union[str, Iterable[str]], target_tokens: int = SEMANTIC_CHUNK_TARGET_TOKENS,
+                         max_tokens: int = SEMANTIC_CHUNK_MAX_TOKENS,
+                         min_tokens: int = SEMANTIC_CHUNK_MIN_TOKENS) -> Iterator[str]:
+    """
+    Chunks cut at paragraph, heading and sentence boundaries
+
+    Args:
+        source: Document text, or an iterable of text pieces (e.g. file lines)
+        target_tokens (int): A chunk is emitted once it reaches this size
+        max_tokens (int): Hard cap; longer paragraphs are split at sentences, then words
+        min_tokens (int): Headings do not start a new chunk before this size
+
+    Yields:
+        str: Chunks in document order; a heading stays with the text that follows it
+    """
+    builder = _ChunkBuilder(target_tokens, max_tokens, min_tokens)
+    paragraph: List[str] = []
+    paragraph_tokens = 0
+    for line in _iter_lines(source):
+        if not line.strip() or is_heading(line):
+            if paragraph:
+                yield from builder.add("\n".join(paragraph), paragraph_tokens)
+                paragraph, paragraph_tokens = [], 0
+            if line.strip():
+                yield from builder.section_break()
+                paragraph, paragraph_tokens = [line], estimate_tokens(line)
+            continue
+        paragraph.append(line)
+        paragraph_tokens += estimate_tokens(line)
+        if paragraph_tokens > max_tokens:
+            # Paragraph without blank lines (e.g. extracted PDF text): do not let it grow unbounded
+            yield from builder.add("\n".join(paragraph), paragraph_tokens)
+            paragraph, paragraph_tokens = [], 0
+    if paragraph:
+        yield from builder.add("\n".join(paragraph), paragraph_tokens)
+    yield from builder.flush()
+
+def iter_chunks(text: str, chunker: str, chunk_size: int, chunk_overlap: int) -> Iterator[str]:
+    """Chunks of text with the named chunker (chunk_size / chunk_overlap apply to "fixed")"""
+    if chunker == "semantic":
+        return iter_semantic_chunks(text)
+    if chunker == "fixed":
+        return iter_fixed_chunks(text, chunk_size, chunk_overlap)
+    raise ValueError(f"Unknown chunker '{chunker}'. Available: {', '.join(CHUNKERS)}")
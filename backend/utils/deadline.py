@@ -0,0 +1,73 @@
+"""
+Per-request deadline shared by every chat pipeline stage
+
+The budget comes from REQUEST_DEADLINE_S or from the X-Request-Deadline header
+(milliseconds the client is willing to wait). Each stage asks whether enough
+budget is left before starting; stages that are skipped are recorded and
+reported in the response as "skipped_stages".
+"""
+import time
+from typing import List, Optional
+import logging
+
+from config import (
+    REQUEST_DEADLINE_S, REQUEST_DEADLINE_MAX_S,
+    DEADLINE_LLM_TOKENS_PER_S, DEADLINE_LLM_OVERHEAD_S, LLM_MAX_TOKENS
+)
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_HEADER = "X-Request-Deadline"
+
+class Deadline:
+    """Absolute (time.monotonic) deadline plus the list of stages skipped to meet it"""
+
+    def __init__(self, budget_s: float = REQUEST_DEADLINE_S):
+        self.budget_s = budget_s
+        self.expires_at = time.monotonic() + budget_s
+        self.skipped_stages: List[str] = []
+
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> "Deadline":
+        """
+        Build a deadline from the X-Request-Deadline header
+
+        Args:
+            value (Optional[str]): Budget in milliseconds; missing or invalid uses REQUEST_DEADLINE_S
+
+        Returns:
+            Deadline: Budget clamped to REQUEST_DEADLINE_MAX_S
+        """
+        budget_s = REQUEST_DEADLINE_S
+        if value:
+            try:
+                budget_s = max(0.0, float(value) / 1000)
+            except ValueError:
+                logger.warning(f"Ignoring invalid {DEADLINE_HEADER} header: {value!r}")
+        return cls(min(budget_s, REQUEST_DEADLINE_MAX_S))
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def allows(self, stage: str, min_budget_s: float) -> bool:
+        """
+        Check whether a stage needing at least min_budget_s should run; if not, record it as skipped
+        """
+        if self.remaining() >= min_budget_s:
+            return True
+        self.skip(stage)
+        return False
+
+    def skip(self, stage: str):
+        logger.info(f"Skipping {stage}: {self.remaining() * 1000:.0f}ms left of {self.budget_s * 1000:.0f}ms")
+        self.skipped_stages.append(stage)
+
+    def wait_budget(self, reserve_s: float, cap_s: float) -> float:
+        """How long a stage may wait (e.g. for an LLM slot) and still leave reserve_s for the work itself"""
+        return max(0.0, min(cap_s, self.remaining() - reserve_s))
+
+    def max_tokens(self) -> int:
+        """Completion length that can be generated in the remaining budget (at least 64 tokens)"""
+        generation_s = self.remaining() - DEADLINE_LLM_OVERHEAD_S
+        return max(64, min(LLM_MAX_TOKENS, int(generation_s * DEADLINE_LLM_TOKENS_PER_S)))
@@ -0,0 +1,106 @@
+"""
+Extractive local answers, used instead of the LLM when it is unavailable
+(circuit breaker open, upstream error, deadline exhausted) or when the request
+is shed by admission control
+
+Sentences from the retrieved knowledge chunks and FAQ near-misses are scored
+against the query: lexical overlap (syllables and syllable bigrams, diacritics
+folded, IDF-weighted over the candidates) times the chunk's embedding relevance
+already computed by retrieval. No extra embedding call is made, so an answer
+takes well under a millisecond for the usual handful of chunks.
+"""
+import math
+import re
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+from utils.retrieval_cache import normalize_query
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?;:])\s+|\n+")
+_TOKEN_RE = re.compile(r"\w+")
+
+# Function words that carry no topic (diacritics folded, as produced by _terms)
+STOPWORDS = {
+    "la", "cua", "va", "co", "cho", "toi", "em", "ban", "minh", "duoc", "khong", "gi", "nao",
+    "thi", "voi", "cac", "nhung", "nay", "do", "o", "tai", "ve", "the", "sao", "a", "oi",
+    "nhe", "vay", "ha", "khi", "mot", "neu", "de", "hay", "hoac", "trong", "tu", "den"
+}
+
+def split_sentences(text: str) -> List[str]:
+    """Split a chunk into sentences / lines, dropping fragments too short to answer anything"""
+    return [s.strip(" -•*\t") for s in _SENTENCE_RE.split(text or "") if len(s.strip()) >= 12]
+
+def _terms(text: str) -> List[str]:
+    """Content syllables plus adjacent-syllable bigrams (Vietnamese words are mostly two syllables)"""
+    tokens = [t for t in _TOKEN_RE.findall(normalize_query(text, fold_diacritics=True)) if t not in STOPWORDS]
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+def extract_answer(query: str, knowledge_items: List[Dict[str, Any]], faq_candidates: List[Dict[str, Any]],
+                   max_passages: int = 3, min_score: float = 0.15) -> Optional[Dict[str, Any]]:
+    """
+    Pick the passages that best answer the query
+
+    Args:
+        query (str): User question
+        knowledge_items (List[Dict]): search_knowledge results (title, content, relevance)
+        faq_candidates (List[Dict]): FAQs below the direct-answer confidence (question, answer, similarity)
+        max_passages (int): Maximum number of passages returned
+        min_score (float): Minimum passage score (0-1)
+
+    Returns:
+        Optional[Dict]: {"passages": [{"title", "text", "score"}], "sources", "elapsed_ms"} or None
+    """
+    started = time.perf_counter()
+    query_terms = set(_terms(query))
+    if not query_terms:
+        return None
+
+    # (title, text, terms used for scoring, embedding relevance of the parent chunk, position)
+    candidates = []
+    for faq in faq_candidates:
+        # An FAQ is matched on its question and answered with its answer
+        candidates.append((faq["question"], faq["answer"], set(_terms(f"{faq['question']} {faq['answer']}")),
+                           faq.get("similarity", 0), len(candidates)))
+    for item in knowledge_items:
+        for sentence in split_sentences(item.get("content", "")):
+            candidates.append((item.get("title", ""), sentence, set(_terms(sentence)),
+                               item.get("relevance", 0), len(candidates)))
+    if not candidates:
+        return None
+
+    document_frequency = Counter(term for _, _, terms, _, _ in candidates for term in terms & query_terms)
+    idf = {term: math.log(1 + len(candidates) / (1 + document_frequency[term])) for term in query_terms}
+    total_weight = sum(idf.values())
+
+    scored = []
+    for title, text, terms, relevance, position in candidates:
+        overlap = sum(idf[term] for term in terms & query_terms) / total_weight
+        score = overlap * (0.5 + 0.5 * max(0.0, min(1.0, relevance)))
+        if score >= min_score:
+            scored.append((score, position, title, text))
+    if not scored:
+        return None
+
+    best = sorted(scored, reverse=True)[:max_passages]
+    # Keep document order so consecutive sentences of a chunk read naturally
+    passages = [
+        {"title": title, "text": text, "score": round(score, 3)}
+        for score, position, title, text in sorted(best, key=lambda passage: passage[1])
+    ]
+    return {
+        "passages": passages,
+        "sources": list(dict.fromkeys(passage["title"] for passage in passages)),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
+
+def format_extractive_answer(extracted: Dict[str, Any], intro: str) -> str:
+    """Render passages grouped by source title below an intro line"""
+    lines = [intro, ""]
+    current_title = None
+    for passage in extracted["passages"]:
+        if passage["title"] != current_title:
+            current_title = passage["title"]
+            lines.append(f"📚 **{current_title}**")
+        lines.append(f"- {passage['text']}")
+    return "\n".join(lines)
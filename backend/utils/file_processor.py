@@ -1,23 +1,15 @@
 """
 File processing utilities for extracting text from various file formats
 """
+import importlib.util
 import io
 import logging
 
 logger = logging.getLogger(__name__)
 
-# File processing imports
-try:
-    import PyPDF2
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
+# File processing libraries are only imported when a file of that type is uploaded
+PDF_AVAILABLE = importlib.util.find_spec("PyPDF2") is not None
+DOCX_AVAILABLE = importlib.util.find_spec("docx") is not None
 
 def allowed_file(filename, allowed_extensions=None):
     """Check if file extension is allowed"""
@@ -30,6 +22,7 @@ def extract_text_from_pdf(file_content):
     """Extract text from PDF file"""
     if not PDF_AVAILABLE:
         raise ImportError("PyPDF2 is not installed. Please install it to process PDF files.")
+    import PyPDF2
     try:
         pdf_file = io.BytesIO(file_content)
         pdf_reader = PyPDF2.PdfReader(pdf_file)
@@ -45,6 +38,7 @@ def extract_text_from_docx(file_content):
     """Extract text from DOCX file"""
     if not DOCX_AVAILABLE:
         raise ImportError("python-docx is not installed. Please install it to process DOCX files.")
+    from docx import Document
     try:
         docx_file = io.BytesIO(file_content)
         doc = Document(docx_file)
@@ -0,0 +1,396 @@
+"""
+Resilient OpenAI chat client
+Sized keep-alive pool, connect/read timeouts, bounded retries with jittered
+backoff inside a per-request deadline, optional hedged requests and a circuit
+breaker that fails fast so callers answer with the local fallback
+"""
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Optional
+import logging
+
+import httpx
+import openai
+
+from utils.tracing import span
+from utils.metrics import LLM_REQUESTS, LLM_LATENCY, LLM_TOKENS, LLM_COMPLETION_TOKENS
+from config import (
+    OPENAI_BASE_URL, LLM_MAX_CONCURRENCY,
+    LLM_POOL_MAX_CONNECTIONS, LLM_POOL_MAX_KEEPALIVE, LLM_KEEPALIVE_EXPIRY_S,
+    LLM_CONNECT_TIMEOUT_S, LLM_READ_TIMEOUT_S, LLM_REQUEST_DEADLINE_S,
+    LLM_MAX_RETRIES, LLM_RETRY_BASE_BACKOFF_S, LLM_RETRY_MAX_BACKOFF_S,
+    LLM_HEDGE_AFTER_S, LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_S
+)
+
+logger = logging.getLogger(__name__)
+
+# Worth another attempt: network errors, timeouts, 429 and 5xx (other 4xx are our own fault)
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open; the LLM is not called at all"""
+
+class LLMDeadlineExceeded(Exception):
+    """No time left in the request deadline for another attempt"""
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_READ_TIMEOUT_S, connect=LLM_CONNECT_TIMEOUT_S)
+
+def _limits(max_connections: int, max_keepalive: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY_S
+    )
+
+def build_openai_client(api_key: str, max_connections: int = LLM_POOL_MAX_CONNECTIONS,
+                        max_keepalive: int = LLM_POOL_MAX_KEEPALIVE) -> openai.OpenAI:
+    """Sync OpenAI client with an explicit pool and timeouts (retries are done by ResilientChatClient)"""
+    return openai.OpenAI(
+        api_key=api_key,
+        base_url=OPENAI_BASE_URL,
+        max_retries=0,
+        timeout=_timeout(),
+        http_client=openai.DefaultHttpxClient(limits=_limits(max_connections, max_keepalive), timeout=_timeout())
+    )
+
+def build_async_openai_client(api_key: str, max_connections: int = LLM_POOL_MAX_CONNECTIONS,
+                              max_keepalive: int = LLM_POOL_MAX_KEEPALIVE) -> openai.AsyncOpenAI:
+    """Async counterpart of build_openai_client"""
+    return openai.AsyncOpenAI(
+        api_key=api_key,
+        base_url=OPENAI_BASE_URL,
+        max_retries=0,
+        timeout=_timeout(),
+        http_client=openai.DefaultAsyncHttpxClient(limits=_limits(max_connections, max_keepalive), timeout=_timeout())
+    )
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failed attempts;
+    open -> half_open after `reset_timeout` seconds, letting one probe through;
+    half_open -> closed on success, back to open on failure
+
+    The probe is owned by the call that was let through; release_probe() frees
+    it if that call ends without recording an outcome (e.g. it was cancelled).
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET_S):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_owner = None
+        self._times_opened = 0
+        self._last_success_at: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """True while calls are being short-circuited (does not use up the half-open probe)"""
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def allow(self, owner: Any = None) -> bool:
+        """
+        Args:
+            owner: Token of the calling request, recorded if it gets the half-open probe
+        """
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_owner = owner
+                return True
+            return False
+
+    def release_probe(self, owner: Any):
+        """Let another request probe if `owner` still holds the half-open probe"""
+        with self._lock:
+            if self.state == "half_open" and self._probe_in_flight and owner is not None and self._probe_owner is owner:
+                self._probe_in_flight = False
+                self._probe_owner = None
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("LLM circuit breaker closed")
+            self.state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+            self._last_success_at = datetime.now().isoformat()
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self._failures >= self.failure_threshold):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+                self._times_opened += 1
+                logger.warning(f"LLM circuit breaker opened after {self._failures} consecutive failures")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "times_opened": self._times_opened,
+                "last_success_at": self._last_success_at
+            }
+
+# Singleton instance, shared by the Flask and ASGI clients of a process
+_circuit_breaker = None
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Get singleton LLM circuit breaker"""
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        _circuit_breaker = CircuitBreaker()
+    return _circuit_breaker
+
+class _ResilientBase:
+    def __init__(self, breaker: Optional[CircuitBreaker], max_retries: int, hedge_after: float,
+                 request_deadline: float):
+        self.breaker = breaker or get_circuit_breaker()
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self.request_deadline = request_deadline
+        self._lock = threading.Lock()
+        self._counters = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "failures": 0,
+            "deadline_exceeded": 0,
+            "short_circuited": 0
+        }
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def _start(self, deadline: Optional[float], call: object) -> float:
+        """Check the breaker and resolve the absolute (monotonic) deadline"""
+        self._count("requests")
+        if not self.breaker.allow(call):
+            self._count("short_circuited")
+            LLM_REQUESTS.inc(outcome="short_circuited")
+            raise CircuitOpenError("LLM circuit breaker is open")
+        return deadline if deadline is not None else time.monotonic() + self.request_deadline
+
+    def _remaining(self, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded("LLM request deadline exceeded")
+        return remaining
+
+    @staticmethod
+    def _timeout_error(error: openai.APITimeoutError, timeout: float) -> Exception:
+        """A timeout shortened by the request deadline is the deadline running out, not a slow upstream"""
+        if timeout < LLM_READ_TIMEOUT_S:
+            deadline_error = LLMDeadlineExceeded("LLM request deadline exceeded")
+            deadline_error.__cause__ = error
+            return deadline_error
+        return error
+
+    def _retry_delay(self, attempt: int, deadline: float, call: object) -> Optional[float]:
+        """Full-jitter backoff, or None if no retry fits in the deadline"""
+        if attempt >= self.max_retries or not self.breaker.allow(call):
+            return None
+        delay = random.uniform(0, min(LLM_RETRY_MAX_BACKOFF_S, LLM_RETRY_BASE_BACKOFF_S * 2 ** attempt))
+        # Leave the next attempt at least its connect timeout
+        if time.monotonic() + delay + LLM_CONNECT_TIMEOUT_S >= deadline:
+            return None
+        return delay
+
+    def _on_failure(self, error: Exception):
+        self._count("failures")
+        if isinstance(error, LLMDeadlineExceeded):
+            # The caller's own deadline ran out: says nothing about the upstream, so it
+            # neither counts as a failure nor settles a half-open probe (create() releases it)
+            self._count("deadline_exceeded")
+        elif isinstance(error, openai.APIStatusError) and not isinstance(error, RETRYABLE_ERRORS):
+            # A 4xx answer means the upstream is reachable
+            self.breaker.record_success()
+        else:
+            # Retryable errors, unexpected errors, failed hedges
+            self.breaker.record_failure()
+
+    @staticmethod
+    def _record(started: float, response=None):
+        """Latency, outcome and token usage of a finished create() call"""
+        LLM_LATENCY.observe(time.perf_counter() - started)
+        LLM_REQUESTS.inc(outcome="ok" if response is not None else "error")
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            LLM_TOKENS.inc(usage.prompt_tokens or 0, type="prompt")
+            LLM_TOKENS.inc(usage.completion_tokens or 0, type="completion")
+            LLM_COMPLETION_TOKENS.observe(usage.completion_tokens or 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        return {"circuit_breaker": self.breaker.stats(), "hedge_after_s": self.hedge_after, **counters}
+
+class ResilientChatClient(_ResilientBase):
+    """Blocking chat completions with retries, hedging and circuit breaking (Flask routes)"""
+
+    def __init__(self, client: openai.OpenAI, breaker: Optional[CircuitBreaker] = None,
+                 max_retries: int = LLM_MAX_RETRIES, hedge_after: float = LLM_HEDGE_AFTER_S,
+                 request_deadline: float = LLM_REQUEST_DEADLINE_S):
+        super().__init__(breaker, max_retries, hedge_after, request_deadline)
+        self.client = client
+        self._hedge_executor = ThreadPoolExecutor(max_workers=2 * LLM_MAX_CONCURRENCY, thread_name_prefix="llm-hedge") if hedge_after > 0 else None
+
+    def create(self, deadline: Optional[float] = None, **kwargs):
+        """
+        chat.completions.create with resilience
+
+        Args:
+            deadline (Optional[float]): time.monotonic() by which the answer is needed
+            **kwargs: Arguments for chat.completions.create
+
+        Raises:
+            CircuitOpenError, LLMDeadlineExceeded or the last OpenAI error
+        """
+        call = object()
+        deadline = self._start(deadline, call)
+        started = time.perf_counter()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = self._attempt(kwargs, deadline)
+                    self.breaker.record_success()
+                    self._record(started, response)
+                    return response
+                except Exception as e:
+                    self._on_failure(e)
+                    delay = self._retry_delay(attempt, deadline, call) if isinstance(e, RETRYABLE_ERRORS) else None
+                    if delay is None:
+                        self._record(started)
+                        raise
+                    logger.warning(f"LLM attempt {attempt + 1} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                    self._count("retries")
+                    time.sleep(delay)
+                    attempt += 1
+        finally:
+            self.breaker.release_probe(call)
+
+    def _call(self, kwargs, deadline: float):
+        self._count("attempts")
+        timeout = min(LLM_READ_TIMEOUT_S, self._remaining(deadline))
+        with span("llm_attempt"):
+            try:
+                return self.client.chat.completions.create(timeout=timeout, **kwargs)
+            except openai.APITimeoutError as e:
+                raise self._timeout_error(e, timeout)
+
+    def _attempt(self, kwargs, deadline: float):
+        if self._hedge_executor is None or self._remaining(deadline) <= self.hedge_after:
+            return self._call(kwargs, deadline)
+
+        primary = self._hedge_executor.submit(contextvars.copy_context().run, self._call, kwargs, deadline)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        # Slow primary: race a second identical request, first success wins
+        self._count("hedged")
+        hedge = self._hedge_executor.submit(contextvars.copy_context().run, self._call, kwargs, deadline)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+class AsyncResilientChatClient(_ResilientBase):
+    """Async counterpart of ResilientChatClient (ASGI chat route)"""
+
+    def __init__(self, client: openai.AsyncOpenAI, breaker: Optional[CircuitBreaker] = None,
+                 max_retries: int = LLM_MAX_RETRIES, hedge_after: float = LLM_HEDGE_AFTER_S,
+                 request_deadline: float = LLM_REQUEST_DEADLINE_S):
+        super().__init__(breaker, max_retries, hedge_after, request_deadline)
+        self.client = client
+
+    async def create(self, deadline: Optional[float] = None, **kwargs):
+        call = object()
+        deadline = self._start(deadline, call)
+        started = time.perf_counter()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = await self._attempt(kwargs, deadline)
+                    self.breaker.record_success()
+                    self._record(started, response)
+                    return response
+                except Exception as e:
+                    self._on_failure(e)
+                    delay = self._retry_delay(attempt, deadline, call) if isinstance(e, RETRYABLE_ERRORS) else None
+                    if delay is None:
+                        self._record(started)
+                        raise
+                    logger.warning(f"LLM attempt {attempt + 1} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                    self._count("retries")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+        finally:
+            # A cancelled request (client gone) never records an outcome
+            self.breaker.release_probe(call)
+
+    async def _call(self, kwargs, deadline: float):
+        self._count("attempts")
+        timeout = min(LLM_READ_TIMEOUT_S, self._remaining(deadline))
+        with span("llm_attempt"):
+            try:
+                return await self.client.chat.completions.create(timeout=timeout, **kwargs)
+            except openai.APITimeoutError as e:
+                raise self._timeout_error(e, timeout)
+
+    async def _attempt(self, kwargs, deadline: float):
+        if self.hedge_after <= 0 or self._remaining(deadline) <= self.hedge_after:
+            return await self._call(kwargs, deadline)
+
+        primary = asyncio.ensure_future(self._call(kwargs, deadline))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        self._count("hedged")
+        hedge = asyncio.ensure_future(self._call(kwargs, deadline))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The loser's connection is released instead of finishing a wasted completion
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,372 @@
+"""
+In-process metrics registry with Prometheus text exposition
+
+Counters, gauges and histograms keyed by label values; each metric has its
+own lock and an update is a dict lookup plus an add. Gauges that are cheaper
+to read than to maintain (queue lengths, cache sizes, pool usage) are
+registered as collectors and evaluated at scrape or flush time.
+
+Several workers (gunicorn): with METRICS_MULTIPROC_DIR set, every process
+periodically writes its snapshot to <dir>/<pid>.json (atomic replace) and
+/api/metrics merges all files: counters and histograms are summed over every
+process that ever wrote (so they stay monotonic across worker restarts),
+gauges are summed over live processes only. Snapshots of exited workers are
+folded into <dir>/retired.json and deleted, so the directory only holds one
+file per live worker and a replacement worker reusing a pid cannot overwrite
+its predecessor's totals.
+"""
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, Callable, Iterable
+import logging
+
+from config import METRICS_MULTIPROC_DIR, METRICS_FLUSH_INTERVAL_S
+
+logger = logging.getLogger(__name__)
+
+# Seconds; LLM calls sit in the upper buckets, vector queries and log writes in the lower ones
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192)
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return [(key, value if not isinstance(value, list) else list(value)) for key, value in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # [per-bucket counts..., +Inf count, sum]
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+class MetricsRegistry:
+    """Named metrics plus gauge collectors, rendered in Prometheus text format"""
+
+    def __init__(self, multiproc_dir: str = METRICS_MULTIPROC_DIR):
+        self.multiproc_dir = Path(multiproc_dir) if multiproc_dir else None
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Dict[str, Any], float]]]] = []
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        self._flushed_pid = None
+
+    def _register(self, metric_class, name: str, documentation: str, label_names=(), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, tuple(label_names), **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, label_names=()) -> Counter:
+        return self._register(Counter, name, documentation, label_names)
+
+    def gauge(self, name: str, documentation: str, label_names=()) -> Gauge:
+        return self._register(Gauge, name, documentation, label_names)
+
+    def histogram(self, name: str, documentation: str, label_names=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, label_names, buckets=buckets)
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, Dict[str, Any], float]]]):
+        """collector() yields (name, help, labels, value) gauge samples, read at scrape time"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def reset_after_fork(self):
+        """Drop values inherited from the master so each worker only reports its own"""
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable view of every metric, collectors included"""
+        metrics = {}
+        for metric in list(self._metrics.values()):
+            entry = {
+                "type": metric.type_name,
+                "help": metric.documentation,
+                "labels": list(metric.label_names),
+                "samples": [[list(key), value] for key, value in metric.samples()]
+            }
+            if isinstance(metric, Histogram):
+                entry["buckets"] = list(metric.buckets)
+            metrics[metric.name] = entry
+        for collector in list(self._collectors):
+            try:
+                for name, documentation, labels, value in collector():
+                    entry = metrics.setdefault(name, {
+                        "type": "gauge", "help": documentation, "labels": sorted(labels), "samples": []
+                    })
+                    entry["samples"].append([[str(labels[label]) for label in entry["labels"]], value])
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        return {"pid": os.getpid(), "written_at": time.time(), "metrics": metrics}
+
+    # Multi-process aggregation
+    def flush(self):
+        """Write this process's snapshot for the other workers' /api/metrics"""
+        if self.multiproc_dir is None:
+            return
+        self.multiproc_dir.mkdir(parents=True, exist_ok=True)
+        path = self.multiproc_dir / f"{os.getpid()}.json"
+        if self._flushed_pid != os.getpid():
+            # A file under our pid before our first flush belongs to an exited process
+            self._retire([path])
+            self._flushed_pid = os.getpid()
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def start_flusher(self, interval_s: float = METRICS_FLUSH_INTERVAL_S) -> Optional[threading.Thread]:
+        """Flush periodically (once per process; no-op without METRICS_MULTIPROC_DIR)"""
+        if self.multiproc_dir is None or self._flusher_pid == os.getpid():
+            return None
+        self._flusher_pid = os.getpid()
+
+        def run():
+            while True:
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.warning(f"Metrics flush failed: {e}")
+                time.sleep(interval_s)
+
+        thread = threading.Thread(target=run, name="metrics-flush", daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def _read_snapshot(path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _retire(self, paths: List[Path]):
+        """Fold exited processes' counters and histograms into retired.json and delete their files"""
+        retired_path = self.multiproc_dir / "retired.json"
+        with open(self.multiproc_dir / ".retire.lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Re-read under the lock: another worker may have retired the same files already
+            snapshots = [snapshot for snapshot in map(self._read_snapshot, paths) if snapshot is not None]
+            if not snapshots:
+                return
+            retired = self._read_snapshot(retired_path) or {"pid": 0, "metrics": {}}
+            merged = _merge([{**snapshot, "alive": False} for snapshot in snapshots + [retired]])
+            tmp_path = retired_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"pid": 0, "written_at": time.time(), "metrics": _as_snapshot_metrics(merged)}, f)
+            os.replace(tmp_path, retired_path)
+            for path in paths:
+                path.unlink(missing_ok=True)
+        logger.info(f"Retired metrics of {len(snapshots)} exited process(es)")
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """Snapshots to render: this process, plus every other worker's file in multi-process mode"""
+        if self.multiproc_dir is None:
+            return [self.snapshot()]
+        self.flush()
+        snapshots, dead = [], []
+        for path in self.multiproc_dir.glob("*.json"):
+            if path.name == "retired.json":
+                continue
+            snapshot = self._read_snapshot(path)
+            if snapshot is None:
+                continue
+            if self._pid_alive(int(snapshot.get("pid", 0))):
+                snapshots.append({**snapshot, "alive": True})
+            else:
+                dead.append(path)
+        if dead:
+            self._retire(dead)
+        retired = self._read_snapshot(self.multiproc_dir / "retired.json")
+        if retired is not None:
+            snapshots.append({**retired, "alive": False})
+        return snapshots
+
+    def render(self) -> str:
+        """Prometheus text exposition (format 0.0.4) of the merged snapshots"""
+        merged = _merge(self.collect())
+        lines = []
+        for name in sorted(merged):
+            entry = merged[name]
+            lines.append(f"# HELP {name} {entry['help']}")
+            lines.append(f"# TYPE {name} {entry['type']}")
+            for key, value in sorted(entry["values"].items()):
+                labels = list(zip(entry["labels"], key))
+                if entry["type"] == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(list(entry["buckets"]) + ["+Inf"], value[:-1]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels + [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def _merge(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Sum samples per metric and label values; gauges only from live processes"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        alive = snapshot.get("alive", True)
+        for name, entry in snapshot["metrics"].items():
+            if entry["type"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**entry, "values": {}})
+            for labels, value in entry["samples"]:
+                key = tuple(labels)
+                if entry["type"] == "histogram":
+                    current = target["values"].get(key)
+                    target["values"][key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    target["values"][key] = target["values"].get(key, 0) + value
+    return merged
+
+def _as_snapshot_metrics(merged: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Merged metrics back in snapshot form"""
+    metrics = {}
+    for name, entry in merged.items():
+        metrics[name] = {key: value for key, value in entry.items() if key not in ("values", "samples")}
+        metrics[name]["samples"] = [[list(key), value] for key, value in entry["values"].items()]
+    return metrics
+
+def _format_labels(labels: List[Tuple[str, Any]]) -> str:
+    if not labels:
+        return ""
+    escaped = []
+    for label, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{label}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# Singleton instance
+_metrics_registry = None
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get singleton metrics registry"""
+    global _metrics_registry
+    if _metrics_registry is None:
+        _metrics_registry = MetricsRegistry()
+    return _metrics_registry
+
+# Application metrics
+_registry = get_metrics_registry()
+
+CHAT_REQUESTS = _registry.counter(
+    "chat_requests_total", "Chat requests by answer source and HTTP status", ("source", "status"))
+CHAT_LATENCY = _registry.histogram(
+    "chat_request_duration_seconds", "End-to-end /api/chat latency by answer source", ("source",))
+CHAT_IN_PROGRESS = _registry.gauge(
+    "chat_requests_in_progress", "Chat requests currently being handled (compare with worker threads)")
+
+LLM_REQUESTS = _registry.counter(
+    "llm_requests_total", "LLM completions by outcome (ok, error, short_circuited)", ("outcome",))
+LLM_LATENCY = _registry.histogram(
+    "llm_request_duration_seconds", "LLM completion latency including retries")
+LLM_TOKENS = _registry.counter(
+    "llm_tokens_total", "LLM tokens reported by the API", ("type",))
+LLM_COMPLETION_TOKENS = _registry.histogram(
+    "llm_completion_tokens", "Completion tokens per LLM call", buckets=TOKEN_BUCKETS)
+
+EMBEDDING_CALLS = _registry.counter(
+    "embedding_calls_total", "Embedding model forward passes")
+EMBEDDING_BATCH_TEXTS = _registry.histogram(
+    "embedding_batch_size", "Texts per embedding model call", buckets=SIZE_BUCKETS)
+EMBEDDING_LATENCY = _registry.histogram(
+    "embedding_duration_seconds", "Embedding model call latency")
+
+VECTOR_QUERY_LATENCY = _registry.histogram(
+    "vector_query_duration_seconds", "Vector store query latency (retrieval cache misses only)", ("collection",))
+RETRIEVAL_CACHE_LOOKUPS = _registry.counter(
+    "retrieval_cache_lookups_total", "Retrieval cache lookups", ("collection", "result"))
+
+LOG_WRITE_LATENCY = _registry.histogram(
+    "log_write_duration_seconds", "Conversation log and query log write latency", ("log",))
+
+def observe_chat_request(payload: Optional[Dict[str, Any]], status: int, started: float):
+    """Count a finished chat request under its answer source ("error" when the body has none)"""
+    source = (payload.get("source") if isinstance(payload, dict) else None) or "error"
+    CHAT_REQUESTS.inc(source=source, status=status)
+    CHAT_LATENCY.observe(time.perf_counter() - started, source=source)
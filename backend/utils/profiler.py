@@ -0,0 +1,179 @@
+"""
+On-demand stack-sampling profiler
+
+A sampler thread reads every thread's Python stack via sys._current_frames()
+at a fixed interval and counts identical stacks. Nothing is installed in the
+interpreter (no sys.setprofile / settrace), so request threads run unchanged
+and there is no cost at all while no profile is running.
+
+Output: collapsed stacks ("root;caller;leaf count" lines, the input format of
+flamegraph.pl / speedscope) and the top functions by self and total samples.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional
+import logging
+
+from config import PROFILER_INTERVAL_MS, PROFILER_MAX_SECONDS, PROFILER_TOP_N
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+
+# Leaf frames of threads parked waiting for work (excluded unless include_idle)
+IDLE_FRAMES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"), ("selectors.py", "select"), ("socket.py", "accept"),
+    ("socketserver.py", "serve_forever"), ("concurrent/futures/thread.py", "_worker")
+}
+
+class ProfilerBusy(Exception):
+    """Another global profile is already running in this process"""
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    # Keep the last two path parts: enough to tell utils/x.py from routes/x.py
+    short = "/".join(filename.replace("\\", "/").split("/")[-2:])
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+def _is_idle(code) -> bool:
+    filename = code.co_filename.replace("\\", "/")
+    return any(filename.endswith(suffix) and code.co_name == name for suffix, name in IDLE_FRAMES)
+
+class SamplingProfiler:
+    """Samples the stacks of all threads (or of the given thread ids) until stopped"""
+
+    def __init__(self, interval_ms: float = PROFILER_INTERVAL_MS, thread_ids: Optional[List[int]] = None,
+                 exclude_thread_ids: Optional[List[int]] = None, include_idle: bool = False):
+        """
+        Initialize sampling profiler
+
+        Args:
+            interval_ms (float): Time between samples
+            thread_ids (Optional[List[int]]): Only sample these threads (None = every thread)
+            exclude_thread_ids (Optional[List[int]]): Never sample these threads
+            include_idle (bool): Keep samples of threads waiting for work
+        """
+        self.interval = interval_ms / 1000
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.exclude_thread_ids = set(exclude_thread_ids or ())
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0  # Sampling rounds
+        self.thread_samples = 0  # Stacks recorded over all rounds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+        self._sampling_time = 0.0
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._elapsed = time.perf_counter() - self._started
+        return self
+
+    def _run(self):
+        self.exclude_thread_ids.add(threading.get_ident())
+        while not self._stop.wait(self.interval):
+            started = time.perf_counter()
+            self._sample()
+            self._sampling_time += time.perf_counter() - started
+
+    def _sample(self):
+        self.samples += 1
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in self.exclude_thread_ids or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                continue
+            if not self.include_idle and _is_idle(frame.f_code):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            # Code objects are hashable and cheap to count; labels are built once at report time
+            self.stacks[tuple(reversed(stack))] += 1
+            self.thread_samples += 1
+
+    def collapsed(self) -> str:
+        """Collapsed-stack lines, heaviest first"""
+        lines = []
+        for stack, count in self.stacks.most_common():
+            lines.append(f"{';'.join(_frame_label(code) for code in stack)} {count}")
+        return "\n".join(lines)
+
+    def top_functions(self, limit: int = PROFILER_TOP_N) -> Dict[str, List[Dict[str, Any]]]:
+        """Functions with the most samples as the leaf frame (self) and anywhere on the stack (total)"""
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for code in set(stack):
+                total_counts[code] += count
+
+        def rows(counts: Counter) -> List[Dict[str, Any]]:
+            return [
+                {
+                    "function": _frame_label(code),
+                    "samples": count,
+                    "percent": round(100 * count / self.thread_samples, 2) if self.thread_samples else 0.0
+                }
+                for code, count in counts.most_common(limit)
+            ]
+
+        return {"self": rows(self_counts), "total": rows(total_counts)}
+
+    def report(self, limit: int = PROFILER_TOP_N, collapsed: bool = True) -> Dict[str, Any]:
+        report = {
+            "pid": os.getpid(),
+            "duration_s": round(self._elapsed, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "thread_samples": self.thread_samples,
+            # Share of one core spent walking stacks (the profiler's own overhead)
+            "sampler_overhead_percent": round(100 * self._sampling_time / self._elapsed, 2) if self._elapsed else 0.0,
+            "top": self.top_functions(limit)
+        }
+        if collapsed:
+            report["collapsed"] = self.collapsed()
+        return report
+
+_global_profile_lock = threading.Lock()
+
+def profile_for(seconds: float, interval_ms: float = PROFILER_INTERVAL_MS,
+                include_idle: bool = False) -> SamplingProfiler:
+    """
+    Sample every thread of this process for `seconds` (blocks the calling thread)
+
+    Args:
+        seconds (float): Duration, clamped to PROFILER_MAX_SECONDS
+        interval_ms (float): Time between samples
+        include_idle (bool): Keep samples of threads waiting for work
+
+    Raises:
+        ProfilerBusy: A global profile is already running
+    """
+    if not _global_profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running in this worker")
+    try:
+        seconds = max(0.1, min(seconds, PROFILER_MAX_SECONDS))
+        logger.info(f"Profiling all threads for {seconds}s every {interval_ms}ms")
+        # The calling (request) thread only sleeps here; leave it out of its own profile
+        profiler = SamplingProfiler(interval_ms, exclude_thread_ids=[threading.get_ident()],
+                                    include_idle=include_idle)
+        profiler.start()
+        time.sleep(seconds)
+        return profiler.stop()
+    finally:
+        _global_profile_lock.release()
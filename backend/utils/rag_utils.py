@@ -2,9 +2,19 @@
 RAG (Retrieval-Augmented Generation) utilities
 """
 import logging
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import RAG_CONTEXT_MAX_TOKENS, RAG_NEIGHBOR_MAX_TOKENS
+from utils.chunking import estimate_tokens
 
 logger = logging.getLogger(__name__)
 
+PASSAGE_SEPARATOR = "\n[...]\n"  # Between non-adjacent chunks of the same document
+MIN_OVERLAP_CHARS = 16  # Shorter suffix/prefix matches are treated as coincidence, not chunk overlap
+
+_WORD_RE = re.compile(r"\S+\s*")
+
 # System prompt base
 SYSTEM_PROMPT_BASE = """Bạn là một trợ lý ảo thông minh của trường đại học, chuyên hỗ trợ sinh viên với các thông tin về:
 - Thông tin môn học và lịch học
@@ -18,9 +28,134 @@ Nếu không chắc chắn về thông tin, hãy đề xuất sinh viên liên h
 
 Luôn trả lời bằng tiếng Việt trừ khi được yêu cầu khác."""
 
-def retrieve_context_from_knowledge_base(chroma_db, query: str, top_k: int = 3, relevance_threshold: float = 0.7) -> str:
+def overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right (0 below MIN_OVERLAP_CHARS)"""
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = left.find(probe, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(probe, start + 1)
+    return 0
+
+def stitch(left: str, right: str) -> str:
+    """Join two consecutive chunks, keeping their shared overlap once"""
+    overlap = overlap_length(left, right)
+    if overlap:
+        return left + right[overlap:]
+    return f"{left.rstrip()}\n{right.lstrip()}"
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    kept, tokens = [], 0
+    for match in _WORD_RE.finditer(text):
+        word_tokens = estimate_tokens(match.group(0))
+        if tokens + word_tokens > max_tokens:
+            break
+        kept.append(match.group(0))
+        tokens += word_tokens
+    return "".join(kept).rstrip() + " …"
+
+def _item_key(item: Dict[str, Any]) -> Any:
+    return item.get('id') or (item.get('title'), item.get('content'))
+
+def _position(item: Dict[str, Any]) -> Tuple[str, int]:
+    return item.get('original_title', item.get('title', 'Unknown')), item.get('chunk_index', 0)
+
+def render_context(items: List[Dict[str, Any]]) -> str:
     """
-    Retrieve relevant context from knowledge base using RAG
+    Format knowledge items as one block per document (in order of first appearance),
+    chunks ordered by chunk_index, consecutive chunks stitched into a single passage
+    """
+    documents: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        documents.setdefault(_position(item)[0], []).append(item)
+    
+    context_parts = []
+    for title, chunks in documents.items():
+        passages, previous_index = [], None
+        for chunk in sorted(chunks, key=lambda c: c.get('chunk_index', 0)):
+            index = chunk.get('chunk_index', 0)
+            content = chunk.get('content', '')
+            if passages and previous_index is not None and index == previous_index + 1:
+                passages[-1] = stitch(passages[-1], content)
+            else:
+                passages.append(content)
+            previous_index = index
+        body = PASSAGE_SEPARATOR.join(passage.strip() for passage in passages)
+        context_parts.append(f"📚 {title}\n{body}\n")
+    return "\n".join(context_parts)
+
+def build_context(knowledge_items: List[Dict[str, Any]],
+                  fetch_chunks: Optional[Callable[[List[Tuple[str, int]]], List[Dict[str, Any]]]] = None,
+                  max_tokens: int = RAG_CONTEXT_MAX_TOKENS,
+                  neighbor_max_tokens: int = RAG_NEIGHBOR_MAX_TOKENS) -> str:
+    """
+    Build the retrieved-context block from ranked knowledge hits
+    
+    Hits are grouped by document and overlapping chunks are stitched (render_context).
+    Hits are taken in rank order while the block stays within max_tokens; a lower-ranked
+    hit that does not fit is skipped in favour of smaller ones. Then chunks adjacent to
+    the selected ones are fetched and added, cheapest first, when each adds at most
+    neighbor_max_tokens - typically a short chunk, or one that closes a gap between two
+    hits so the overlap on both sides and the gap marker disappear.
+    
+    Args:
+        knowledge_items (List[Dict]): search_knowledge results, best first
+        fetch_chunks (Callable): (original_title, chunk_index) pairs -> chunks; None disables neighbours
+        max_tokens (int): Budget for the whole block (estimated tokens)
+        neighbor_max_tokens (int): Max added tokens for a neighbouring chunk (0 disables)
+        
+    Returns:
+        str: Formatted context ("" if no items)
+    """
+    selected: List[Dict[str, Any]] = []
+    seen = set()
+    for item in knowledge_items:
+        if _item_key(item) in seen:
+            continue
+        seen.add(_item_key(item))
+        if estimate_tokens(render_context(selected + [item])) <= max_tokens:
+            selected.append(item)
+        elif not selected:
+            # Top hit alone is over budget: keep its beginning rather than nothing
+            heading_tokens = estimate_tokens(f"📚 {_position(item)[0]}")
+            selected.append({**item, 'content': _truncate_tokens(item.get('content', ''), max_tokens - heading_tokens - 1)})
+            break
+    
+    if not selected or not fetch_chunks or neighbor_max_tokens <= 0:
+        return render_context(selected)
+    
+    positions = {_position(item) for item in selected}
+    wanted = set()
+    for item in selected:
+        title, index = _position(item)
+        for neighbor in (index - 1, index + 1):
+            if 0 <= neighbor < item.get('total_chunks', 1) and (title, neighbor) not in positions:
+                wanted.add((title, neighbor))
+    wanted = sorted(wanted)
+    if not wanted:
+        return render_context(selected)
+    try:
+        neighbors = [chunk for chunk in fetch_chunks(wanted) if _position(chunk) not in positions]
+    except Exception as e:
+        logger.warning(f"Fetching neighbouring chunks failed: {e}")
+        return render_context(selected)
+    
+    current_tokens = estimate_tokens(render_context(selected))
+    while neighbors:
+        costs = [estimate_tokens(render_context(selected + [chunk])) - current_tokens for chunk in neighbors]
+        cheapest = min(range(len(neighbors)), key=costs.__getitem__)
+        if costs[cheapest] > neighbor_max_tokens or current_tokens + costs[cheapest] > max_tokens:
+            break
+        selected.append(neighbors.pop(cheapest))
+        current_tokens += costs[cheapest]
+    return render_context(selected)
+
+def retrieve_knowledge_items(chroma_db, query: str, top_k: int = 3, relevance_threshold: float = 0.7) -> List[Dict[str, Any]]:
+    """
+    Search the knowledge base and keep the hits above the relevance threshold
     
     Args:
         chroma_db: ChromaDB manager instance
@@ -29,40 +164,47 @@ def retrieve_context_from_knowledge_base(chroma_db, query: str, top_k: int = 3,
         relevance_threshold (float): Minimum relevance score (0-1)
         
     Returns:
-        str: Formatted context string for augmentation
+        List[Dict]: search_knowledge results, best first ([] on failure)
     """
     if not chroma_db:
-        return ""
+        return []
     
     try:
         knowledge_results = chroma_db.search_knowledge(query, top_k=top_k)
-        
-        if not knowledge_results:
-            return ""
-        
-        # Filter by relevance threshold and format context
-        context_parts = []
-        for item in knowledge_results:
-            relevance = item.get('relevance', 0)
-            if relevance >= relevance_threshold:
-                title = item.get('title', 'Unknown')
-                content = item.get('content', '')
-                
-                # Format context entry
-                context_entry = f"📚 {title}\n{content}\n"
-                context_parts.append(context_entry)
-        
-        if context_parts:
-            formatted_context = "\n".join(context_parts)
-            logger.info(f"Retrieved {len(context_parts)} relevant knowledge items for RAG")
-            return formatted_context
-        
-        return ""
-        
     except Exception as e:
         logger.warning(f"RAG retrieval failed: {e}")
+        return []
+    return [item for item in knowledge_results or [] if item.get('relevance', 0) >= relevance_threshold]
+
+def format_knowledge_context(chroma_db, knowledge_items: List[Dict[str, Any]]) -> str:
+    """Merge retrieved chunks per document within the token budget ("" if no items)"""
+    if not knowledge_items:
+        return ""
+    try:
+        fetch_chunks = getattr(chroma_db, 'get_document_chunks', None)
+        formatted_context = build_context(knowledge_items, fetch_chunks=fetch_chunks)
+        logger.info(f"Retrieved {len(knowledge_items)} relevant knowledge items for RAG")
+        return formatted_context
+    except Exception as e:
+        logger.warning(f"RAG context building failed: {e}")
         return ""
 
+def retrieve_context_from_knowledge_base(chroma_db, query: str, top_k: int = 3, relevance_threshold: float = 0.7) -> str:
+    """
+    Retrieve relevant context from knowledge base using RAG
+    
+    Args:
+        chroma_db: ChromaDB manager instance
+        query (str): User query
+        top_k (int): Number of documents to retrieve
+        relevance_threshold (float): Minimum relevance score (0-1)
+        
+    Returns:
+        str: Formatted context string for augmentation
+    """
+    relevant = retrieve_knowledge_items(chroma_db, query, top_k=top_k, relevance_threshold=relevance_threshold)
+    return format_knowledge_context(chroma_db, relevant)
+
 def augment_system_prompt(base_prompt: str, retrieved_context: str) -> str:
     """
     Augment system prompt with retrieved context from knowledge base
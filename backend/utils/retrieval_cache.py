@@ -0,0 +1,94 @@
+"""
+Bounded LRU cache for retrieval results (FAQ and knowledge base search)
+"""
+import copy
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_MISSING = object()
+
+def normalize_query(query: str, fold_diacritics: bool = False) -> str:
+    """
+    Normalize a query for use in a cache key
+
+    Args:
+        query (str): Raw user query
+        fold_diacritics (bool): Also strip Vietnamese tone/vowel marks ("Học phí" -> "hoc phi")
+
+    Returns:
+        str: Lowercased query with collapsed whitespace
+    """
+    normalized = _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", query)).strip().lower()
+    if fold_diacritics:
+        decomposed = unicodedata.normalize("NFD", normalized.replace("đ", "d"))
+        normalized = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return normalized
+
+class RetrievalCache:
+    """
+    Thread-safe LRU cache. Keys include the collection version, so entries for
+    an old version simply stop being looked up and age out of the LRU.
+    Empty ("no match") results are cached like any other result.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Initialize retrieval cache
+
+        Args:
+            max_entries (int): Maximum number of cached results (0 disables caching)
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a cached result
+
+        Returns:
+            Tuple[bool, Any]: (hit, copy of the cached result)
+        """
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers get their own copy so they cannot mutate the cached entry
+        return True, copy.deepcopy(value)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a result, evicting the least recently used entry when full"""
+        if self.max_entries <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries (stats are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for health reporting"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,84 @@
+"""
+Background-refreshed service status for health endpoints
+
+Collecting status (collection counts, breaker state, queue depths) touches
+the vector store, so it runs on a daemon thread every
+HEALTH_SNAPSHOT_INTERVAL_S; probes only read the last snapshot.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional
+import logging
+
+from config import HEALTH_SNAPSHOT_INTERVAL_S
+
+logger = logging.getLogger(__name__)
+
+class StatusSnapshot:
+    """Latest result of a status collector, refreshed in the background"""
+
+    def __init__(self, collect: Callable[[], Dict[str, Any]], interval_s: float = HEALTH_SNAPSHOT_INTERVAL_S):
+        """
+        Initialize status snapshot
+
+        Args:
+            collect: Callable returning the status dict (may be slow)
+            interval_s (float): Seconds between refreshes
+        """
+        self.collect = collect
+        self.interval_s = interval_s
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._refreshed_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._refresher_pid = None
+        self._stop = threading.Event()
+
+    def refresh(self) -> Dict[str, Any]:
+        """Collect now and replace the snapshot (a failing collector keeps the previous one)"""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            try:
+                snapshot = self.collect()
+            except Exception as e:
+                logger.warning(f"Status snapshot refresh failed: {e}")
+                if self._snapshot is not None:
+                    return self._snapshot
+                snapshot = {"error": str(e)}
+            snapshot["snapshot_at"] = datetime.now().isoformat()
+            snapshot["collect_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            # Publish by rebinding: readers never see a half-built dict
+            self._snapshot = snapshot
+            self._refreshed_at = time.monotonic()
+            return snapshot
+
+    def get(self) -> Dict[str, Any]:
+        """
+        Latest snapshot plus its age; collected inline only before the first refresh
+
+        Returns:
+            Dict: Status fields, "snapshot_at", "collect_ms" and "age_s"
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh()
+        return {**snapshot, "age_s": round(time.monotonic() - self._refreshed_at, 3)}
+
+    def start(self) -> Optional[threading.Thread]:
+        """Start the refresher thread (once per process, again in a forked worker)"""
+        if self._refresher_pid == os.getpid():
+            return None
+        self._refresher_pid = os.getpid()
+
+        def run():
+            while not self._stop.is_set():
+                self.refresh()
+                self._stop.wait(self.interval_s)
+
+        thread = threading.Thread(target=run, name="status-snapshot", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,223 @@
+"""
+Lightweight per-request stage tracing
+
+A Trace is bound to the current request through a ContextVar; span() and the
+@traced decorator record (name, start offset, duration) into it and cost a
+single ContextVar lookup when no trace is active (background jobs, scripts).
+Finished traces are written as one NDJSON line to a rotating file and can be
+exposed as a Server-Timing header or, on request, in the response body.
+Each process writes and rotates its own file (<name>.<pid>.ndjson next to
+TRACE_LOG_PATH), so gunicorn workers never rotate a file another one writes.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from config import (
+    TRACING_ENABLED, TRACE_LOG_PATH, TRACE_LOG_MAX_BYTES, TRACE_LOG_BACKUP_COUNT, SERVER_TIMING_ENABLED
+)
+
+logger = logging.getLogger(__name__)
+
+DEBUG_TIMINGS_HEADER = "X-Debug-Timings"
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_span", default=None)
+
+class Trace:
+    """Spans recorded for one request"""
+
+    def __init__(self, name: str, debug: bool = False):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.debug = debug
+        self.started_at = time.perf_counter()
+        self.timestamp = datetime.now().isoformat()
+        self.spans: List[Dict[str, Any]] = []
+        self.fields: Dict[str, Any] = {}
+        self._lock = threading.Lock()  # Spans may finish on retrieval pool threads
+
+    def add_span(self, name: str, started: float, ended: float, parent: Optional[str], error: bool = False):
+        span = {
+            "name": name,
+            "start_ms": round((started - self.started_at) * 1000, 3),
+            "duration_ms": round((ended - started) * 1000, 3)
+        }
+        if parent:
+            span["parent"] = parent
+        if error:
+            span["error"] = True
+        with self._lock:
+            self.spans.append(span)
+
+    def duration_ms(self) -> float:
+        return round((time.perf_counter() - self.started_at) * 1000, 3)
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Total duration per top-level stage (spans without a parent), in first-seen order"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for span in self.spans:
+                if "parent" not in span:
+                    totals[span["name"]] = round(totals.get(span["name"], 0) + span["duration_ms"], 3)
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "duration_ms": self.duration_ms(),
+            **self.fields,
+            "spans": spans
+        }
+
+def start_trace(name: str, debug: bool = False) -> Optional[Trace]:
+    """Start a trace for the current request (None when tracing is disabled)"""
+    if not TRACING_ENABLED:
+        return None
+    trace = Trace(name, debug=debug)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def annotate(**fields):
+    """Attach fields (session, source, status...) to the current trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+@contextmanager
+def span(name: str):
+    """Time a stage of the current request"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    parent = _current_span.get()
+    token = _current_span.set(name)
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.add_span(name, started, time.perf_counter(), parent, error)
+
+def record_span(name: str, started: float):
+    """Record a span that started at `started` (time.perf_counter) and ends now"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, started, time.perf_counter(), _current_span.get())
+
+def traced(name: str):
+    """Decorator form of span() for service methods"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def server_timing(trace: Trace) -> str:
+    """Server-Timing header value: one metric per top-level stage plus the total"""
+    metrics = [f"{name};dur={duration}" for name, duration in trace.stage_totals().items()]
+    metrics.append(f"total;dur={trace.duration_ms()}")
+    return ", ".join(metrics)
+
+def debug_requested(header_value: Optional[str]) -> bool:
+    return (header_value or "").strip().lower() in ("1", "true", "yes")
+
+def trace_log_path(pid: Optional[int] = None) -> Path:
+    """This process's trace log: TRACE_LOG_PATH with the pid before the suffix"""
+    path = Path(TRACE_LOG_PATH)
+    return path.with_name(f"{path.stem}.{pid or os.getpid()}{path.suffix}")
+
+def trace_log_files(trace_path: str = TRACE_LOG_PATH) -> List[Path]:
+    """Every process's trace log and rotated backups for a TRACE_LOG_PATH"""
+    path = Path(trace_path)
+    return sorted(path.parent.glob(f"{path.stem}*{path.suffix}*"))
+
+# NDJSON trace log (separate logger so trace lines never reach the console)
+_trace_logger = logging.getLogger("tracing.records")
+_trace_logger.propagate = False
+_trace_logger_lock = threading.Lock()
+_trace_handler_pid = None
+
+def _ensure_trace_handler():
+    global _trace_handler_pid
+    if _trace_handler_pid == os.getpid():
+        return
+    with _trace_logger_lock:
+        if _trace_handler_pid != os.getpid():
+            # A handler inherited through fork points at the parent's file
+            for handler in list(_trace_logger.handlers):
+                _trace_logger.removeHandler(handler)
+                handler.close()
+            path = trace_log_path()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=TRACE_LOG_MAX_BYTES,
+                                          backupCount=TRACE_LOG_BACKUP_COUNT, encoding='utf-8')
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _trace_logger.addHandler(handler)
+            _trace_logger.setLevel(logging.INFO)
+            _trace_handler_pid = os.getpid()
+
+def finish_trace(trace: Optional[Trace]) -> Optional[Dict[str, Any]]:
+    """Write the trace to the NDJSON log and unbind it; returns the record"""
+    if trace is None:
+        return None
+    _current_trace.set(None)
+    record = trace.to_dict()
+    try:
+        _ensure_trace_handler()
+        _trace_logger.info(json.dumps(record, ensure_ascii=False))
+    except Exception as e:
+        logger.warning(f"Could not write trace record: {e}")
+    return record
+
+def complete_trace(trace: Optional[Trace], payload: Optional[Dict[str, Any]], status: int) -> Dict[str, str]:
+    """
+    Finish a request trace
+
+    Args:
+        trace (Optional[Trace]): Trace returned by start_trace
+        payload (Optional[Dict]): JSON response body; gets "debug_timings" when the client opted in
+        status (int): HTTP status code
+
+    Returns:
+        Dict[str, str]: Response headers to add (Server-Timing)
+    """
+    if trace is None:
+        return {}
+    trace.fields["status"] = status
+    if isinstance(payload, dict) and payload.get("source"):
+        trace.fields["source"] = payload["source"]
+    if isinstance(payload, dict) and payload.get("session_id"):
+        trace.fields["session"] = payload["session_id"]
+    headers = {"Server-Timing": server_timing(trace)} if SERVER_TIMING_ENABLED else {}
+    record = finish_trace(trace)
+    if trace.debug and isinstance(payload, dict):
+        payload["debug_timings"] = record
+    return headers
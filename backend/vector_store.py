@@ -0,0 +1,642 @@
+"""
+Vector store backends for University Assistant
+A small collection interface (add, update, query, get, delete, count) with
+a Chroma backend and a memory-mapped flat-index backend
+"""
+import fcntl
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable
+import logging
+
+import numpy as np
+
+from process_lock import SharedCounter
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_INCLUDE = ['documents', 'metadatas']
+DEFAULT_QUERY_INCLUDE = ['documents', 'metadatas', 'distances']
+
+class VectorStore(ABC):
+    """
+    A named collection of (id, embedding, document, metadata) records.
+
+    Method signatures and result shapes follow the subset of the Chroma
+    Collection API that ChromaDBManager uses, so managers can swap backends
+    without touching their result handling.
+    """
+
+    name: str
+
+    @abstractmethod
+    def add(self, ids: List[str], documents: Optional[List[str]] = None,
+            metadatas: Optional[List[Dict[str, Any]]] = None,
+            embeddings: Optional[List[List[float]]] = None) -> None:
+        """Add records; embeddings are computed from documents when omitted"""
+
+    @abstractmethod
+    def update(self, ids: List[str], documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict[str, Any]]] = None,
+               embeddings: Optional[List[List[float]]] = None) -> None:
+        """Update existing records; metadata keys are merged"""
+
+    @abstractmethod
+    def query(self, query_texts: Optional[List[str]] = None,
+              query_embeddings: Optional[List[List[float]]] = None,
+              n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Nearest neighbours per query; lists of lists like Chroma"""
+
+    @abstractmethod
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Fetch records by id and/or metadata filter"""
+
+    @abstractmethod
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        """Delete records by id and/or metadata filter"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of live records"""
+
+    @abstractmethod
+    def compact(self, lock=None, changed: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Rebuild the underlying index/files from live records, reclaiming deleted space.
+        Without a lock the caller holds the write lock for the whole rebuild; with one,
+        backends that copy in batches hold it per batch and re-copy the records matching
+        `changed` (written since the rebuild started) before switching.
+        """
+
+class ChromaVectorStore(VectorStore):
+    """
+    VectorStore backed by a Chroma collection
+
+    compact() copies live records into a new physical collection
+    (<name>-g<generation>) and switches to it only once the copy is complete.
+    The generation lives in a shared counter file; every operation checks it,
+    so workers that did not compact reopen the new collection instead of
+    writing to the dropped one.
+    """
+
+    def __init__(self, client, name: str, metadata: Optional[Dict[str, Any]] = None,
+                 embedding_function: Optional[Callable] = None, generation: Optional[SharedCounter] = None):
+        self.name = name
+        self.client = client
+        self.metadata = metadata
+        self.embedding_function = embedding_function
+        self.generation = generation
+        self._generation = self.generation.read() if self.generation else 0
+        self._collection = self._open_collection(self._generation)
+
+    def _physical_name(self, generation: int) -> str:
+        return self.name if generation == 0 else f"{self.name}-g{generation}"
+
+    def _open_collection(self, generation: int):
+        return self.client.get_or_create_collection(
+            name=self._physical_name(generation),
+            metadata=self.metadata,
+            embedding_function=self.embedding_function
+        )
+
+    @property
+    def collection(self):
+        """Current physical collection, reopened when another process has compacted"""
+        if self.generation is not None:
+            generation = self.generation.read()
+            if generation != self._generation:
+                self._collection = self._open_collection(generation)
+                self._generation = generation
+        return self._collection
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        self.collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def update(self, ids, documents=None, metadatas=None, embeddings=None):
+        self.collection.update(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10, where=None, include=None):
+        kwargs = {"n_results": n_results, "include": include or DEFAULT_QUERY_INCLUDE}
+        if where:
+            kwargs["where"] = where
+        if query_embeddings is not None:
+            kwargs["query_embeddings"] = query_embeddings
+        else:
+            kwargs["query_texts"] = query_texts
+        return self.collection.query(**kwargs)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        return self.collection.get(
+            ids=ids,
+            where=where or None,
+            limit=limit,
+            offset=offset,
+            include=include or DEFAULT_INCLUDE
+        )
+
+    def delete(self, ids=None, where=None):
+        self.collection.delete(ids=ids, where=where or None)
+
+    def count(self):
+        return self.collection.count()
+
+    def compact(self, lock=None, changed: Optional[Dict[str, Any]] = None, batch_size: int = 1000):
+        if self.generation is None:
+            raise ValueError(f"Collection '{self.name}' has no generation counter and cannot be compacted")
+        if lock is not None and changed is None:
+            raise ValueError("Compacting without holding the write lock needs a `changed` filter")
+        lock = lock if lock is not None else nullcontext()
+        # Chroma only rebuilds HNSW segments for a new collection: copy live records
+        # (with their stored embeddings, no re-embedding) into a fresh one
+        with lock:
+            source = self.collection
+            old_name = self._physical_name(self._generation)
+            new_generation = self._generation + 1
+            new_name = self._physical_name(new_generation)
+            self._drop_collection(new_name)  # Left over from an interrupted compaction
+            ids = source.get(include=[])['ids']
+
+        try:
+            target = self._open_collection(new_generation)
+            for start in range(0, len(ids), batch_size):
+                with lock:
+                    self._copy(target, source.get(
+                        ids=ids[start:start + batch_size], include=['embeddings', 'documents', 'metadatas']
+                    ))
+            with lock:
+                if changed is not None:
+                    # Writes that landed while the lock was released between batches
+                    self._copy(target, source.get(
+                        where=changed, include=['embeddings', 'documents', 'metadatas']
+                    ))
+                    live = set(source.get(include=[])['ids'])
+                    gone = [record_id for record_id in target.get(include=[])['ids'] if record_id not in live]
+                    if gone:
+                        target.delete(ids=gone)
+                if target.count() != source.count():
+                    raise RuntimeError(f"Compacted copy of '{self.name}' is incomplete")
+
+                # Publish the switch, then drop the old collection last
+                self.generation.increment()
+                self._collection, self._generation = target, new_generation
+                self._drop_collection(old_name)
+        except Exception:
+            self._drop_collection(new_name)
+            raise
+
+    @staticmethod
+    def _copy(target, records: Dict[str, Any]):
+        """Upsert fetched records into the target collection"""
+        if records['ids']:
+            target.upsert(
+                ids=records['ids'],
+                embeddings=records['embeddings'],
+                documents=records['documents'],
+                metadatas=records['metadatas']
+            )
+
+    def _drop_collection(self, name: str):
+        try:
+            self.client.delete_collection(name)
+        except ValueError:
+            pass  # Does not exist
+        except Exception as e:
+            logger.warning(f"Could not drop collection '{name}': {e}")
+
+class FlatVectorStore(VectorStore):
+    """
+    Append-only, memory-mapped float32 vector file plus a JSONL metadata
+    sidecar, searched with exact brute-force top-k in NumPy.
+
+    Layout under <directory>/<name>/:
+        vectors.f32    raw float32 rows, never rewritten in place
+        records.jsonl  one line per add/update/delete, replayed on open
+
+    Opening a store maps the vector file read-only, so forked workers share
+    its pages. Appends from other processes are picked up by tailing the
+    sidecar; writers and compaction take an exclusive lock on <name>/.lock.
+    Deleted or replaced rows stay in the file until compact() rewrites it.
+    Distances are squared L2, the same space as Chroma's default.
+    """
+
+    def __init__(self, directory, name: str, metadata: Optional[Dict[str, Any]] = None,
+                 embedding_function: Optional[Callable] = None):
+        self.name = name
+        self.metadata = metadata or {}
+        self.embedding_function = embedding_function
+        self.path = Path(directory) / name
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.path / "vectors.f32"
+        self.records_path = self.path / "records.jsonl"
+        self.lock_path = self.path / ".lock"
+        self.vectors_path.touch(exist_ok=True)
+        self.records_path.touch(exist_ok=True)
+        self.lock_path.touch(exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._reset_state()
+        self._refresh()
+
+    def _reset_state(self):
+        """Clear in-memory state before (re)reading the sidecar from the start"""
+        self._dim: Optional[int] = None
+        self._records_inode: Optional[int] = None
+        self._records_offset = 0
+        self._row_ids: List[Optional[str]] = []    # row -> id (None once superseded)
+        self._id_to_row: Dict[str, int] = {}
+        self._documents: Dict[str, Optional[str]] = {}
+        self._metadatas: Dict[str, Dict[str, Any]] = {}
+        self._order: Dict[str, int] = {}           # id -> insertion sequence, for stable get()
+        self._sequence = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+
+    # ------------------------------------------------------------------
+    # Sidecar replay
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self, mode: int):
+        """Inter-process lock shared by all handles on this collection"""
+        with open(self.lock_path, 'rb') as lock_file:
+            fcntl.flock(lock_file, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _sidecar_changed(self) -> bool:
+        stat = self.records_path.stat()
+        return stat.st_ino != self._records_inode or stat.st_size != self._records_offset
+
+    def _refresh(self):
+        """Apply sidecar lines appended since the last refresh (by us or another process)"""
+        if not self._sidecar_changed():
+            return
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._refresh_locked()
+
+    def _refresh_locked(self):
+        """_refresh() body; caller holds self._lock and the file lock"""
+        stat = self.records_path.stat()
+        if stat.st_ino != self._records_inode or stat.st_size < self._records_offset:
+            # Sidecar was replaced by compaction: replay from scratch
+            self._reset_state()
+            self._records_inode = stat.st_ino
+        if stat.st_size == self._records_offset:
+            return
+
+        with open(self.records_path, 'rb') as f:
+            f.seek(self._records_offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # partially written line, pick it up next time
+                self._apply(json.loads(line.decode('utf-8')))
+                self._records_offset += len(line)
+
+        self._remap()
+
+    def _apply(self, record: Dict[str, Any]):
+        """Apply one sidecar record to the in-memory state"""
+        op = record["op"]
+        if op == "add":
+            self._dim = record.get("dim", self._dim)
+            for offset, record_id in enumerate(record["ids"]):
+                row = record["row"] + offset
+                self._set_row(record_id, row)
+                self._documents[record_id] = record["documents"][offset] if record.get("documents") else None
+                self._metadatas[record_id] = record["metadatas"][offset] if record.get("metadatas") else {}
+                self._order[record_id] = self._sequence
+                self._sequence += 1
+        elif op == "update":
+            for offset, record_id in enumerate(record["ids"]):
+                if record_id not in self._id_to_row:
+                    continue
+                if record.get("row") is not None:
+                    self._set_row(record_id, record["row"] + offset)
+                if record.get("documents"):
+                    self._documents[record_id] = record["documents"][offset]
+                if record.get("metadatas"):
+                    merged = {**self._metadatas[record_id], **record["metadatas"][offset]}
+                    self._metadatas[record_id] = {k: v for k, v in merged.items() if v is not None}
+        elif op == "delete":
+            for record_id in record["ids"]:
+                row = self._id_to_row.pop(record_id, None)
+                if row is not None:
+                    self._row_ids[row] = None
+                self._documents.pop(record_id, None)
+                self._metadatas.pop(record_id, None)
+                self._order.pop(record_id, None)
+
+    def _set_row(self, record_id: str, row: int):
+        """Point an id at a vector row, retiring its previous row"""
+        previous = self._id_to_row.get(record_id)
+        if previous is not None:
+            self._row_ids[previous] = None
+        if row >= len(self._row_ids):
+            self._row_ids.extend([None] * (row + 1 - len(self._row_ids)))
+        self._row_ids[row] = record_id
+        self._id_to_row[record_id] = row
+
+    def _remap(self):
+        """Memory-map the vector file up to the last row referenced by the sidecar"""
+        rows = len(self._row_ids)
+        if not self._dim or rows == 0:
+            self._vectors, self._norms = None, None
+            return
+        if self._vectors is not None and self._vectors.shape[0] == rows:
+            return
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, self._dim))
+        self._norms = None  # computed lazily on first query
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _embed(self, documents: Optional[List[str]], embeddings) -> np.ndarray:
+        """Return embeddings as a float32 matrix, computing them from documents if needed"""
+        if embeddings is None:
+            if documents is None:
+                raise ValueError("Either documents or embeddings must be provided")
+            if self.embedding_function is None:
+                raise ValueError(f"Collection '{self.name}' has no embedding function")
+            embeddings = self.embedding_function(documents)
+        matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+        if matrix.ndim != 2:
+            raise ValueError("Embeddings must be a list of vectors")
+        if self._dim is not None and matrix.shape[1] != self._dim:
+            raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match collection dimension {self._dim}")
+        return matrix
+
+    def _append(self, record: Dict[str, Any], vectors: Optional[np.ndarray] = None):
+        """Append vectors and a sidecar record under an inter-process file lock"""
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._refresh_locked()
+            if vectors is not None:
+                if self._dim is None:
+                    self._dim = int(vectors.shape[1])
+                with open(self.vectors_path, 'ab') as vectors_file:
+                    row = vectors_file.tell() // (4 * self._dim)
+                    vectors_file.write(vectors.tobytes())
+                record = {**record, "row": row, "dim": self._dim}
+            with open(self.records_path, 'a', encoding='utf-8') as records_file:
+                records_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._refresh_locked()
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        if not ids:
+            return
+        self._refresh()
+        duplicates = [record_id for record_id in ids if record_id in self._id_to_row]
+        if duplicates or len(set(ids)) != len(ids):
+            raise ValueError(f"IDs already exist in collection '{self.name}': {duplicates[:5]}")
+        vectors = self._embed(documents, embeddings)
+        self._append({
+            "op": "add",
+            "ids": list(ids),
+            "documents": documents,
+            "metadatas": metadatas
+        }, vectors)
+
+    def update(self, ids, documents=None, metadatas=None, embeddings=None):
+        if not ids:
+            return
+        self._refresh()
+        vectors = None
+        if embeddings is not None or documents is not None:
+            vectors = self._embed(documents, embeddings)
+        self._append({
+            "op": "update",
+            "ids": list(ids),
+            "documents": documents,
+            "metadatas": metadatas
+        }, vectors)
+
+    def delete(self, ids=None, where=None):
+        self._refresh()
+        if where:
+            candidates = ids if ids is not None else list(self._id_to_row)
+            ids = [i for i in candidates if i in self._metadatas and _matches_where(self._metadatas[i], where)]
+        ids = [i for i in (ids or []) if i in self._id_to_row]
+        if ids:
+            self._append({"op": "delete", "ids": ids})
+
+    def compact(self, lock=None, changed=None):
+        # The rewrite is a single pass over the mmap, so the caller's lock is held throughout
+        with lock if lock is not None else nullcontext(), self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._refresh_locked()
+            ids = sorted(self._id_to_row, key=self._order.__getitem__)
+            tmp_vectors = self.vectors_path.with_suffix(".f32.tmp")
+            tmp_records = self.records_path.with_suffix(".jsonl.tmp")
+
+            with open(tmp_vectors, 'wb') as f:
+                if ids:
+                    rows = np.fromiter((self._id_to_row[i] for i in ids), dtype=np.int64)
+                    f.write(np.ascontiguousarray(self._vectors[rows]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(tmp_records, 'w', encoding='utf-8') as f:
+                if ids:
+                    f.write(json.dumps({
+                        "op": "add",
+                        "row": 0,
+                        "dim": self._dim,
+                        "ids": ids,
+                        "documents": [self._documents[i] for i in ids],
+                        "metadatas": [self._metadatas[i] for i in ids]
+                    }, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Readers replay only under the shared lock, so they never pair old rows with new files
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_records, self.records_path)
+            self._reset_state()
+            self._refresh_locked()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def count(self):
+        self._refresh()
+        return len(self._id_to_row)
+
+    def _filtered_ids(self, where: Optional[Dict[str, Any]]) -> List[str]:
+        """Live ids in insertion order, optionally filtered by metadata"""
+        ids = sorted(self._id_to_row, key=self._order.__getitem__)
+        if where:
+            ids = [i for i in ids if _matches_where(self._metadatas[i], where)]
+        return ids
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        include = include or DEFAULT_INCLUDE
+        with self._lock:
+            self._refresh()
+            if ids is not None:
+                selected = [i for i in ids if i in self._id_to_row]
+                if where:
+                    selected = [i for i in selected if _matches_where(self._metadatas[i], where)]
+            else:
+                selected = self._filtered_ids(where)
+            start = offset or 0
+            selected = selected[start:start + limit] if limit is not None else selected[start:]
+            return self._result(selected, include)
+
+    def _result(self, ids: List[str], include: List[str]) -> Dict[str, Any]:
+        """Build a Chroma-shaped get() result"""
+        result = {"ids": ids, "documents": None, "metadatas": None, "embeddings": None}
+        if 'documents' in include:
+            result["documents"] = [self._documents[i] for i in ids]
+        if 'metadatas' in include:
+            result["metadatas"] = [dict(self._metadatas[i]) for i in ids]
+        if 'embeddings' in include:
+            result["embeddings"] = [self._vectors[self._id_to_row[i]].tolist() for i in ids]
+        return result
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10, where=None, include=None):
+        include = include or DEFAULT_QUERY_INCLUDE
+        if query_embeddings is None:
+            if self.embedding_function is None:
+                raise ValueError(f"Collection '{self.name}' has no embedding function")
+            query_embeddings = self.embedding_function(query_texts)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+
+        with self._lock:
+            self._refresh()
+            result = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": None}
+            if self._vectors is None or not self._id_to_row:
+                for key in ("ids", "documents", "metadatas", "distances"):
+                    result[key] = [[] for _ in range(len(queries))]
+                return result
+
+            if self._norms is None:
+                self._norms = np.einsum('ij,ij->i', self._vectors, self._vectors)
+
+            if where:
+                rows = np.fromiter(
+                    (row for i, row in self._id_to_row.items() if _matches_where(self._metadatas[i], where)),
+                    dtype=np.int64
+                )
+            else:
+                rows = np.fromiter(self._id_to_row.values(), dtype=np.int64)
+
+            for query in queries:
+                if rows.size == 0:
+                    top_rows, distances = rows, np.empty(0, dtype=np.float32)
+                else:
+                    # ||v - q||^2 = ||v||^2 - 2 v.q + ||q||^2
+                    if rows.size == len(self._row_ids):
+                        # No deleted/superseded rows: scan the mapping without a gather copy
+                        rows = np.arange(rows.size)
+                        scores = self._norms - 2.0 * (self._vectors @ query) + float(query @ query)
+                    else:
+                        scores = self._norms[rows] - 2.0 * (self._vectors[rows] @ query) + float(query @ query)
+                    k = min(n_results, rows.size)
+                    top = np.argpartition(scores, k - 1)[:k] if k < rows.size else np.arange(rows.size)
+                    top = top[np.argsort(scores[top])]
+                    top_rows, distances = rows[top], np.maximum(scores[top], 0.0)
+
+                hit_ids = [self._row_ids[row] for row in top_rows]
+                result["ids"].append(hit_ids)
+                result["documents"].append([self._documents[i] for i in hit_ids])
+                result["metadatas"].append([dict(self._metadatas[i]) for i in hit_ids])
+                result["distances"].append([float(d) for d in distances])
+
+            for key in ("documents", "metadatas", "distances"):
+                if key not in include:
+                    result[key] = None
+            return result
+
+def _matches_where(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """Evaluate a Chroma-style metadata filter ($and/$or, $eq/$ne/$gt/$gte/$lt/$lte/$in/$nin)"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if not _compare(value, operator, operand):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+def _compare(value: Any, operator: str, operand: Any) -> bool:
+    """Apply a single metadata comparison operator"""
+    if operator == "$eq":
+        return value == operand
+    if operator == "$ne":
+        return value != operand
+    if operator == "$in":
+        return value in operand
+    if operator == "$nin":
+        return value not in operand
+    if value is None:
+        return False
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    if operator == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported where operator: {operator}")
+
+class ChromaBackend:
+    """Opens collections in a shared chromadb.PersistentClient"""
+
+    def __init__(self, persist_directory):
+        import chromadb
+        self.directory = Path(persist_directory)
+        self.client = chromadb.PersistentClient(path=str(persist_directory))
+
+    def open(self, name: str, metadata: Optional[Dict[str, Any]] = None,
+             embedding_function: Optional[Callable] = None) -> VectorStore:
+        generation = SharedCounter(self.directory / f"{name}.generation")
+        return ChromaVectorStore(self.client, name, metadata, embedding_function, generation)
+
+class FlatBackend:
+    """Opens memory-mapped flat-index collections under <persist_directory>/flat_index"""
+
+    def __init__(self, persist_directory):
+        self.directory = Path(persist_directory) / "flat_index"
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def open(self, name: str, metadata: Optional[Dict[str, Any]] = None,
+             embedding_function: Optional[Callable] = None) -> VectorStore:
+        return FlatVectorStore(self.directory, name, metadata, embedding_function)
+
+VECTOR_STORE_BACKENDS = {
+    "chroma": ChromaBackend,
+    "flat": FlatBackend
+}
+
+def get_vector_store_backend(backend: str, persist_directory):
+    """
+    Create the configured vector store backend
+
+    Args:
+        backend (str): Backend name ("chroma" or "flat")
+        persist_directory: Directory for persisted data
+
+    Returns:
+        Backend with an open(name, metadata, embedding_function) method
+    """
+    if backend not in VECTOR_STORE_BACKENDS:
+        raise ValueError(f"Unknown vector store backend '{backend}'. Available: {', '.join(VECTOR_STORE_BACKENDS)}")
+    logger.info(f"Using '{backend}' vector store backend")
+    return VECTOR_STORE_BACKENDS[backend](persist_directory)
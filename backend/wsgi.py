@@ -0,0 +1,9 @@
+"""
+Production WSGI entry point
+
+Run from backend/:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import app
+
+__all__ = ["app"]
@@ -1,6 +1,6 @@
 'use client'
 
-import { Bot, User, Database, Zap, MessageSquare, Search } from 'lucide-react'
+import { Bot, User, Database, Zap, MessageSquare, Search, AlertTriangle } from 'lucide-react'
 import { Message } from '../types'
 import MarkdownBlock from './MarkdownBlock'
 
@@ -18,6 +18,10 @@ const getSourceIcon = (source?: string) => {
       return <span title='Function Call'><Zap className="w-3 h-3 text-blue-500" /></span>
     case 'openai':
       return <span title='AI Response'><MessageSquare className="w-3 h-3 text-purple-500" /></span>
+    case 'extractive':
+      return <span title='Extracted from knowledge base'><Search className="w-3 h-3 text-gray-500" /></span>
+    case 'degraded':
+      return <span title='Service busy, limited answer'><AlertTriangle className="w-3 h-3 text-yellow-500" /></span>
     default:
       return <span title='System'><Bot className="w-3 h-3 text-gray-500" /></span>
   }
@@ -35,6 +39,10 @@ const getSourceLabel = (source?: string, confidence?: number) => {
       return 'AI'
     case 'demo':
       return 'Demo'
+    case 'extractive':
+      return 'Extractive'
+    case 'degraded':
+      return 'Degraded'
     default:
       return 'System'
   }
@@ -3,7 +3,7 @@ export interface Message {
   content: string
   sender: 'user' | 'bot'
   timestamp: Date
-  source?: 'faq' | 'openai' | 'function' | 'demo' | 'rag'
+  source?: 'faq' | 'openai' | 'function' | 'demo' | 'rag' | 'degraded' | 'extractive'
   confidence?: number
 }
 